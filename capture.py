@@ -0,0 +1,359 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from nrf24 import RF24_RX_ADDR
+
+from pathlib import Path
+from typing import Any
+import statistics
+import argparse
+import struct
+import time
+import sys
+
+from console import (
+    ERROR,
+    SUCC,
+    WARN,
+    INFO,
+)
+from link import DATA_SIZE
+from frame_codec import (
+    FrameCodec,
+    load_dictionary,
+)
+from mux import (
+    MUX_HEADER_SIZE,
+    StreamDemux,
+)
+from session import (
+    CONTROL_PIPE,
+    SYN,
+    SYN_FRAME,
+    FLAG_DELTA,
+    FLAG_CODEC,
+    FLAG_MUX,
+    InactivityTimeout,
+    accept_session,
+    receive_session,
+)
+from storage import WriteBehindSink
+from file_receiver import receive_file_session
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# NOTE: the receiver writes every payload taken out of the RX FIFO, replay it into
+# the same receive path without radios:
+#
+#     python capture.py capture.bin
+#     python capture.py capture.bin --paced --repeat 5
+CAPTURE_MAGIC = b"NRF24CAP"
+
+HEADER = struct.Struct("<8sq")  # magic, wall clock minus monotonic clock (ns)
+RECORD = struct.Struct("<QBB")  # monotonic clock (ns), pipe, payload length, then the payload
+
+REPLAY_OUTPUT_PATH = Path("replayed_file.txt")
+
+# NOTE: a capture without the FIN of the session ends with this much silence
+REPLAY_TIMEOUT_S = 1
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CAPTURE ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class FrameCapture:
+    """
+    Records every payload that the receive loops take out of the radio, with the
+    time and the pipe it arrived on. Like `SPIProfiler` it wraps `get_payload` and
+    `get_payload_into` of the given radio object, so it can be attached and
+    detached at any moment
+    """
+
+    def __init__(self: "FrameCapture", nrf: Any, path: Path) -> None:
+        self.nrf    = nrf
+        self.path   = path
+        self.frames = 0
+
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(CAPTURE_MAGIC, time.time_ns() - time.monotonic_ns()))
+
+        self._get_payload      = nrf.get_payload
+        self._get_payload_into = nrf.get_payload_into
+        nrf.get_payload        = self._capture
+        nrf.get_payload_into   = self._capture_into
+        return
+
+
+    def _record(self: "FrameCapture", pipe: int, payload: Any) -> None:
+        self._file.write(RECORD.pack(time.monotonic_ns(), pipe, len(payload)) + bytes(payload))
+        self.frames += 1
+        return
+
+
+    def _capture(self: "FrameCapture") -> Any:
+        # NOTE: RX_P_NO belongs to the payload at the head of the RX FIFO, it has to
+        # be read before the payload leaves it
+        pipe    = self.nrf.data_pipe()
+        payload = self._get_payload()
+
+        self._record(pipe, payload)
+        return payload
+
+
+    def _capture_into(self: "FrameCapture", buffer: bytearray) -> int:
+        pipe   = self.nrf.data_pipe()
+        length = self._get_payload_into(buffer)
+
+        if length > 0:
+            self._record(pipe, buffer[:length])
+
+        return length
+
+
+    def detach(self: "FrameCapture") -> None:
+        """
+        Restores `get_payload` and `get_payload_into` of the radio and closes the
+        capture
+        """
+
+        delattr(self.nrf, "get_payload")
+        delattr(self.nrf, "get_payload_into")
+        self._file.close()
+
+        INFO(f"Captured {self.frames} frames to {self.path}")
+        return
+
+
+
+def read_capture(path: Path) -> list[tuple[int, int, bytes]]:
+    """
+    Returns the frames of a capture as (monotonic ns, pipe, payload). A frame cut
+    short at the end of the file is ignored
+    """
+
+    content = path.read_bytes()
+
+    if len(content) < HEADER.size or HEADER.unpack_from(content)[0] != CAPTURE_MAGIC:
+        raise ValueError(f"{path} is not a frame capture")
+
+    frames: list[tuple[int, int, bytes]] = []
+    pos = HEADER.size
+
+    while pos + RECORD.size <= len(content):
+        timestamp_ns, pipe, length = RECORD.unpack_from(content, pos)
+        pos += RECORD.size
+
+        if pos + length > len(content):
+            break
+
+        frames.append((timestamp_ns, pipe, content[pos:pos+length]))
+        pos += length
+
+    return frames
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: REPLAY :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class ReplayRadio:
+    """
+    Stands in for the radio of the receiver, handing out the frames of a capture.
+    With `paced` every frame becomes available at its recorded time after the
+    first one, otherwise all of them are available at once. Whatever the receiver
+    sends back (SYN-ACK, FIN-ACK, credit grants) is accepted and dropped
+    """
+
+    def __init__(self: "ReplayRadio", frames: list[tuple[int, int, bytes]], paced: bool = False) -> None:
+        self.frames = frames
+        self.paced  = paced
+
+        self._next     = 0
+        self._start_ns = None
+        return
+
+
+    def data_ready(self: "ReplayRadio") -> bool:
+        if self._next >= len(self.frames):
+            return False
+
+        if not self.paced:
+            return True
+
+        now_ns = time.monotonic_ns()
+
+        if self._start_ns is None:
+            self._start_ns = now_ns - self.frames[self._next][0]
+
+        return now_ns - self._start_ns >= self.frames[self._next][0]
+
+
+    def data_pipe(self: "ReplayRadio") -> int:
+        return self.frames[self._next][1]
+
+
+    def get_payload(self: "ReplayRadio") -> bytes:
+        payload     = self.frames[self._next][2]
+        self._next += 1
+
+        return payload
+
+
+    def get_payload_into(self: "ReplayRadio", buffer: bytearray) -> int:
+        payload = self.get_payload()
+        buffer[:len(payload)] = payload
+
+        return len(payload)
+
+
+    # NOTE: the transmit side of the receiver, every frame is acknowledged at once
+    def reset_packages_lost(self: "ReplayRadio") -> None:
+        return
+
+    def send(self: "ReplayRadio", data: bytes) -> None:
+        return
+
+    def wait_until_sent(self: "ReplayRadio") -> None:
+        return
+
+    def get_packages_lost(self: "ReplayRadio") -> int:
+        return 0
+
+    def flush_tx(self: "ReplayRadio") -> None:
+        return
+
+    def write_ack_payload(self: "ReplayRadio", pipe: int, data: bytes) -> bool:
+        return True
+
+
+
+def session_flags_of(frames: list[tuple[int, int, bytes]]) -> int | None:
+    """
+    Flags of the first SYN of the capture, the replay accepts whatever session the
+    transmitter asked for
+    """
+
+    for _, pipe, payload in frames:
+        if pipe == CONTROL_PIPE - RF24_RX_ADDR.P0 and len(payload) == SYN_FRAME.size and payload[0] == SYN:
+            return SYN_FRAME.unpack(payload)[4]
+
+    return None
+
+
+
+def replay(frames: list[tuple[int, int, bytes]], flags: int, paced: bool, output: Path) -> tuple[int, float, float] | None:
+    """
+    Runs the receive path of `point_to_point_mode.py` over the capture: the
+    session, the codec or the demultiplexer and the file sinks. Returns the frames
+    received, the time between the first and the last one and the time of the
+    whole replay, or `None` if the file could not be stored
+    """
+
+    radio = ReplayRadio(frames, paced)
+    tic   = time.monotonic()
+
+    session = accept_session(radio, flags)
+    if session is None:
+        return 0, 0.0, 0.0
+
+    # NOTE: without the old copy of the file a delta is stored as it arrives
+    if not flags & FLAG_MUX:
+        stored = receive_file_session(radio, session, output, InactivityTimeout(REPLAY_TIMEOUT_S))
+
+        if stored is None:
+            return None
+
+        received, _, receive_time = stored
+        return received, receive_time, time.monotonic() - tic
+
+    sinks: list[WriteBehindSink] = []
+
+    def store_stream(name: str, content: bytes) -> None:
+        sink = WriteBehindSink(output.with_name(f"{output.stem}_{Path(name).name}"))
+        sink.write(content)
+        sinks.append(sink)
+
+    codec = FrameCodec(load_dictionary(), DATA_SIZE - MUX_HEADER_SIZE) if flags & FLAG_CODEC else None
+    demux = StreamDemux(store_stream, codec.decode_frame if codec is not None else None)
+
+    received, receive_time, _ = receive_session(radio, session, InactivityTimeout(REPLAY_TIMEOUT_S), demux.push)
+
+    for sink in sinks:
+        sink.commit()
+
+    return received, receive_time, time.monotonic() - tic
+
+
+
+def main():
+    """
+    Replays a capture written by the receiver of `point_to_point_mode.py`
+    (`CAPTURE_FRAMES`) through its receive path, as fast as possible or with the
+    recorded pacing, and reports how long it took
+    """
+
+    parser = argparse.ArgumentParser(description = "Offline replay of a frame capture")
+    parser.add_argument("path", type = Path)
+    parser.add_argument("--paced", action = "store_true", help = "keep the recorded time between frames")
+    parser.add_argument("--repeat", type = int, default = 1, help = "replay the capture this many times")
+    parser.add_argument("--output", type = Path, default = REPLAY_OUTPUT_PATH)
+    args = parser.parse_args()
+
+    try:
+        frames = read_capture(args.path)
+
+    except (OSError, ValueError) as e:
+        ERROR(str(e))
+        sys.exit(1)
+
+    flags = session_flags_of(frames)
+
+    if flags is None:
+        ERROR(f"There is no SYN in {args.path}, the capture has to start before the session")
+        sys.exit(1)
+
+    if flags & FLAG_DELTA:
+        WARN("The capture is a delta, it is stored without applying it")
+
+    recorded_s = (frames[-1][0] - frames[0][0]) / 1e9
+    INFO(f"Replaying {len(frames)} frames recorded over {recorded_s:.3f} seconds")
+
+    totals: list[float] = []
+
+    for run in range(args.repeat):
+        try:
+            result = replay(frames, flags, args.paced, args.output)
+
+        except ValueError as e:
+            ERROR(f"Could not decode frame: {e}")
+            sys.exit(1)
+
+        if result is None:
+            sys.exit(1)
+
+        received, receive_time, total_time = result
+
+        if received == 0:
+            ERROR("The capture has no data frames")
+            sys.exit(1)
+
+        totals.append(total_time)
+        INFO(f"[{run + 1}/{args.repeat}] {received} frames in {total_time * 1000:.1f} ms ({received / total_time:.0f} frames/s), {receive_time * 1000:.1f} ms between the first and the last")
+
+    if args.repeat > 1:
+        INFO(f"Best {min(totals) * 1000:.1f} ms | median {statistics.median(totals) * 1000:.1f} ms")
+
+    SUCC(f"Output written to {args.output}")
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+if __name__ == "__main__":
+    main()
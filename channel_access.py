@@ -0,0 +1,165 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from typing import Any
+import random
+import time
+
+from console import (
+    INFO,
+)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# NOTE: roughly the air time of a full frame plus its ACK at 1 Mbps, so a node that
+# backs off one slot lets a whole exchange of another pair go through
+CSMA_SLOT_US = 500
+
+# the backoff is a random number of slots in [1, 2^exponent), the exponent grows
+# every time the channel is found busy or a frame is lost and goes back to the
+# minimum after every delivered frame
+CSMA_MIN_EXPONENT = 2
+CSMA_MAX_EXPONENT = 6
+
+# busy channel checks before transmitting anyway, so a noisy channel (or a
+# constant carrier) cannot stall the transfer forever
+CSMA_MAX_BACKOFFS = 8
+
+# NOTE: frames sent back to back after a clear channel check before checking it
+# again. Every check costs one SPI transaction, a lost frame ends the burst early
+CSMA_BURST_FRAMES = 4
+
+# NOTE: auto retransmit delays (ARD, in steps of 250 us) that a node picks from at
+# random. Two pairs with the same ARD that collide once keep colliding on every
+# automatic retry until MAX_RT, with different ones the second attempt gets through
+CSMA_RETRY_DELAYS = range(1, 6)
+
+RPD_SETTLE_S = 170e-6 # RX settling (130 us) plus the AGC delay (40 us)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CHANNEL ACCESS :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class ChannelAccess:
+    """
+    Listen-before-talk for the transmitter. Before every burst of frames the
+    carrier detect of the radio is checked and, while the channel is busy, the
+    transmission is delayed by a random exponential backoff. Lost frames (MAX_RT) back off too and
+    the auto retransmit delay of the radio is chosen at random, so pairs that
+    collided do not retry in lockstep
+    """
+
+    def __init__(
+        self: "ChannelAccess",
+        nrf: Any,
+        slot_us: int        = CSMA_SLOT_US,
+        min_exponent: int   = CSMA_MIN_EXPONENT,
+        max_exponent: int   = CSMA_MAX_EXPONENT,
+        max_backoffs: int   = CSMA_MAX_BACKOFFS,
+        burst_frames: int   = CSMA_BURST_FRAMES,
+        retry_delays: range = CSMA_RETRY_DELAYS,
+    ) -> None:
+        self.nrf          = nrf
+        self.slot_s       = slot_us / 1e6
+        self.min_exponent = min_exponent
+        self.max_exponent = max_exponent
+        self.max_backoffs = max_backoffs
+        self.burst_frames = burst_frames
+        self.retry_delays = retry_delays
+
+        self.exponent = min_exponent
+
+        self.frames    = 0
+        self.bursts    = 0
+        self.busy      = 0    # checks that found the channel busy
+        self.forced    = 0    # frames sent after `max_backoffs` busy checks
+        self.losses    = 0
+        self.backoff_s = 0.0
+
+        self._listening = False
+        self._burst_left = 0 # frames that can still be sent without checking
+
+        self._pick_retry_delay()
+        return
+
+
+    def _pick_retry_delay(self: "ChannelAccess") -> None:
+        _, retries = self.nrf.get_retransmission()
+        self.nrf.set_retransmission(random.choice(self.retry_delays), retries)
+        return
+
+
+    def _backoff(self: "ChannelAccess") -> None:
+        slots = random.randrange(1, 1 << self.exponent)
+        delay = slots * self.slot_s
+
+        time.sleep(delay)
+
+        self.backoff_s += delay
+        self.exponent   = min(self.exponent + 1, self.max_exponent)
+        return
+
+
+    def acquire(self: "ChannelAccess") -> None:
+        """
+        Returns once the channel is clear (or after `max_backoffs` busy checks), to
+        be called right before sending a frame. Within a burst it returns at once
+        """
+
+        self.frames += 1
+
+        if self._burst_left > 0:
+            self._burst_left -= 1
+            return
+
+        # NOTE: the RPD needs the radio listening, after the first frame the library
+        # already leaves it in RX mode
+        if not self._listening:
+            self.nrf.power_up_rx()
+            time.sleep(RPD_SETTLE_S)
+            self._listening = True
+
+        self.bursts     += 1
+        self._burst_left = self.burst_frames - 1
+
+        for _ in range(self.max_backoffs):
+            if not self.nrf.carrier_detected():
+                return
+
+            self.busy += 1
+            self._backoff()
+
+        self.forced += 1
+        return
+
+
+    def delivered(self: "ChannelAccess") -> None:
+        self.exponent = self.min_exponent
+        return
+
+
+    def lost(self: "ChannelAccess") -> None:
+        """
+        Backs off after a frame that reached MAX_RT, most likely because it collided,
+        and picks another retransmit delay in case the other node has the same one
+        """
+
+        self.losses     += 1
+        self._burst_left = 0
+
+        self._pick_retry_delay()
+        self._backoff()
+        return
+
+
+    def report(self: "ChannelAccess") -> None:
+        INFO(
+            f"Channel access over {self.frames} frames in {self.bursts} bursts: channel busy {self.busy} times, "
+            f"{self.forced} frames forced, {self.losses} lost, {self.backoff_s * 1e3:.1f} ms backing off"
+        )
+        return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
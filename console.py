@@ -0,0 +1,120 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+import shutil
+import sys
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+spinner     = "⣾⣽⣻⢿⡿⣟⣯⣷"
+IDX_SPINNER = [0]
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: HELPER FUNCTIONS :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def RED(message: str) -> str:
+    """
+    Returns a copy of the string wrapped in ANSI scape sequences to make it red
+    """
+    return f"\033[31m{message}\033[0m"
+
+
+
+def GREEN(message: str) -> str:
+    """
+    Returns a copy of the string wrapped in ANSI scape sequences to make it green
+    """
+    return f"\033[32m{message}\033[0m"
+
+
+
+def YELLOW(message: str) -> str:
+    """
+    Returns a copy of the string wrapped in ANSI scape sequences to make it yellow
+    """
+    return f"\033[33m{message}\033[0m"
+
+
+
+def BLUE(message: str) -> str:
+    """
+    Returns a copy of the string wrapped in ANSI scape sequences to make it blue
+    """
+    return f"\033[34m{message}\033[0m"
+
+
+
+def ERROR(message: str, end = "\n") -> None:
+    """
+    Prints a message to the console with the red prefix `[~ERR]:`
+    """
+    print(f"{RED('[~ERR]:')} {message}", end = end)
+
+
+
+def SUCC(message: str, end = "\n") -> None:
+    """
+    Prints a message to the console with the green prefix `[SUCC]:`
+    """
+    print(f"{GREEN('[SUCC]:')} {message}", end = end)
+
+
+
+def WARN(message: str, end = "\n") -> None:
+    """
+    Prints a message to the console with the yellow prefix `[WARN]:`
+    """
+    print(f"{YELLOW('[WARN]:')} {message}", end = end)
+
+
+
+def INFO(message: str, end = "\n") -> None:
+    """
+    Prints a message to the console with the blue prefix `[INFO]:`
+    """
+    print(f"{BLUE('[INFO]:')} {message}", end = end)
+
+
+
+def reset_line() -> None:
+    """
+    Delete the last CMD line
+    """
+
+    print("\x1b[2K\r", end = "")
+    
+    return
+
+
+
+def progress_bar(active_msg: str, finished_msg: str, current_status: int, max_status: int) -> None:
+    """
+    Create a progress bar that gets updated everytime this function is called
+    """
+    
+    terminal_width  = shutil.get_terminal_size().columns
+    IDX_SPINNER[0] += 1
+    spin            = spinner[IDX_SPINNER[0] % len(spinner)]
+    progress        = f"({current_status}/{max_status}) {spin}"
+
+    if current_status < max_status:
+        progress = f"({current_status}/{max_status}) {spin}"
+
+        reset_line()
+        INFO(f"{active_msg} {progress.rjust(terminal_width - 8 - len(active_msg) - 2)}", end = "")
+        sys.stdout.flush()
+        
+    
+    else:
+        progress = f"({current_status}/{max_status}) █"
+
+        reset_line()
+        SUCC(f"{finished_msg} {progress.rjust(terminal_width - 8 - len(finished_msg) - 2)}")
+    
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
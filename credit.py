@@ -0,0 +1,250 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from nrf24 import RF24_RX_ADDR
+
+import struct
+import time
+
+from console import INFO
+from custom_nrf24 import CustomNRF24
+from channel_access import ChannelAccess
+from tdma import TDMASlot
+from rx_drain import RxDrain
+import eventlog
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# NOTE: the receiver grants the frames it is ready for in the ACK payload of every
+# data frame, the grant is the total number of frames the transmitter may have
+# delivered so far. A transmitter out of credit sends probes to the control pipe
+# and gets the new grant in their ACK
+CREDIT_GRANT = ord("G")
+CREDIT_PROBE = ord("C")
+
+GRANT = struct.Struct("<BI") # type, frames granted
+PROBE = struct.Struct("<B")  # type
+
+# NOTE: the RX FIFO holds 3 frames, one of them is left free for the probes. With
+# the drain thread the frames wait in its queue instead and the window is the size
+# of the queue. The transmitter starts with this credit, the receiver never grants
+# less
+CREDIT_WINDOW = 2
+
+# NOTE: probes are sent without retransmissions and with exponential back-off, a
+# receiver that is still busy costs one short frame every now and then
+PROBE_MIN_S = 200e-6
+PROBE_MAX_S = 2e-3
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: TRANSMITTER ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class CreditWindow:
+    """
+    Paces the stop & wait transmitter to the credit granted by the receiver, so
+    frames are never sent into a full RX FIFO when the receiver falls behind.
+    Same interface as `ChannelAccess` so it can be passed as the `channel` of
+    `send_frames`, the channel access of `inner` (if any) is acquired as well
+    """
+
+    def __init__(
+        self: "CreditWindow",
+        nrf: CustomNRF24,
+        data_address: bytes,
+        control_address: bytes,
+        inner: ChannelAccess | TDMASlot | None = None,
+        window: int = CREDIT_WINDOW,
+    ) -> None:
+        self.nrf             = nrf
+        self.data_address    = data_address
+        self.control_address = control_address
+        self.inner           = inner
+
+        self.granted          = window # NOTE: the receiver grants at least as many
+        self.delivered_frames = 0
+
+        self.stalls      = 0
+        self.probes      = 0
+        self.stalled_s   = 0.0
+        self.lost_frames = 0
+        return
+
+
+    def acquire(self: "CreditWindow") -> None:
+        if self.delivered_frames >= self.granted:
+            self._wait_for_credit()
+
+        if self.inner is not None:
+            self.inner.acquire()
+
+        return
+
+
+    def delivered(self: "CreditWindow") -> None:
+        self.delivered_frames += 1
+
+        # NOTE: every ACK brings at most one grant, the rest are taken when stalled
+        self._read_grant()
+
+        if self.inner is not None:
+            self.inner.delivered()
+
+        return
+
+
+    def lost(self: "CreditWindow") -> None:
+        self.lost_frames += 1
+
+        if self.inner is not None:
+            self.inner.lost()
+
+        return
+
+
+    def report(self: "CreditWindow") -> None:
+        INFO(f"Credit: {self.stalls} stalls waiting for the receiver ({self.stalled_s * 1000:.1f} ms, {self.probes} probes) | {self.lost_frames} frames retried")
+        return
+
+
+    def _read_grant(self: "CreditWindow") -> bool:
+        """
+        Takes the next ACK payload, returns whether there was any
+        """
+
+        payload = self.nrf.read_ack_payload()
+
+        if payload is None:
+            return False
+
+        if len(payload) == GRANT.size and payload[0] == CREDIT_GRANT:
+            self.granted = max(self.granted, GRANT.unpack(payload)[1])
+
+        return True
+
+
+    def _wait_for_credit(self: "CreditWindow") -> None:
+        """
+        Probes the receiver until it grants more frames. The probes go to the
+        control pipe without retransmissions, if the RX FIFO is still full the
+        probe is simply lost
+        """
+
+        self.stalls += 1
+        tic = time.monotonic()
+
+        retry_delay, retries = self.nrf.get_retransmission()
+        self.nrf.set_retransmission(retry_delay, 0)
+        self.nrf.open_writing_pipe(self.control_address)
+
+        interval = PROBE_MIN_S
+
+        while True:
+            while self._read_grant():
+                pass
+
+            if self.delivered_frames < self.granted:
+                break
+
+            self.nrf.send(PROBE.pack(CREDIT_PROBE))
+            self.probes += 1
+
+            try:
+                self.nrf.wait_until_sent()
+            except TimeoutError:
+                pass
+
+            # NOTE: a probe that was not acknowledged stays in the TX FIFO
+            self.nrf.flush_tx()
+
+            time.sleep(interval)
+            interval = min(interval * 2, PROBE_MAX_S)
+
+        self.nrf.open_writing_pipe(self.data_address)
+        self.nrf.set_retransmission(retry_delay, retries)
+
+        self.stalled_s += time.monotonic() - tic
+        eventlog.record(eventlog.CREDIT_STALL, self.delivered_frames, value = self.probes)
+        return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: RECEIVER :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class CreditGrant:
+    """
+    Receiver side, grants `window` frames past the ones already taken out of the
+    RX FIFO (or out of the queue of the drain thread, which sets the default
+    window). Every data frame takes one ACK payload, so one grant is queued for
+    every frame drained. The current grant is also kept waiting for the probes
+    that arrive on `control_pipe`, so a stalled transmitter gets it with the ACK
+    of its first probe
+    """
+
+    def __init__(self: "CreditGrant", nrf: CustomNRF24 | RxDrain, control_pipe: RF24_RX_ADDR, window: int | None = None) -> None:
+        self.nrf          = nrf
+        self.control_pipe = control_pipe
+        self.window       = window or (nrf.queue_frames if isinstance(nrf, RxDrain) else CREDIT_WINDOW)
+
+        self.probes = 0
+
+        self._control: int | None = None # grant waiting in the TX FIFO for the next probe
+        return
+
+
+    def drained(self: "CreditGrant", frames: int) -> None:
+        """
+        Grants more frames after the `frames`-th data frame left the RX FIFO
+        """
+
+        granted = frames + self.window
+        grant   = GRANT.pack(CREDIT_GRANT, granted)
+
+        # NOTE: the grant waiting for a probe cannot be replaced, only flushed with
+        # the rest of the TX FIFO. The grants of the data pipe are all older than the
+        # new one, which goes in again
+        if self._control is not None and self._control < granted:
+            self.nrf.flush_tx()
+            self._control = None
+
+        if not self.nrf.write_ack_payload(RF24_RX_ADDR.P1 - RF24_RX_ADDR.P0, grant):
+            self.nrf.flush_tx()
+            self._control = None
+            self.nrf.write_ack_payload(RF24_RX_ADDR.P1 - RF24_RX_ADDR.P0, grant)
+
+        if self._control is None:
+            self._load_control(granted)
+
+        return
+
+
+    def probed(self: "CreditGrant", frames: int) -> None:
+        """
+        Counts a probe, its ACK took the grant of the control pipe. The current one
+        is loaded for the next probe, the grants of the data pipe are left alone
+        """
+
+        self.probes  += 1
+        self._control = None
+
+        self._load_control(frames + self.window)
+        return
+
+
+    def _load_control(self: "CreditGrant", granted: int) -> None:
+        if self.nrf.write_ack_payload(self.control_pipe - RF24_RX_ADDR.P0, GRANT.pack(CREDIT_GRANT, granted)):
+            self._control = granted
+
+        return
+
+
+    @staticmethod
+    def is_probe(frame: bytes) -> bool:
+        return len(frame) == PROBE.size and frame[0] == CREDIT_PROBE
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
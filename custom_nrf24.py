@@ -0,0 +1,407 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from nrf24 import (
+    NRF24,
+
+    RF24_PAYLOAD,
+    SPI_CHANNEL,
+)
+
+from typing import Any
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CLASS EXTENSION ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class CustomNRF24(NRF24):
+    """
+    Custom NRF24 class that allows for extending the NRF24 base class without
+    modifying the library itself
+    """
+    
+    def __init__(self: "CustomNRF24", pi: Any, ce: int, spi_speed: float = 10_000_000, spi_channel: SPI_CHANNEL = SPI_CHANNEL.MAIN_CE0) -> None:
+        # NOTE: the base constructor already talks to the radio, so the shadow state
+        # has to exist before calling it
+        self._shadow: dict[int, int] = {} # last known value of `SHADOWED_REGISTERS`
+        self._status: int | None     = None # STATUS after the last command, `None` if unknown
+        self._plos: int | None       = None # PLOS_CNT of OBSERVE_TX, `None` if unknown
+        self._max_rt_counted         = False
+        self._ce_level: int | None   = None
+        self._feature_sticky         = 0 # FEATURE bits kept when the pipes are opened again
+
+        # NOTE: SPI commands of the receive path, built once instead of on every frame
+        self._nop_command      = [self.NOP]
+        self._width_command    = [self.R_RX_PL_WID, self.NOP]
+        self._clear_rx_command = [self.W_REGISTER | self.STATUS, self.RX_DR]
+        self._payload_commands = [[self.R_RX_PAYLOAD] + [self.NOP] * width for width in range(RF24_PAYLOAD.MAX + 1)]
+
+        super().__init__(pi = pi, ce = ce, spi_speed = spi_speed, spi_channel = spi_channel)
+        return
+
+
+    # FEATURE
+    EN_DYN_ACK = 1 << 0
+    EN_ACK_PAY = 1 << 1
+    EN_DPL     = 1 << 2
+
+    # STATUS
+    RX_P_NO_EMPTY = 0x07
+
+    # NOTE: alternating bits, as recommended for the address bytes of the radio
+    ADDRESS_PADDING = 0xC5
+
+    # NOTE: registers that only change when the host writes them, so reading them
+    # back is never needed. RF_CH is the only one with a side effect on write (it
+    # resets PLOS_CNT), so rewriting it with the same value is never skipped
+    SHADOWED_REGISTERS = (
+        NRF24.CONFIG,
+        NRF24.EN_AA,
+        NRF24.EN_RXADDR,
+        NRF24.SETUP_AW,
+        NRF24.SETUP_RETR,
+        NRF24.RF_CH,
+        NRF24.RF_SETUP,
+        NRF24.DYNPD,
+        NRF24.FEATURE,
+    )
+
+
+    # :::: addresses ::::
+    def make_address(self: "CustomNRF24", address: Any) -> list[int]:
+        """
+        Same as the base `make_address` but shorter addresses are padded up to the
+        configured address width, so the same 3 byte addresses work whatever the
+        width of the radio profile. The padding goes at the end (the most
+        significant bytes), which P2-P5 share with P1
+        """
+
+        addr = super().make_address(address)
+
+        if len(addr) < self._address_width:
+            addr = addr + [self.ADDRESS_PADDING] * (self._address_width - len(addr))
+
+        return addr
+
+
+    # :::: shadow registers ::::
+    def _nrf_xfer(self: "CustomNRF24", data: list[int]) -> Any:
+        """
+        Every SPI command shifts out the STATUS register as its first byte, so the
+        shadow state is refreshed from every transaction for free
+        """
+
+        response = super()._nrf_xfer(data)
+        status   = response[0]
+        command  = data[0]
+
+        # PLOS_CNT goes up every time MAX_RT fires, and MAX_RT stays set until the
+        # host clears it, so every lost packet is seen at least once here
+        if status & self.MAX_RT and not self._max_rt_counted:
+            self._max_rt_counted = True
+            if self._plos is not None:
+                self._plos = min(self._plos + 1, 15)
+
+        if self.W_REGISTER <= command < self.R_RX_PL_WID:
+            reg = command & 0x1F
+
+            if reg == self.STATUS:
+                cleared = data[1] & (self.RX_DR | self.TX_DS | self.MAX_RT)
+                status &= ~cleared
+
+                if cleared & self.MAX_RT:
+                    self._max_rt_counted = False
+
+            elif reg in self.SHADOWED_REGISTERS:
+                self._shadow[reg] = data[1]
+
+            if reg == self.RF_CH:
+                self._plos = 0
+
+        elif command < self.W_REGISTER and len(data) == 2:
+            reg = command & 0x1F
+
+            if reg in self.SHADOWED_REGISTERS:
+                self._shadow[reg] = response[1]
+
+            elif reg == self.OBSERVE_TX:
+                self._plos           = response[1] >> 4
+                self._max_rt_counted = bool(status & self.MAX_RT)
+
+        # NOTE: payload writes change TX_FULL and flushes change the FIFOs, the next
+        # command tells the new STATUS
+        if command < self.W_TX_PAYLOAD or command == self.NOP:
+            self._status = status
+        else:
+            self._status = None
+
+        return response
+
+
+    def _nrf_read_reg(self: "CustomNRF24", reg: int, count: int) -> Any:
+        if count == 1 and reg in self._shadow:
+            return bytearray([self._shadow[reg]])
+
+        return super()._nrf_read_reg(reg, count)
+
+
+    def _nrf_write_reg(self: "CustomNRF24", reg: int, arg: Any) -> None:
+        value = arg[0] if isinstance(arg, list) and len(arg) == 1 else arg
+
+        # NOTE: opening a pipe rewrites the whole FEATURE register
+        if reg == self.FEATURE and isinstance(value, int):
+            value = arg = value | self._feature_sticky
+
+        if reg != self.RF_CH and isinstance(value, int) and self._shadow.get(reg) == value:
+            return
+
+        super()._nrf_write_reg(reg, arg)
+        return
+
+
+    def _write_ce(self: "CustomNRF24", level: int) -> None:
+        if self._ce_level != level:
+            self._pi.write(self._ce_pin, level)
+            self._ce_level = level
+        return
+
+
+    def set_ce(self: "CustomNRF24") -> None:
+        self._write_ce(1)
+        return
+
+
+    def unset_ce(self: "CustomNRF24") -> None:
+        self._write_ce(0)
+        return
+
+
+    # :::: hot path ::::
+    def send(self: "CustomNRF24", data: Any) -> None:
+        """
+        Same as the base `send` but, when the radio is not transmitting and the last
+        STATUS had no TX_FULL nor MAX_RT, it skips reading STATUS again as none of
+        them can be set while in RX mode
+        """
+
+        if not isinstance(data, list):
+            data = list(data)
+
+        if self._power_tx or self._status is None or self._status & (self.TX_FULL | self.MAX_RT):
+            status = self.get_status()
+            if status & (self.TX_FULL | self.MAX_RT):
+                self.flush_tx()
+
+        if self._payload_size >= RF24_PAYLOAD.MIN:
+            data = self._make_fixed_width(data, self._payload_size, self._padding)
+
+        self._nrf_command([self.W_TX_PAYLOAD] + data)
+        self.power_up_tx()
+        return
+
+
+    def reset_plos(self: "CustomNRF24") -> None:
+        if self._plos == 0:
+            return
+
+        super().reset_plos()
+        return
+
+
+    def get_packages_lost(self: "CustomNRF24") -> int:
+        if self._plos is None:
+            return super().get_packages_lost()
+
+        return self._plos
+
+
+    def get_status(self: "CustomNRF24") -> int:
+        return self._nrf_xfer(self._nop_command)[0]
+
+
+    def get_payload_into(self: "CustomNRF24", buffer: bytearray) -> int:
+        """
+        Same as `get_payload` but the payload is copied into `buffer`, which needs
+        room for 32 bytes, and its length is returned (0 if the frame was corrupted
+        and dropped). The commands are prebuilt, so the responses of the transport
+        are the only objects created. CE is not toggled, RX_DR can be cleared in any
+        mode
+        """
+
+        if self._payload_size < RF24_PAYLOAD.MIN:
+            width = self._nrf_xfer(self._width_command)[1]
+        else:
+            width = self._payload_size
+
+        # NOTE: a corrupted width, the datasheet asks to flush the RX FIFO
+        if width > RF24_PAYLOAD.MAX:
+            self.flush_rx()
+            return 0
+
+        buffer[:width] = self._nrf_xfer(self._payload_commands[width])[1:]
+        self._nrf_xfer(self._clear_rx_command)
+
+        return width
+
+
+    def data_ready(self: "CustomNRF24") -> bool:
+        """
+        RX_P_NO reads 0b111 when the RX FIFO is empty, so unlike the base
+        `data_ready` there is no need to read FIFO_STATUS
+        """
+
+        status = self.get_status()
+
+        return bool(status & self.RX_DR) or ((status >> 1) & 0x07) != self.RX_P_NO_EMPTY
+
+
+    def carrier_detected(self: "CustomNRF24") -> bool:
+        """
+        Reads the received power detector (RPD), set while someone transmits on the
+        channel. It is only valid after ~170 us in RX mode, which is where
+        `wait_until_sent` leaves the radio after every frame
+        """
+
+        return bool(self._nrf_read_reg(self.RPD, 1)[0] & 0x01)
+
+
+    def _enable_features(self: "CustomNRF24", bits: int) -> None:
+        """
+        Sets FEATURE bits that survive opening the pipes again, which rewrites the
+        whole register
+        """
+
+        self._feature_sticky |= bits
+        feature = self._nrf_read_reg(self.FEATURE, 1)[0]
+
+        self.unset_ce()
+        self._nrf_write_reg(self.FEATURE, feature | bits)
+        self.set_ce()
+        return
+
+
+    def enable_dynamic_ack(self: "CustomNRF24") -> None:
+        """
+        Enables the `W_TX_PAYLOAD_NO_ACK` command
+        """
+
+        self._enable_features(self.EN_DYN_ACK)
+        return
+
+
+    def enable_ack_payloads(self: "CustomNRF24") -> None:
+        """
+        Enables the ACK payloads on every pipe, whatever payload size they were
+        opened with. The pipes still need dynamic payloads
+        """
+
+        self._enable_features(self.EN_DPL | self.EN_ACK_PAY)
+        return
+
+
+    def read_ack_payload(self: "CustomNRF24") -> bytes | None:
+        """
+        Takes the next payload out of the RX FIFO, `None` if it is empty. Meant for
+        the ACK payloads read after every frame sent: unlike `get_payload` it skips
+        clearing RX_DR (`data_ready` does not need it) and toggling CE, and it
+        reuses the STATUS of the last command if it is known
+        """
+
+        status = self._status if self._status is not None else self.get_status()
+
+        if ((status >> 1) & 0x07) == self.RX_P_NO_EMPTY:
+            return None
+
+        width   = self._nrf_command([self.R_RX_PL_WID, self.NOP])[1]
+        payload = bytes(self._nrf_read_reg(self.R_RX_PAYLOAD, width))
+
+        # NOTE: the STATUS shifted out while reading was the one before the payload
+        # left the FIFO
+        self._status = None
+
+        return payload
+
+
+    def write_ack_payload(self: "CustomNRF24", pipe: int, data: bytes) -> bool:
+        """
+        Same as `ack_payload` but returns whether there was room for the payload in
+        the TX FIFO, if there was not the radio ignores it
+        """
+
+        status = self._nrf_command([self.W_ACK_PAYLOAD | (pipe & 0x07)] + list(data))[0]
+        return not status & self.TX_FULL
+
+
+    def send_no_ack(self: "CustomNRF24", data: bytes) -> None:
+        """
+        Same as `send` but the frame is not acknowledged by the receivers, so it can
+        be sent to many of them at once
+        """
+
+        # flush TX if buffers are full or max retries is set
+        status = self.get_status()
+        if status & (self.TX_FULL | self.MAX_RT):
+            self.flush_tx()
+
+        self._nrf_command([self.W_TX_PAYLOAD_NO_ACK] + list(data))
+        self.power_up_tx()
+        return
+
+
+    def enable_reading_pipe(self: "CustomNRF24", pipe: int) -> None:
+        """
+        Enables again a pipe closed with `close_reading_pipe` keeping its address
+        """
+
+        en_rxaddr = self._nrf_read_reg(self.EN_RXADDR, 1)[0]
+
+        self.unset_ce()
+        self._nrf_write_reg(self.EN_RXADDR, en_rxaddr | (1 << pipe))
+        self.set_ce()
+        return
+    
+
+    # :::: pipelined transmission ::::
+    # NOTE: the radio sends everything in its TX FIFO back to back while it stays
+    # in TX mode with CE high, so several frames can be queued without waiting for
+    # the ACK of each one (see `send_frames_windowed` in `link.py`)
+    def write_payload(self: "CustomNRF24", data: Any) -> int:
+        """
+        Queues a payload in the TX FIFO without changing the mode of the radio.
+        Returns STATUS as it was before the write
+        """
+
+        if not isinstance(data, list):
+            data = list(data)
+
+        if self._payload_size >= RF24_PAYLOAD.MIN:
+            data = self._make_fixed_width(data, self._payload_size, self._padding)
+
+        return self._nrf_command([self.W_TX_PAYLOAD] + data)[0]
+
+
+    def get_fifo_status(self: "CustomNRF24") -> tuple[int, int]:
+        """
+        Returns STATUS and FIFO_STATUS with a single SPI transaction
+        """
+
+        response = self._nrf_xfer([self.R_REGISTER | self.FIFO_STATUS, self.NOP])
+        return response[0], response[1]
+
+
+    def clear_tx_ds(self: "CustomNRF24") -> None:
+        self._nrf_write_reg(self.STATUS, self.TX_DS)
+        return
+
+
+    def restart_tx(self: "CustomNRF24") -> None:
+        """
+        Clears MAX_RT so the radio starts again with the payload at the head of the
+        TX FIFO, which it keeps after giving up on it
+        """
+
+        self.unset_ce()
+        self._nrf_write_reg(self.STATUS, self.MAX_RT)
+        self.set_ce()
+        return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
@@ -0,0 +1,354 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from multiprocessing import shared_memory
+from collections import deque
+from pathlib import Path
+from typing import Any
+import multiprocessing
+import hashlib
+import queue
+import time
+
+from console import INFO
+from link import DATA_SIZE
+from frame_codec import FrameCodec
+from storage import (
+    PARTIAL_SUFFIX,
+    WriteBehindSink,
+)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# NOTE: the workers are forked, they inherit the rings and the dictionary instead
+# of having them pickled, and the shared memory is never attached twice
+CONTEXT = multiprocessing.get_context("fork")
+
+DECODE_RING_SLOTS   = 1024 # frames waiting for every worker, 33 KiB of shared memory
+DECODE_BATCH_FRAMES = 64   # decoded frames sent to the writer at once
+DECODE_POLL_S       = 0.5  # how often the processes are checked while waiting for them
+
+# NOTE: an idle worker sleeps instead of blocking on its ring, a blocked worker
+# would make the radio process wake it up (a syscall) for every frame
+DECODE_IDLE_S = 1e-3
+
+SLOT_SIZE = 1 + DATA_SIZE # payload length, then the payload
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: SHARED RING ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class SharedRing:
+    """
+    Ring of payload slots in shared memory, written by the radio process and read
+    by a single worker. Two semaphores count the free and the filled slots, they
+    are also what makes the payload written by one process visible to the other.
+
+    `put` never blocks: when the ring is full the frame waits in a backlog of the
+    radio process and goes in with the next one. A slot of length 0 ends the stream
+    """
+
+    def __init__(self: "SharedRing", slots: int = DECODE_RING_SLOTS) -> None:
+        self.slots = slots
+
+        self.shm    = shared_memory.SharedMemory(create = True, size = slots * SLOT_SIZE)
+        self.free   = CONTEXT.Semaphore(slots)
+        self.filled = CONTEXT.Semaphore(0)
+
+        self.overflows    = 0
+        self.peak_backlog = 0
+
+        self._index = 0 # next slot of this side, the producer and the consumer keep their own
+        self._backlog: deque[bytes] = deque()
+        return
+
+
+    def _write(self: "SharedRing", payload: Any) -> None:
+        offset = self._index * SLOT_SIZE
+
+        self.shm.buf[offset] = len(payload)
+        self.shm.buf[offset+1:offset+1+len(payload)] = payload
+
+        self._index = (self._index + 1) % self.slots
+        self.filled.release()
+        return
+
+
+    def put(self: "SharedRing", payload: Any) -> None:
+        """
+        Copies the payload into the next slot, `payload` can be reused as soon as it
+        returns
+        """
+
+        while self._backlog and self.free.acquire(False):
+            self._write(self._backlog.popleft())
+
+        if not self._backlog and self.free.acquire(False):
+            self._write(payload)
+            return
+
+        self._backlog.append(bytes(payload))
+        self.overflows   += 1
+        self.peak_backlog = max(self.peak_backlog, len(self._backlog))
+        return
+
+
+    def close(self: "SharedRing") -> None:
+        """
+        Waits until the backlog fits in the ring and ends the stream
+        """
+
+        while self._backlog:
+            self.free.acquire()
+            self._write(self._backlog.popleft())
+
+        self.free.acquire()
+        self._write(b"")
+        return
+
+
+    def get(self: "SharedRing", block: bool = True) -> bytes | None:
+        """
+        Next payload of the ring, `None` if there is none and `block` is not set.
+        Raises `EOFError` once the stream has ended
+        """
+
+        if not self.filled.acquire(block):
+            return None
+
+        offset  = self._index * SLOT_SIZE
+        length  = self.shm.buf[offset]
+        payload = bytes(self.shm.buf[offset+1:offset+1+length])
+
+        self._index = (self._index + 1) % self.slots
+        self.free.release()
+
+        if length == 0:
+            raise EOFError
+
+        return payload
+
+
+    def release(self: "SharedRing") -> None:
+        self.shm.close()
+        self.shm.unlink()
+        return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: WORKERS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def decode_worker(ring: SharedRing, results: Any, dictionary: bytes | None) -> None:
+    """
+    Decodes the frames of its ring in order and hands them to the writer in
+    batches, a frame that cannot be decoded is replaced by the description of the
+    error. The end of the ring is passed on as `None`
+    """
+
+    codec = FrameCodec(dictionary) if dictionary is not None else None
+    batch: list[bytes | str] = []
+
+    while True:
+        try:
+            frame = ring.get(block = False)
+
+        except EOFError:
+            if batch:
+                results.put(batch)
+            results.put(None)
+            return
+
+        # NOTE: nothing else is waiting, do not hold back what is decoded
+        if frame is None:
+            if batch:
+                results.put(batch)
+                batch = []
+
+            time.sleep(DECODE_IDLE_S)
+            continue
+
+        try:
+            batch.append(codec.decode_frame(frame) if codec is not None else frame)
+        except ValueError as e:
+            batch.append(f"Could not decode frame: {e}")
+
+        if len(batch) >= DECODE_BATCH_FRAMES:
+            results.put(batch)
+            batch = []
+
+
+
+def write_output(results: list[Any], path: Path, done: Any) -> None:
+    """
+    Takes the decoded frames of the workers in the order they were received and
+    writes them to `path`, hashing the content on the way. Frame `n` was given to
+    worker `n % workers` and every worker keeps the order of its ring, so taking
+    one frame of every worker in turn restores the order. Reports the bytes
+    written, the SHA-256 of the content and the first error through `done`
+    """
+
+    sink    = WriteBehindSink(path)
+    digest  = hashlib.sha256()
+    pending = [deque() for _ in results]
+    ended   = [False] * len(results)
+    error   = None
+    worker  = 0
+
+    while True:
+        if not pending[worker]:
+            batch = results[worker].get()
+
+            # NOTE: the first worker to run out of frames had the next one, which
+            # never arrived
+            if batch is None:
+                ended[worker] = True
+                break
+
+            pending[worker].extend(batch)
+            continue
+
+        chunk = pending[worker].popleft()
+
+        if isinstance(chunk, str):
+            error = error or chunk
+        elif error is None:
+            digest.update(chunk)
+            sink.write(chunk)
+
+        worker = (worker + 1) % len(results)
+
+    for idx, worker_results in enumerate(results):
+        while not ended[idx]:
+            ended[idx] = worker_results.get() is None
+
+    if error is not None:
+        sink.abort()
+        done.put((0, "", error))
+        return
+
+    try:
+        written = sink.commit()
+    except OSError as e:
+        done.put((0, "", f"Could not write {path}: {e}"))
+        return
+
+    done.put((written, digest.hexdigest(), None))
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: PIPELINE :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class DecodePipeline:
+    """
+    Output file whose frames are decoded, hashed and written by other processes,
+    so that work never takes the GIL from the loop that drains the radio. It is
+    used like a `WriteBehindSink`: the receive loop only copies every raw payload
+    into the shared memory ring of the next worker, in turn. The workers decode
+    their frames with the dictionary codec, if a dictionary is given, and a writer
+    process puts them back in order into the file.
+
+    The processes are forked when the pipeline is created, before the session, so
+    the first frames do not wait for them
+    """
+
+    def __init__(self: "DecodePipeline", path: Path, dictionary: bytes | None = None, workers: int = 2, ring_slots: int = DECODE_RING_SLOTS) -> None:
+        self.path   = path
+        self.frames = 0
+        self.digest = ""
+
+        self.rings   = [SharedRing(ring_slots) for _ in range(workers)]
+        self.results = [CONTEXT.Queue() for _ in range(workers)]
+        self.done    = CONTEXT.Queue()
+
+        self.workers = [
+            CONTEXT.Process(target = decode_worker, args = (ring, results, dictionary), name = f"decode {idx}", daemon = True)
+            for idx, (ring, results) in enumerate(zip(self.rings, self.results))
+        ]
+        self.writer = CONTEXT.Process(target = write_output, args = (self.results, path, self.done), name = "writer", daemon = True)
+
+        for process in self.workers + [self.writer]:
+            process.start()
+
+        return
+
+
+    def write(self: "DecodePipeline", chunk: bytes) -> None:
+        self.rings[self.frames % len(self.rings)].put(chunk)
+        self.frames += 1
+        return
+
+
+    def _release(self: "DecodePipeline") -> None:
+        for ring in self.rings:
+            ring.release()
+
+        return
+
+
+    def _crashed(self: "DecodePipeline") -> bool:
+        return any(process.exitcode not in (None, 0) for process in self.workers + [self.writer])
+
+
+    def commit(self: "DecodePipeline") -> int:
+        """
+        Waits for the workers and the writer to finish. Returns the number of bytes
+        written and keeps the SHA-256 of the content in `digest`. Raises
+        `ValueError` if a frame could not be decoded, the file could not be written
+        or one of the processes died
+        """
+
+        # NOTE: a dead worker would never free the slots of its ring
+        if self._crashed():
+            self.abort()
+            raise ValueError("A process of the decode pipeline died")
+
+        for ring in self.rings:
+            ring.close()
+
+        while True:
+            try:
+                written, self.digest, error = self.done.get(timeout = DECODE_POLL_S)
+                break
+
+            except queue.Empty:
+                if self._crashed():
+                    self.abort()
+                    raise ValueError("A process of the decode pipeline died")
+
+        for process in self.workers + [self.writer]:
+            process.join()
+
+        self._release()
+
+        if error is not None:
+            raise ValueError(error)
+
+        return written
+
+
+    def abort(self: "DecodePipeline") -> None:
+        for process in self.workers + [self.writer]:
+            process.terminate()
+            process.join()
+
+        self._release()
+        self.path.with_name(self.path.name + PARTIAL_SUFFIX).unlink(missing_ok = True)
+        return
+
+
+    def report(self: "DecodePipeline") -> None:
+        overflows = sum(ring.overflows for ring in self.rings)
+        backlog   = max(ring.peak_backlog for ring in self.rings)
+
+        INFO(f"Decode pipeline: {self.frames} frames over {len(self.workers)} workers | ring full {overflows} times (peak backlog {backlog} frames)")
+        return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
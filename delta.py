@@ -0,0 +1,293 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+import hashlib
+import math
+import struct
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+MIN_BLOCK_SIZE = 128
+MAX_BLOCK_SIZE = 4096
+
+STRONG_HASH_SIZE = 8
+
+# block size, number of blocks
+SIGNATURE_HEADER = struct.Struct("<II")
+# weak (rolling) checksum, strong hash
+SIGNATURE_ENTRY  = struct.Struct(f"<I{STRONG_HASH_SIZE}s")
+# block size, length of the new file, strong hash of the new file
+DELTA_HEADER     = struct.Struct(f"<II{STRONG_HASH_SIZE}s")
+
+OP_COPY    = 0x00 # followed by the first block index and the number of blocks
+OP_LITERAL = 0x01 # followed by the number of bytes and the bytes themselves
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: HELPER FUNCTIONS :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def choose_block_size(content_len: int) -> int:
+    """
+    Chooses the block size for a file of `content_len` bytes. Like rsync we use
+    the square root of the length, so that the signatures and the literal data
+    that a small edit costs grow at the same pace
+    """
+
+    block_size = math.isqrt(content_len)
+    block_size = (block_size + 31) // 32 * 32 # NOTE: multiple of the frame size
+
+    return max(MIN_BLOCK_SIZE, min(MAX_BLOCK_SIZE, block_size))
+
+
+
+def weak_checksum(block: bytes) -> tuple[int, int]:
+    """
+    Returns the two 16 bit halves `(a, b)` of the rsync rolling checksum of the
+    block
+    """
+
+    block_len = len(block)
+
+    a = sum(block) & 0xFFFF
+    b = sum((block_len - i) * byte for i, byte in enumerate(block)) & 0xFFFF
+
+    return a, b
+
+
+
+def strong_hash(block: bytes) -> bytes:
+    """
+    Returns the strong hash used to confirm the matches of the weak checksum
+    """
+    return hashlib.blake2b(block, digest_size = STRONG_HASH_SIZE).digest()
+
+
+
+def pack_varint(value: int) -> bytes:
+    """
+    Encodes an unsigned integer using 7 bits per byte, the MSB indicates that
+    more bytes follow
+    """
+
+    out = bytearray()
+
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+
+    out.append(value)
+
+    return bytes(out)
+
+
+
+def unpack_varint(data: bytes, offset: int) -> tuple[int, int]:
+    """
+    Decodes an unsigned integer encoded with `pack_varint` starting at `offset`.
+    Returns the value and the offset of the next byte
+    """
+
+    value = 0
+    shift = 0
+
+    while True:
+        byte    = data[offset]
+        offset += 1
+        value  |= (byte & 0x7F) << shift
+        shift  += 7
+
+        if not byte & 0x80:
+            return value, offset
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: SIGNATURES :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def compute_signatures(content: bytes) -> bytes:
+    """
+    Computes the signature of every full block of the file that the receiver
+    already has and packs them to be sent over the reverse channel. An empty file
+    produces a signature without blocks
+    """
+
+    block_size = choose_block_size(len(content))
+    blocks_len = len(content) // block_size
+
+    signatures = bytearray(SIGNATURE_HEADER.pack(block_size, blocks_len))
+
+    for idx in range(blocks_len):
+        block = content[idx * block_size:(idx + 1) * block_size]
+        a, b  = weak_checksum(block)
+
+        signatures += SIGNATURE_ENTRY.pack(a | (b << 16), strong_hash(block))
+
+    return bytes(signatures)
+
+
+
+def unpack_signatures(signatures: bytes) -> tuple[int, list[tuple[int, bytes]]]:
+    """
+    Unpacks the signatures generated by `compute_signatures`. Returns the block
+    size and a list with the `(weak, strong)` pair of every block
+    """
+
+    block_size, blocks_len = SIGNATURE_HEADER.unpack_from(signatures, 0)
+
+    entries = [
+        SIGNATURE_ENTRY.unpack_from(signatures, SIGNATURE_HEADER.size + idx * SIGNATURE_ENTRY.size)
+        for idx in range(blocks_len)
+    ]
+
+    return block_size, entries
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: DELTA ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def encode_delta(content: bytes, signatures: bytes) -> bytes:
+    """
+    Encodes the new version of the file as a sequence of literal data and
+    references to blocks that the receiver already has. The flow is the following:
+
+    1. The signatures are indexed by their weak checksum
+
+    2. A window of `block_size` bytes is slided over the new file one byte at a
+    time, updating the weak checksum in constant time
+
+    3. When the weak checksum matches, the strong hash confirms it. Consecutive
+    matched blocks are merged into a single copy operation and the window jumps
+    over the matched block
+
+    4. Everything that did not match is sent as literal data
+    """
+
+    block_size, entries = unpack_signatures(signatures)
+
+    table: dict[int, list[int]] = {}
+    for idx, (weak, _) in enumerate(entries):
+        table.setdefault(weak, []).append(idx)
+
+    content_len = len(content)
+    delta       = bytearray(DELTA_HEADER.pack(block_size, content_len, strong_hash(content)))
+
+    # NOTE: `run_start`/`run_len` hold the pending copy operation, merged lazily
+    run_start     = 0
+    run_len       = 0
+    literal_start = 0
+
+    def flush_run() -> None:
+        nonlocal run_len
+
+        if run_len:
+            delta.append(OP_COPY)
+            delta.extend(pack_varint(run_start))
+            delta.extend(pack_varint(run_len))
+            run_len = 0
+
+    def flush_literal(end: int) -> None:
+        if literal_start < end:
+            flush_run()
+            delta.append(OP_LITERAL)
+            delta.extend(pack_varint(end - literal_start))
+            delta.extend(content[literal_start:end])
+
+
+    idx = 0
+    if table and content_len >= block_size:
+        a, b = weak_checksum(content[:block_size])
+
+    while table and idx + block_size <= content_len:
+        candidates = table.get(a | (b << 16))
+
+        if candidates:
+            strong = strong_hash(content[idx:idx + block_size])
+            match  = None
+
+            for block_idx in candidates:
+                if entries[block_idx][1] == strong:
+                    match = block_idx
+
+                    # NOTE: prefer the block that extends the pending copy
+                    if block_idx == run_start + run_len:
+                        break
+
+            if match is not None:
+                flush_literal(idx)
+
+                if run_len and match == run_start + run_len and literal_start == idx:
+                    run_len += 1
+                else:
+                    flush_run()
+                    run_start = match
+                    run_len   = 1
+
+                idx          += block_size
+                literal_start = idx
+
+                if idx + block_size <= content_len:
+                    a, b = weak_checksum(content[idx:idx + block_size])
+
+                continue
+
+
+        # roll the window one byte
+        if idx + block_size < content_len:
+            out_byte = content[idx]
+            in_byte  = content[idx + block_size]
+
+            a = (a - out_byte + in_byte) & 0xFFFF
+            b = (b - block_size * out_byte + a) & 0xFFFF
+
+        idx += 1
+
+    flush_literal(content_len)
+    flush_run()
+
+    return bytes(delta)
+
+
+
+def apply_delta(old_content: bytes, delta: bytes) -> bytes:
+    """
+    Rebuilds the new version of the file from the old one and the delta generated
+    by `encode_delta`. Raises `ValueError` if the result does not match the hash of
+    the file that the transmitter had
+    """
+
+    block_size, content_len, expected_hash = DELTA_HEADER.unpack_from(delta, 0)
+
+    content = bytearray()
+    offset  = DELTA_HEADER.size
+
+    while offset < len(delta):
+        op      = delta[offset]
+        offset += 1
+
+        if op == OP_COPY:
+            first_block, offset     = unpack_varint(delta, offset)
+            blocks_len, offset      = unpack_varint(delta, offset)
+
+            content += old_content[first_block * block_size:(first_block + blocks_len) * block_size]
+
+        elif op == OP_LITERAL:
+            literal_len, offset = unpack_varint(delta, offset)
+
+            content += delta[offset:offset + literal_len]
+            offset  += literal_len
+
+        else:
+            raise ValueError(f"Unknown delta operation {op:#04x}")
+
+    if len(content) != content_len or strong_hash(content) != expected_hash:
+        raise ValueError("Reconstructed file does not match the transmitted one")
+
+    return bytes(content)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
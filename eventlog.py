@@ -0,0 +1,292 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from collections import Counter
+from pathlib import Path
+from typing import Iterator
+import threading
+import argparse
+import struct
+import time
+import csv
+import sys
+
+from console import (
+    ERROR,
+    INFO,
+)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# NOTE: the hot loops only pack a fixed size record into a preallocated buffer, the
+# formatting happens afterwards with the decoder of this file:
+#
+#     python eventlog.py event_log.bin
+#     python eventlog.py event_log.bin --csv > events.csv
+EVENT_LOG_MAGIC = b"NRF24EVT"
+
+HEADER = struct.Struct("<8sHq")   # magic, record size, wall clock minus monotonic clock (ns)
+RECORD = struct.Struct("<QIHBB")  # monotonic clock (ns), frame index, value, event, retries
+
+EVENT_LOG_CAPACITY = 16_384 # records, 256 KiB
+EVENT_LOG_FLUSH_S  = 0.5    # the writer thread also wakes up when half the buffer is used
+
+FRAME_DELIVERED = 1  # retries: MAX_RT cycles the frame needed
+FRAME_LOST      = 2  # retries: MAX_RT cycles so far
+TX_TIMEOUT      = 3
+FRAME_RECEIVED  = 4  # frame: frames received so far
+RX_TIMEOUT      = 5  # frame: frames received, value: timeout (ms)
+SESSION_OPEN    = 6  # frame: frames announced, value: session ID
+SESSION_CLOSE   = 7  # frame: frames received, value: session ID
+CREDIT_STALL    = 8  # frame: frames delivered, value: probes sent
+RECORDS_DROPPED = 9  # frame: records that did not fit in the buffer
+
+EVENT_NAMES = {
+    FRAME_DELIVERED: "FRAME_DELIVERED",
+    FRAME_LOST:      "FRAME_LOST",
+    TX_TIMEOUT:      "TX_TIMEOUT",
+    FRAME_RECEIVED:  "FRAME_RECEIVED",
+    RX_TIMEOUT:      "RX_TIMEOUT",
+    SESSION_OPEN:    "SESSION_OPEN",
+    SESSION_CLOSE:   "SESSION_CLOSE",
+    CREDIT_STALL:    "CREDIT_STALL",
+    RECORDS_DROPPED: "RECORDS_DROPPED",
+}
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: EVENT LOG ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class EventLog:
+    """
+    Ring buffer of fixed size records written to `path` by a background thread.
+    There is a single writer (the radio loop) and a single reader (the thread),
+    each one only moves its own index. When the buffer is full the new records
+    are dropped and counted, the radio loop never waits for the disk
+    """
+
+    def __init__(self: "EventLog", path: Path, capacity: int = EVENT_LOG_CAPACITY, flush_s: float = EVENT_LOG_FLUSH_S) -> None:
+        self.path     = path
+        self.capacity = capacity
+        self.flush_s  = flush_s
+
+        self._buffer = bytearray(capacity * RECORD.size)
+        self._head   = 0 # records written, only moved by `record`
+        self._tail   = 0 # records flushed, only moved by the thread
+
+        self.dropped = 0
+
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(EVENT_LOG_MAGIC, RECORD.size, time.time_ns() - time.monotonic_ns()))
+
+        self._wake    = threading.Event()
+        self._stopped = False
+        self._thread  = threading.Thread(target = self._run, name = "event log", daemon = True)
+        self._thread.start()
+        return
+
+
+    def record(self: "EventLog", event: int, frame: int = 0, retries: int = 0, value: int = 0) -> None:
+        head = self._head
+        used = head - self._tail
+
+        if used >= self.capacity:
+            self.dropped += 1
+            return
+
+        RECORD.pack_into(
+            self._buffer,
+            (head % self.capacity) * RECORD.size,
+            time.monotonic_ns(),
+            frame & 0xFFFFFFFF,
+            min(value, 0xFFFF),
+            event,
+            min(retries, 0xFF),
+        )
+        self._head = head + 1
+
+        if used == self.capacity // 2:
+            self._wake.set()
+
+        return
+
+
+    def _flush(self: "EventLog") -> None:
+        """
+        Writes every record up to the current head, in one or two pieces when the
+        ring wraps around
+        """
+
+        head = self._head
+        tail = self._tail
+
+        if head == tail:
+            return
+
+        start = (tail % self.capacity) * RECORD.size
+        end   = (head % self.capacity) * RECORD.size
+        view  = memoryview(self._buffer)
+
+        if start < end:
+            self._file.write(view[start:end])
+        else:
+            self._file.write(view[start:])
+            self._file.write(view[:end])
+
+        self._file.flush()
+        self._tail = head
+        return
+
+
+    def _run(self: "EventLog") -> None:
+        while not self._stopped:
+            self._wake.wait(self.flush_s)
+            self._wake.clear()
+            self._flush()
+
+        return
+
+
+    def close(self: "EventLog") -> None:
+        self._stopped = True
+        self._wake.set()
+        self._thread.join()
+
+        self._flush()
+
+        # NOTE: there is room again, the decoder reports the gap
+        if self.dropped > 0:
+            self.record(RECORDS_DROPPED, self.dropped)
+            self._flush()
+
+        self._file.close()
+        return
+
+
+
+# NOTE: the log of the process, `record` does nothing until `start` is called
+_log: EventLog | None = None
+
+
+
+def start(path: Path, capacity: int = EVENT_LOG_CAPACITY) -> None:
+    global _log
+
+    if _log is not None:
+        _log.close()
+
+    _log = EventLog(path, capacity)
+    return
+
+
+
+def record(event: int, frame: int = 0, retries: int = 0, value: int = 0) -> None:
+    if _log is not None:
+        _log.record(event, frame, retries, value)
+
+    return
+
+
+
+def stop() -> None:
+    """
+    Writes the last records and closes the log, if it was started
+    """
+
+    global _log
+
+    if _log is None:
+        return
+
+    _log.close()
+
+    if _log.dropped > 0:
+        ERROR(f"Event log full, {_log.dropped} records dropped")
+
+    INFO(f"Event log written to {_log.path}")
+
+    _log = None
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: DECODER ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def read_records(path: Path) -> tuple[int, Iterator[tuple[int, int, int, int, int]]]:
+    """
+    Returns the offset between the wall clock and the monotonic clock of the node
+    that wrote the log, and its records as (monotonic ns, frame, value, event,
+    retries). A record cut short at the end of the file is ignored
+    """
+
+    content = path.read_bytes()
+
+    if len(content) < HEADER.size:
+        raise ValueError(f"{path} is too short to be an event log")
+
+    magic, record_size, clock_offset_ns = HEADER.unpack_from(content)
+
+    if magic != EVENT_LOG_MAGIC or record_size != RECORD.size:
+        raise ValueError(f"{path} is not an event log of this version")
+
+    body = memoryview(content)[HEADER.size:]
+    body = body[:len(body) - len(body) % RECORD.size]
+
+    return clock_offset_ns, RECORD.iter_unpack(body)
+
+
+
+def main():
+    """
+    Renders an event log written by `point_to_point_mode.py`, one event per line
+    with the time since the first record, or as CSV with absolute timestamps
+    """
+
+    parser = argparse.ArgumentParser(description = "Decoder of the binary event log")
+    parser.add_argument("path", type = Path)
+    parser.add_argument("--csv", action = "store_true", help = "write CSV to stdout")
+    args = parser.parse_args()
+
+    try:
+        clock_offset_ns, records = read_records(args.path)
+
+    except (OSError, ValueError) as e:
+        ERROR(str(e))
+        sys.exit(1)
+
+    if args.csv:
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["timestamp_ns", "event", "frame", "retries", "value"])
+
+        for timestamp_ns, frame, value, event, retries in records:
+            writer.writerow([timestamp_ns + clock_offset_ns, EVENT_NAMES.get(event, event), frame, retries, value])
+
+        return
+
+    counts: Counter[str] = Counter()
+    first_ns = None
+
+    for timestamp_ns, frame, value, event, retries in records:
+        if first_ns is None:
+            first_ns = timestamp_ns
+
+        name = EVENT_NAMES.get(event, f"EVENT_{event}")
+        counts[name] += 1
+
+        print(f"{(timestamp_ns - first_ns) / 1e6:12.3f} ms  {name:<16} frame {frame:>8}  retries {retries:>3}  value {value:>5}")
+
+    INFO(" | ".join(f"{name}: {count}" for name, count in counts.most_common()) or "The log is empty")
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from pathlib import Path
+from typing import Any
+import struct
+import time
+
+from console import (
+    ERROR,
+    INFO,
+)
+from frame_codec import (
+    FrameCodec,
+    load_dictionary,
+)
+from session import (
+    FLAG_DELTA,
+    FLAG_CODEC,
+    Session,
+    InactivityTimeout,
+    receive_session,
+)
+from storage import WriteBehindSink
+from decode_pipeline import DecodePipeline
+from credit import CreditGrant
+import delta
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: RECEPTION ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def receive_file_session(
+    radio: Any,
+    session: Session,
+    path: Path,
+    timeout: InactivityTimeout,
+    old_content: bytes | None = None,
+    pipeline: DecodePipeline | None = None,
+    credits: CreditGrant | None = None,
+) -> tuple[int, int, float] | None:
+    """
+    Receives the data frames of an accepted session into the file at `path`, used
+    by the receiver and by the offline replay of its captures. The codec and the
+    delta follow the flags of the session. The file is only stored if every frame
+    announced by the SYN and the FIN arrived and could be decoded.
+
+    `old_content` is the copy a delta is applied to, without it the delta is
+    stored as it arrives. If given, `pipeline` decodes and writes the frames
+    instead of this process and `credits` grants the transmitter new frames.
+    Returns the chunks received, the bytes stored and the time elapsed between the
+    first and the last chunk, or `None` if the file was not stored
+    """
+
+    # every chunk goes to the file as soon as it arrives, unless it is a delta that
+    # can only be applied once complete. The decode workers get the chunks as they
+    # are and decode them on their own
+    sink: WriteBehindSink | DecodePipeline = pipeline or WriteBehindSink(path)
+    codec = FrameCodec(load_dictionary()) if session.flags & FLAG_CODEC and pipeline is None else None
+
+    apply_delta   = session.flags & FLAG_DELTA and old_content is not None
+    delta_content = bytearray()
+    decode_errors: list[ValueError] = []
+
+    def on_chunk(chunk: bytes) -> None:
+        # decode every frame on its own
+        if codec is not None:
+            try:
+                chunk = codec.decode_frame(chunk)
+            except ValueError as e:
+                decode_errors.append(e)
+                return
+
+        if apply_delta:
+            delta_content.extend(chunk)
+        else:
+            sink.write(chunk)
+
+        return
+
+
+    # start listening for frames
+    try:
+        received, total_time, sent = receive_session(radio, session, timeout, on_chunk, credits)
+    except KeyboardInterrupt:
+        sink.abort()
+        raise
+
+    if received == 0:
+        sink.abort()
+        ERROR("Did not receive anything")
+        return None
+
+    # NOTE: the chunks are stored as they arrive, a missing or duplicated one would
+    # go unnoticed in the file
+    if received != session.frames or (sent is not None and received != sent):
+        sink.abort()
+        ERROR(f"Received {received} of {session.frames} chunks, " + (f"the FIN says {sent} were sent" if sent is not None else "the FIN never arrived"))
+        return None
+
+    if decode_errors:
+        sink.abort()
+        ERROR(f"Could not decode frame: {decode_errors[0]}")
+        return None
+
+
+    # rebuild the file from the delta
+    if apply_delta:
+        try:
+            sink.write(delta.apply_delta(old_content, bytes(delta_content)))
+        except (ValueError, IndexError, struct.error) as e:
+            sink.abort()
+            ERROR(f"Could not apply the delta: {e}")
+            return None
+
+
+    # store the file
+    tic = time.monotonic()
+
+    try:
+        content_len = sink.commit()
+    except (ValueError, OSError) as e:
+        ERROR(str(e))
+        return None
+
+    INFO(f"Saved {content_len} bytes to: {path} ({(time.monotonic() - tic) * 1000:.1f} ms after the last frame)")
+
+    return received, content_len, total_time
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
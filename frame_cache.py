@@ -0,0 +1,185 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from pathlib import Path
+from typing import Callable
+import hashlib
+import struct
+import os
+
+from console import (
+    WARN,
+    INFO,
+)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+FRAME_CACHE_DIR       = Path(__file__).with_name("frame_cache")
+FRAME_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# NOTE: part of every key, bump it when the frames of the same content and
+# parameters change (framing, codec)
+FRAME_CACHE_VERSION = 1
+
+ENTRY_SUFFIX = ".frames"
+FRAME_LENGTH = struct.Struct("<B") # every frame is stored after its length
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: FRAME CACHE ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def encoding_id(payload_size: int, dictionary: bytes | None = None) -> str:
+    """
+    Describes how the frames of a content are built: plain chunks of
+    `payload_size` bytes or frames of the dictionary codec, which depend on the
+    dictionary too
+    """
+
+    if dictionary is None:
+        return f"chunks-{payload_size}"
+
+    return f"dictionary-{payload_size}-{hashlib.sha256(dictionary).hexdigest()[:16]}"
+
+
+
+class FrameCache:
+    """
+    On-disk cache of the frames of a content, ready to be sent. An entry is keyed
+    by the hash of the content and the encoding, so sending the same file again
+    skips the chunking and the codec. When the entries take more than `max_bytes`
+    the least recently used ones are evicted, the modification time of an entry
+    tells when it was last used
+    """
+
+    def __init__(self: "FrameCache", directory: Path = FRAME_CACHE_DIR, max_bytes: int = FRAME_CACHE_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self.hits   = 0
+        self.misses = 0
+
+        self.directory.mkdir(parents = True, exist_ok = True)
+        return
+
+
+    @staticmethod
+    def key(content: bytes, encoding: str) -> str:
+        digest = hashlib.sha256(content).hexdigest()
+        return f"{digest}-{encoding}-v{FRAME_CACHE_VERSION}"
+
+
+    def _path(self: "FrameCache", key: str) -> Path:
+        return self.directory / f"{key}{ENTRY_SUFFIX}"
+
+
+    def load(self: "FrameCache", key: str) -> list[bytes] | None:
+        """
+        Returns the frames of the entry, `None` if there is none or it is damaged
+        """
+
+        path = self._path(key)
+
+        try:
+            content = path.read_bytes()
+            os.utime(path) # NOTE: most recently used
+
+        except OSError:
+            return None
+
+        packets: list[bytes] = []
+        pos = 0
+
+        while pos < len(content):
+            length = content[pos]
+            pos   += FRAME_LENGTH.size
+
+            if pos + length > len(content):
+                WARN(f"Dropping damaged frame cache entry {path.name}")
+                path.unlink(missing_ok = True)
+                return None
+
+            packets.append(content[pos:pos+length])
+            pos += length
+
+        return packets
+
+
+    def store(self: "FrameCache", key: str, packets: list[bytes]) -> None:
+        """
+        Writes the entry and evicts the least recently used ones beyond the size
+        cap. A cache that cannot be written is not an error, the frames are sent
+        anyway
+        """
+
+        # NOTE: an entry larger than the cap would be the first one evicted
+        if sum(FRAME_LENGTH.size + len(packet) for packet in packets) > self.max_bytes:
+            return
+
+        path    = self._path(key)
+        partial = path.with_name(path.name + ".part")
+
+        try:
+            with open(partial, "wb") as file:
+                for packet in packets:
+                    file.write(FRAME_LENGTH.pack(len(packet)))
+                    file.write(packet)
+
+            os.replace(partial, path)
+
+        except OSError as e:
+            WARN(f"Cannot store the frames in the cache: {e}")
+            partial.unlink(missing_ok = True)
+            return
+
+        self.evict()
+        return
+
+
+    def evict(self: "FrameCache") -> None:
+        entries: list[tuple[float, int, Path]] = []
+
+        for path in self.directory.glob(f"*{ENTRY_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+
+        # NOTE: oldest first, the entry just stored is the newest one
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            path.unlink(missing_ok = True)
+            total -= size
+
+        return
+
+
+    def frames(self: "FrameCache", content: bytes, encoding: str, encode: Callable[[bytes], list[bytes]]) -> list[bytes]:
+        """
+        Returns the frames of `content` from the cache, or builds them with `encode`
+        and stores them for the next time
+        """
+
+        key     = self.key(content, encoding)
+        packets = self.load(key)
+
+        if packets is not None:
+            self.hits += 1
+            INFO(f"{len(packets)} frames taken from the frame cache")
+            return packets
+
+        self.misses += 1
+        packets = encode(content)
+        self.store(key, packets)
+
+        return packets
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
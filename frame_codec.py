@@ -0,0 +1,289 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from collections import Counter
+from pathlib import Path
+import re
+import sys
+
+from link import DATA_SIZE
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+DICTIONARY_PATH = Path(__file__).parent / "frame_dictionary.bin"
+
+DICTIONARY_SIZE = 4096 # NOTE: offsets are encoded with 12 bits
+
+MIN_MATCH = 3          # NOTE: a match costs 2 bytes, shorter ones do not pay off
+MAX_MATCH = MIN_MATCH + 15
+
+MAX_CANDIDATES = 16    # NOTE: positions checked for every 3 byte prefix
+
+# first byte of every frame
+FRAME_RAW        = 0x00
+FRAME_DICTIONARY = 0x01
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: TRAINING :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def train_dictionary(samples: list[bytes], size: int = DICTIONARY_SIZE) -> bytes:
+    """
+    Builds a static dictionary out of representative samples. Words and pairs of
+    words are scored by the bytes they would save over the whole corpus and the
+    best ones are concatenated until the dictionary is full
+    """
+
+    counter: Counter[bytes] = Counter()
+
+    for sample in samples:
+        words = re.findall(rb"\s*\S+", sample)
+
+        counter.update(words)
+        counter.update(a + b for a, b in zip(words, words[1:]))
+
+    segments = sorted(
+        (
+            segment
+            for segment in counter
+            if MIN_MATCH <= len(segment) <= MAX_MATCH
+        ),
+        key = lambda segment: (len(segment) - 2) * counter[segment],
+        reverse = True,
+    )
+
+    dictionary = bytearray()
+    for segment in segments:
+        if len(dictionary) + len(segment) > size:
+            continue
+
+        if segment in dictionary:
+            continue
+
+        dictionary += segment
+
+    return bytes(dictionary)
+
+
+
+def load_dictionary(path: Path = DICTIONARY_PATH) -> bytes:
+    """
+    Loads the dictionary shipped with both nodes
+    """
+    return path.read_bytes()
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CODEC ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class FrameCodec:
+    """
+    Frame level codec based on a static dictionary. Every frame is a small LZSS
+    stream whose matches can only point to the dictionary, so each frame can be
+    decoded on its own even if the previous ones were lost.
+
+    Frame layout:
+
+    +--------+-----------------------------------------------------------+
+    | Byte 0 | Rest of the frame                                         |
+    +--------+-----------------------------------------------------------+
+    | 0x00   | Raw plaintext                                             |
+    +--------+-----------------------------------------------------------+
+    | 0x01   | Groups of one flag byte followed by up to 8 tokens. A set |
+    |        | flag bit (LSB first) is a 2 byte match `offset << 4 | len` |
+    |        | and a clear one is a literal byte                         |
+    +--------+-----------------------------------------------------------+
+    """
+
+    def __init__(self: "FrameCodec", dictionary: bytes, payload_size: int = DATA_SIZE) -> None:
+        assert len(dictionary) <= DICTIONARY_SIZE, "The dictionary does not fit in 12 bit offsets"
+
+        self.dictionary   = dictionary
+        self.payload_size = payload_size
+
+        # index the dictionary by the 3 byte prefix of every position
+        self._index: dict[bytes, list[int]] = {}
+        for offset in range(len(dictionary) - MIN_MATCH + 1):
+            candidates = self._index.setdefault(dictionary[offset:offset + MIN_MATCH], [])
+
+            if len(candidates) < MAX_CANDIDATES:
+                candidates.append(offset)
+
+        return
+
+
+    def _longest_match(self: "FrameCodec", content: bytes, pos: int) -> tuple[int, int]:
+        """
+        Returns the `(offset, length)` of the longest dictionary match for the
+        content starting at `pos`, the length is 0 if there is no match
+        """
+
+        best_offset = 0
+        best_len    = 0
+
+        candidates = self._index.get(content[pos:pos + MIN_MATCH])
+        if not candidates:
+            return best_offset, best_len
+
+        max_len = min(MAX_MATCH, len(content) - pos)
+
+        for offset in candidates:
+            match_len = MIN_MATCH
+            limit     = min(max_len, len(self.dictionary) - offset)
+
+            while match_len < limit and self.dictionary[offset + match_len] == content[pos + match_len]:
+                match_len += 1
+
+            if match_len > best_len:
+                best_offset = offset
+                best_len    = match_len
+
+                if best_len == max_len:
+                    break
+
+        return best_offset, best_len
+
+
+    def encode_frame(self: "FrameCodec", content: bytes, pos: int) -> tuple[bytes, int]:
+        """
+        Packs as much content starting at `pos` as fits in one frame. Returns the
+        frame and the position of the first byte that did not fit
+        """
+
+        raw_end = min(pos + self.payload_size - 1, len(content))
+
+        frame = bytearray([FRAME_DICTIONARY])
+        end   = pos
+
+        # NOTE: a new group needs room for the flag byte and at least one token
+        while end < len(content) and len(frame) + 2 <= self.payload_size:
+            flags_idx = len(frame)
+            frame.append(0)
+
+            for bit in range(8):
+                if end >= len(content):
+                    break
+
+                offset, match_len = self._longest_match(content, end)
+
+                if match_len:
+                    if len(frame) + 2 > self.payload_size:
+                        break
+
+                    frame[flags_idx] |= 1 << bit
+                    frame += ((offset << 4) | (match_len - MIN_MATCH)).to_bytes(2, "big")
+                    end   += match_len
+
+                else:
+                    if len(frame) + 1 > self.payload_size:
+                        break
+
+                    frame.append(content[end])
+                    end += 1
+
+        # NOTE: fall back to a raw frame when the dictionary does not help
+        if end <= raw_end:
+            return bytes([FRAME_RAW]) + content[pos:raw_end], raw_end
+
+        return bytes(frame), end
+
+
+    def encode_frames(self: "FrameCodec", content: bytes) -> list[bytes]:
+        """
+        Splits the content into independently decodable frames
+        """
+
+        packets = []
+        pos     = 0
+
+        while pos < len(content):
+            frame, pos = self.encode_frame(content, pos)
+            packets.append(frame)
+
+        return packets
+
+
+    def decode_frame(self: "FrameCodec", frame: bytes) -> bytes:
+        """
+        Decodes a single frame. Raises `ValueError` if the frame is malformed
+        """
+
+        if len(frame) == 0:
+            raise ValueError("Empty frame")
+
+        if frame[0] == FRAME_RAW:
+            return bytes(frame[1:])
+
+        if frame[0] != FRAME_DICTIONARY:
+            raise ValueError(f"Unknown frame type {frame[0]:#04x}")
+
+        content = bytearray()
+        idx     = 1
+
+        while idx < len(frame):
+            flags = frame[idx]
+            idx  += 1
+
+            for bit in range(8):
+                if idx >= len(frame):
+                    break
+
+                if flags & (1 << bit):
+                    if idx + 2 > len(frame):
+                        raise ValueError("Truncated match")
+
+                    word      = int.from_bytes(frame[idx:idx + 2], "big")
+                    offset    = word >> 4
+                    match_len = (word & 0x0F) + MIN_MATCH
+
+                    if offset + match_len > len(self.dictionary):
+                        raise ValueError("Match out of the dictionary")
+
+                    content += self.dictionary[offset:offset + match_len]
+                    idx     += 2
+
+                else:
+                    content.append(frame[idx])
+                    idx += 1
+
+        return bytes(content)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: MAIN :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def main():
+    """
+    Trains the dictionary offline and reports the effective bytes per frame:
+
+        python frame_codec.py test_files/*.txt
+    """
+
+    paths   = [Path(arg) for arg in sys.argv[1:]] or sorted(Path("test_files").glob("*.txt"))
+    samples = [path.read_bytes() for path in paths]
+
+    dictionary = train_dictionary(samples)
+    DICTIONARY_PATH.write_bytes(dictionary)
+    print(f"Saved {len(dictionary)} bytes dictionary to: {DICTIONARY_PATH}")
+
+    codec = FrameCodec(dictionary)
+    for path, sample in zip(paths, samples):
+        frames = codec.encode_frames(sample)
+        print(f"{path}: {len(sample) / len(frames):.2f} plaintext bytes per frame ({len(frames)} frames)")
+
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from nrf24 import NRF24
+
+from typing import (
+    Callable,
+    Sequence,
+)
+import struct
+import time
+
+from console import (
+    WARN,
+    INFO,
+    reset_line,
+    progress_bar,
+)
+from custom_nrf24 import CustomNRF24
+from channel_access import ChannelAccess
+from tdma import TDMASlot
+import eventlog
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+DATA_SIZE = 32
+
+TX_FIFO_DEPTH = 3
+
+PROGRESS_EVERY = 100 # NOTE: redrawing the progress bar on every frame is slower than the radio
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: FRAMING ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def chunk_content(content: bytes, size: int = DATA_SIZE) -> list[bytes]:
+    """
+    Splits the content into chunks of `size` bytes and packs them for future
+    transmission
+    """
+
+    chunks = [
+        content[i:i+size]
+        for i in range(0, len(content), size)
+    ]
+
+    packets = []
+    for chunk in chunks:
+        packets.append(struct.pack(f"<{len(chunk)}s", chunk))
+
+    return packets
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: TRANSMISSION :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def send_frame(nrf: NRF24, packet: bytes, channel: ChannelAccess | TDMASlot | None = None, deadline: float | None = None) -> int | None:
+    """
+    Sends a single frame, trying again until it gets acknowledged. Returns the
+    number of retries that were needed. If given, `channel` is acquired before
+    every attempt. Gives up once `time.monotonic()` passes `deadline`, if given,
+    and returns `None`
+    """
+
+    num_retries = 0
+    lost        = False
+
+    while True:
+        if deadline is not None and time.monotonic() > deadline:
+            # NOTE: the lost frame would go out ahead of the next one
+            if lost:
+                nrf.flush_tx()
+            return None
+
+        if channel is not None:
+            channel.acquire()
+
+        nrf.reset_packages_lost()
+        send_attempt(nrf, packet, lost)
+
+        try:
+            nrf.wait_until_sent()
+
+        except TimeoutError:
+            eventlog.record(eventlog.TX_TIMEOUT)
+
+        if nrf.get_packages_lost() == 0:
+            if channel is not None:
+                channel.delivered()
+
+            return num_retries
+
+        num_retries += nrf.get_retries()
+        lost         = True
+
+        if channel is not None:
+            channel.lost()
+
+
+
+def send_attempt(nrf: NRF24, packet: bytes, resend: bool) -> None:
+    """
+    Starts an attempt of sending the frame. A frame that reached MAX_RT is still at
+    the head of the TX FIFO and is sent again from there, keeping its PID: if only
+    the ACK was lost the receiver drops the copy instead of taking it as a new
+    frame. Writing the payload again would give it a new PID
+    """
+
+    if not resend:
+        nrf.send(packet)
+        return
+
+    # NOTE: `wait_until_sent` went back to RX mode when it saw MAX_RT, going back to
+    # TX mode clears MAX_RT and restarts the frame, as `restart_tx` does in TX mode
+    nrf.power_up_tx()
+    return
+
+
+
+def send_frames(nrf: NRF24, packets: Sequence[bytes], channel: ChannelAccess | TDMASlot | None = None, deadline: float | None = None, idle_s: float | None = None) -> int:
+    """
+    Sends all the frames in a stop & wait fashion, a frame is not sent until the
+    previous one has been acknowledged. If given, `channel` is acquired before
+    every attempt. Gives up once `time.monotonic()` passes `deadline` or once no
+    frame has been delivered for `idle_s`, if given. Returns the number of frames
+    delivered. The lost attempts go to the event log,
+    printing them would slow down the link when it is already struggling.
+
+    `packets` may grow while it is being sent (see `ScheduledFrames`), its length
+    is checked again before every frame
+    """
+
+    lost_total     = 0
+    idx            = 0
+    last_delivered = time.monotonic()
+
+    while idx < (packets_len := len(packets)):
+
+        num_retries = 0
+        lost        = 0
+        
+        # NOTE: we try to send the same frame until it gets sent correctly
+        while True:
+
+            expired = deadline is not None and time.monotonic() > deadline
+            stalled = idle_s is not None and time.monotonic() - last_delivered > idle_s
+
+            if expired or stalled:
+                # NOTE: the lost frame would go out ahead of the next transfer
+                if lost > 0:
+                    nrf.flush_tx()
+
+                report_lost(lost_total)
+                return idx
+
+            if idx % PROGRESS_EVERY == 0 or idx == packets_len - 1:
+                progress_bar(
+                    active_msg     = f"Sending frame {idx}, retries {num_retries}",
+                    finished_msg   = f"All frames sent",
+                    current_status = idx + 1,
+                    max_status     = packets_len,
+                )
+
+            if channel is not None:
+                channel.acquire()
+
+            nrf.reset_packages_lost()
+            send_attempt(nrf, packets[idx], lost > 0)
+
+            try:
+                nrf.wait_until_sent()
+                
+            except TimeoutError:
+                eventlog.record(eventlog.TX_TIMEOUT, idx)
+
+            if nrf.get_packages_lost() == 0:
+                eventlog.record(eventlog.FRAME_DELIVERED, idx, lost)
+                last_delivered = time.monotonic()
+
+                if channel is not None:
+                    channel.delivered()
+                break
+
+            else:
+                lost       += 1
+                lost_total += 1
+                eventlog.record(eventlog.FRAME_LOST, idx, lost)
+
+                num_retries += nrf.get_retries()
+
+                if channel is not None:
+                    channel.lost()
+
+        idx += 1
+
+    report_lost(lost_total)
+    return idx
+
+
+
+def send_frames_windowed(nrf: CustomNRF24, packets: Sequence[bytes], window: int, channel: ChannelAccess | TDMASlot | None = None, deadline: float | None = None) -> int:
+    """
+    Same as `send_frames` but up to `window` frames (1 to `TX_FIFO_DEPTH`) are
+    queued in the TX FIFO at once. The radio stays in TX mode and sends them back
+    to back, instead of going back to RX mode after every frame. A frame that
+    reaches MAX_RT stays at the head of the FIFO, so the radio is just restarted
+    and the order of the frames is kept
+    """
+
+    window = min(max(window, 1), TX_FIFO_DEPTH)
+
+    written = 0 # frames written to the TX FIFO
+    queued  = 0 # frames still in the TX FIFO, never less than the real number
+
+    lost_total = 0
+
+    nrf.flush_tx()
+    nrf.power_up_tx()
+
+    # NOTE: `packets` may grow while it is being sent, as in `send_frames`
+    while written < (packets_len := len(packets)) or queued > 0:
+        if deadline is not None and time.monotonic() > deadline:
+            break
+
+        status, fifo_status = nrf.get_fifo_status()
+
+        if status & nrf.MAX_RT:
+            eventlog.record(eventlog.FRAME_LOST, written - queued)
+            lost_total += 1
+            nrf.restart_tx()
+
+            if channel is not None:
+                channel.lost()
+            continue
+
+        if status & nrf.TX_DS:
+            nrf.clear_tx_ds()
+            eventlog.record(eventlog.FRAME_DELIVERED, written - queued)
+            queued -= 1
+
+            if channel is not None:
+                channel.delivered()
+
+        # NOTE: TX_DS is a single flag, if several frames were delivered since the
+        # last poll only one is counted. The FIFO flags correct the count
+        if fifo_status & nrf.FTX_EMPTY:
+            queued = 0
+        elif fifo_status & nrf.FTX_FULL:
+            queued = TX_FIFO_DEPTH
+        else:
+            queued = min(max(queued, 1), TX_FIFO_DEPTH - 1)
+
+        if written < packets_len and queued < window:
+            if channel is not None:
+                channel.acquire()
+
+            nrf.write_payload(packets[written])
+            written += 1
+            queued  += 1
+
+            if written % PROGRESS_EVERY == 0 or written == packets_len:
+                progress_bar(
+                    active_msg     = f"Sending frame {written - 1}, {queued} queued",
+                    finished_msg   = f"All frames sent",
+                    current_status = written,
+                    max_status     = packets_len,
+                )
+
+    # NOTE: back to RX mode, where `send_frames` leaves the radio too
+    delivered = written - queued
+    nrf.flush_tx()
+    nrf.power_up_rx()
+
+    report_lost(lost_total)
+    return delivered
+
+
+
+def report_lost(lost: int) -> None:
+    """
+    One line for the whole transfer instead of one per lost attempt
+    """
+
+    if lost > 0:
+        reset_line() # NOTE: the progress bar may not have finished
+        WARN(f"{lost} attempts were lost and retried")
+
+    return
+
+
+
+def send_blob(nrf: NRF24, content: bytes) -> None:
+    """
+    Sends a whole block of bytes preceded by its header. The header is retried
+    until it is acknowledged, so this can be used to talk back to a node that is
+    not listening yet
+    """
+
+    packets = chunk_content(content)
+
+    send_frame(nrf, struct.pack("i", len(packets)))
+    send_frames(nrf, packets)
+
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: RECEPTION ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def wait_for_header(nrf: NRF24) -> int:
+    """
+    Blocks until the header frame arrives and returns the number of frames that
+    the transmitter is going to send
+    """
+
+    while not nrf.data_ready():
+        pass
+
+    header_packet = nrf.get_payload()
+    total_chunks  = struct.unpack("i", header_packet[:4])[0] # NOTE: the default size of an int is 4 bytes
+
+    return total_chunks
+
+
+
+def receive_frames(nrf: NRF24, total_chunks: int, timeout_s: float, on_chunk: Callable[[bytes], None] | None = None) -> tuple[list[bytes], float]:
+    """
+    Listens for `total_chunks` data frames or until no frame has arrived for
+    `timeout_s` seconds. Returns the received chunks and the time elapsed between
+    the first and the last one. If given, `on_chunk` is called with every chunk as
+    soon as it arrives
+    """
+
+    # list that will contain all the received chunks
+    chunks: list[bytes] = []
+
+    received_chunks = 0 # NOTE: not the ID
+    throughput_tic  = None
+
+    tic = time.monotonic()
+    tac = time.monotonic()
+    while received_chunks < total_chunks and (tac - tic) < timeout_s:
+        tac = time.monotonic()
+
+        # check if there are frames
+        while nrf.data_ready():
+
+            if throughput_tic is None:
+                throughput_tic = time.monotonic()
+
+            packet = nrf.get_payload()
+
+            chunk = struct.unpack(f"<{len(packet)}s", packet)[0] # NOTE: the struct.unpack method returs more things than just the data
+            chunks.append(chunk)
+
+            if on_chunk is not None:
+                on_chunk(chunk)
+            
+
+            # display the progress of the transmission
+            received_chunks += 1
+            eventlog.record(eventlog.FRAME_RECEIVED, received_chunks)
+
+            if received_chunks % PROGRESS_EVERY == 0 or received_chunks == total_chunks:
+                progress_bar(
+                    active_msg     = f"Receiving chunks",
+                    finished_msg   = f"All chunks received",
+                    current_status = received_chunks,
+                    max_status     = total_chunks,
+                )
+        
+            tic = time.monotonic()
+
+    throughput_tac = time.monotonic()
+
+    if throughput_tic is None:
+        return chunks, 0.0
+
+    if received_chunks != total_chunks:
+        eventlog.record(eventlog.RX_TIMEOUT, received_chunks, value = int(timeout_s * 1000))
+        WARN("Connection timed-out")
+
+        # NOTE: `tic` holds the arrival time of the last frame
+        return chunks, tic - throughput_tic
+
+    return chunks, throughput_tac - throughput_tic
+
+
+
+def receive_blob(nrf: NRF24, timeout_s: float) -> bytes | None:
+    """
+    Receives a block of bytes sent with `send_blob`. Returns `None` if some frame
+    was missing
+    """
+
+    total_chunks = wait_for_header(nrf)
+    INFO(f"Expecting {total_chunks} chunks")
+
+    chunks, _ = receive_frames(nrf, total_chunks, timeout_s)
+
+    if len(chunks) != total_chunks:
+        return None
+
+    return b"".join(chunks)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
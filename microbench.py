@@ -0,0 +1,336 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Callable
+import tracemalloc
+import tempfile
+import platform
+import argparse
+import struct
+import json
+import time
+import sys
+import os
+
+from console import (
+    ERROR,
+    SUCC,
+    WARN,
+    INFO,
+    progress_bar,
+)
+from link import (
+    DATA_SIZE,
+    chunk_content,
+)
+from storage import WriteBehindSink
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+BENCH_FILES = (
+    Path(__file__).with_name("test_files") / "lorem.txt",
+    Path(__file__).with_name("test_files") / "quijote.txt",
+)
+
+BENCH_BASELINE_PATH = Path(__file__).with_name("microbench_baseline.json")
+
+# NOTE: the reassembly of `quick_mode.py` copies the whole content for every frame,
+# over the full files it would take minutes. Every stage runs over the first
+# `BENCH_FRAMES` frames of the file, 0 for all of them
+BENCH_FRAMES  = 10_000
+BENCH_REPEATS = 5
+
+# NOTE: a stage is flagged when it is this much slower than its baseline, timings
+# of a busy host easily move by 10-20%
+BENCH_TOLERANCE = 0.30
+
+Stage = Callable[[bytes, list[bytes], Path], object]
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: STAGES :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# NOTE: every stage processes the whole content or every one of its frames, the
+# cost is then divided by the number of frames. `scratch` is an empty directory
+def chunking(content: bytes, packets: list[bytes], scratch: Path) -> object:
+    return chunk_content(content)
+
+
+
+def struct_pack(content: bytes, packets: list[bytes], scratch: Path) -> object:
+    for packet in packets:
+        struct.pack(f"<{len(packet)}s", packet)
+
+    return None
+
+
+
+def progress_rendering(content: bytes, packets: list[bytes], scratch: Path) -> object:
+    """
+    A redraw for every frame, `link.py` only redraws every `PROGRESS_EVERY`
+    """
+
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for idx in range(len(packets)):
+            progress_bar(
+                active_msg     = f"Sending frame {idx}, retries 0",
+                finished_msg   = f"All frames sent",
+                current_status = idx + 1,
+                max_status     = len(packets),
+            )
+
+    return None
+
+
+
+def reassembly_concat(content: bytes, packets: list[bytes], scratch: Path) -> object:
+    """
+    As in `quick_mode.py`
+    """
+
+    reassembled = bytes()
+
+    for packet in packets:
+        reassembled += struct.unpack(f"<{len(packet)}s", packet)[0]
+
+    return reassembled
+
+
+
+def reassembly_join(content: bytes, packets: list[bytes], scratch: Path) -> object:
+    """
+    As in `receive_blob`
+    """
+
+    chunks = [struct.unpack(f"<{len(packet)}s", packet)[0] for packet in packets]
+    return b"".join(chunks)
+
+
+
+def reassembly_bytearray(content: bytes, packets: list[bytes], scratch: Path) -> object:
+    """
+    As in the receivers of `point_to_point_mode.py` (delta content, demultiplexer)
+    """
+
+    reassembled = bytearray()
+
+    for packet in packets:
+        reassembled += packet
+
+    return reassembled
+
+
+
+def file_write(content: bytes, packets: list[bytes], scratch: Path) -> object:
+    """
+    As in `quick_mode.py`, the whole file at once after the last frame
+    """
+
+    with open(scratch / "received_file.txt", "wb") as file:
+        file.write(b"".join(packets))
+        file.flush()
+        os.fsync(file.fileno())
+
+    return None
+
+
+
+def file_write_behind(content: bytes, packets: list[bytes], scratch: Path) -> object:
+    """
+    As in `point_to_point_mode.py`, every frame goes to the sink as it arrives
+    """
+
+    sink = WriteBehindSink(scratch / "received_file.txt")
+
+    for packet in packets:
+        sink.write(packet)
+
+    return sink.commit()
+
+
+
+STAGES: dict[str, Stage] = {
+    "chunking":             chunking,
+    "struct.pack":          struct_pack,
+    "progress rendering":   progress_rendering,
+    "reassembly +=":        reassembly_concat,
+    "reassembly join":      reassembly_join,
+    "reassembly bytearray": reassembly_bytearray,
+    "file write":           file_write,
+    "file write-behind":    file_write_behind,
+}
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: BENCHMARK ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def measure_stage(stage: Stage, content: bytes, packets: list[bytes], repeats: int) -> tuple[float, int]:
+    """
+    Returns the best time per frame in nanoseconds over `repeats` runs, and the
+    peak of memory allocated by the stage in bytes, measured in a separate run
+    as tracing slows every allocation down
+    """
+
+    best_ns = None
+
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory() as scratch:
+            tic     = time.perf_counter_ns()
+            stage(content, packets, Path(scratch))
+            elapsed = time.perf_counter_ns() - tic
+
+        best_ns = elapsed if best_ns is None else min(best_ns, elapsed)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        tracemalloc.start()
+        stage(content, packets, Path(scratch))
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return (best_ns or 0) / len(packets), peak_bytes
+
+
+
+def run_benchmarks(files: list[Path], frames: int, repeats: int) -> dict[str, dict[str, dict[str, float]]]:
+    """
+    Runs every stage against every file. Returns {file: {stage: {"ns_per_frame",
+    "peak_kib"}}}
+    """
+
+    results: dict[str, dict[str, dict[str, float]]] = {}
+
+    for path in files:
+        content = path.read_bytes()
+
+        if frames > 0:
+            content = content[:frames * DATA_SIZE]
+
+        packets = chunk_content(content)
+        INFO(f"{path.name}: {len(packets)} frames, {len(content)} bytes")
+
+        results[path.name] = {}
+
+        for name, stage in STAGES.items():
+            ns_per_frame, peak_bytes = measure_stage(stage, content, packets, repeats)
+
+            results[path.name][name] = {
+                "ns_per_frame": round(ns_per_frame, 1),
+                "peak_kib":     round(peak_bytes / 1024, 1),
+            }
+            print(f"    {name:<22} {ns_per_frame:>10.1f} ns/frame | peak {peak_bytes / 1024:>9.1f} KiB")
+
+    return results
+
+
+
+def host_description() -> dict[str, str]:
+    return {
+        "machine": platform.machine(),
+        "python":  platform.python_version(),
+        "node":    platform.node(),
+    }
+
+
+
+def compare_with_baseline(results: dict[str, dict[str, dict[str, float]]], baseline: dict, tolerance: float) -> list[str]:
+    """
+    Returns a description of every stage slower than its baseline by more than
+    `tolerance`
+    """
+
+    regressions: list[str] = []
+
+    for file_name, stages in results.items():
+        for name, measured in stages.items():
+            reference = baseline["results"].get(file_name, {}).get(name)
+
+            if reference is None or reference["ns_per_frame"] <= 0:
+                continue
+
+            ratio = measured["ns_per_frame"] / reference["ns_per_frame"]
+
+            if ratio > 1 + tolerance:
+                regressions.append(f"{file_name} / {name}: {measured['ns_per_frame']:.1f} ns/frame, baseline {reference['ns_per_frame']:.1f} ({(ratio - 1) * 100:+.0f}%)")
+
+    return regressions
+
+
+
+def main():
+    """
+    Measures the host side stages of a transfer without any radio: chunking and
+    packing the frames, rendering the progress bar, reassembling the content and
+    writing the file. Every stage is compared with the stored baseline:
+
+        python microbench.py --save-baseline   # on a known good commit
+        python microbench.py                   # exits with 1 on a regression
+
+    The baseline is only meaningful on the host it was measured on
+    """
+
+    parser = argparse.ArgumentParser(description = "Host side microbenchmarks of the framing and reassembly")
+    parser.add_argument("--file", type = Path, action = "append", help = "file to run the stages against, the test files by default")
+    parser.add_argument("--frames", type = int, default = BENCH_FRAMES, help = "frames of every file, 0 for all of them")
+    parser.add_argument("--repeats", type = int, default = BENCH_REPEATS)
+    parser.add_argument("--baseline", type = Path, default = BENCH_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action = "store_true", help = "store the results as the new baseline")
+    parser.add_argument("--tolerance", type = float, default = BENCH_TOLERANCE)
+    args = parser.parse_args()
+
+    files   = args.file or list(BENCH_FILES)
+    missing = [path for path in files if not path.is_file()]
+
+    if missing:
+        ERROR(f"Missing benchmark files: {', '.join(str(path) for path in missing)}")
+        sys.exit(1)
+
+    results = run_benchmarks(files, args.frames, args.repeats)
+    run     = {"host": host_description(), "frames": args.frames, "results": results}
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(run, indent = 4) + "\n")
+        SUCC(f"Baseline saved to {args.baseline}")
+        return
+
+    if not args.baseline.is_file():
+        INFO(f"No baseline at {args.baseline}, store one with --save-baseline")
+        return
+
+    try:
+        baseline = json.loads(args.baseline.read_text())
+
+    except (OSError, ValueError) as e:
+        ERROR(f"Cannot read the baseline {args.baseline}: {e}")
+        sys.exit(1)
+
+    if baseline.get("frames") != args.frames:
+        WARN(f"The baseline was measured over {baseline.get('frames')} frames per file, not comparing")
+        return
+
+    if baseline.get("host") != run["host"]:
+        WARN(f"The baseline comes from another host ({baseline.get('host')}), the comparison may not be meaningful")
+
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+
+    if regressions:
+        for regression in regressions:
+            ERROR(f"Regression: {regression}")
+        sys.exit(1)
+
+    SUCC(f"No stage is more than {args.tolerance * 100:.0f}% slower than the baseline")
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+import struct
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+MC_HEADER_SIZE = 3        # NOTE: 24 bit sequence number, enough for ~500 MB files
+
+MC_CONTROL = 0xFFFFFF     # NOTE: sequence number reserved for control frames
+
+# control frames from the sender
+MC_ANNOUNCE = 0x01        # total frames
+MC_POLL     = 0x02        # round, feedback window in ms, total frames
+MC_DONE     = 0x03        # no more repair rounds
+
+# feedback frames from the receivers
+MC_NACK = ord("N")
+
+NACK_HEADER     = struct.Struct("<BB")   # MC_NACK, round
+NACK_RANGE_SIZE = 5                      # 24 bit first frame, 16 bit number of frames
+MAX_NACK_RANGES = (32 - NACK_HEADER.size) // NACK_RANGE_SIZE
+
+ANNOUNCE = struct.Struct("<3sBI")
+POLL     = struct.Struct("<3sBBHI")
+DONE     = struct.Struct("<3sB")
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: FRAMES :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+_CONTROL_PREFIX = MC_CONTROL.to_bytes(MC_HEADER_SIZE, "little")
+
+
+
+def pack_data(seq: int, payload: bytes) -> bytes:
+    """
+    Prepends the sequence number to a data frame
+    """
+
+    assert seq < MC_CONTROL, "Sequence number out of range"
+
+    return seq.to_bytes(MC_HEADER_SIZE, "little") + payload
+
+
+
+def pack_announce(total_frames: int) -> bytes:
+    """
+    Control frame announcing the number of frames of the transfer
+    """
+    return ANNOUNCE.pack(_CONTROL_PREFIX, MC_ANNOUNCE, total_frames)
+
+
+
+def pack_poll(round_idx: int, window_ms: int, total_frames: int) -> bytes:
+    """
+    Control frame opening a feedback window, receivers with gaps answer with NACKs
+    during the next `window_ms` milliseconds
+    """
+    return POLL.pack(_CONTROL_PREFIX, MC_POLL, round_idx & 0xFF, window_ms, total_frames)
+
+
+
+def pack_done() -> bytes:
+    """
+    Control frame closing the transfer
+    """
+    return DONE.pack(_CONTROL_PREFIX, MC_DONE)
+
+
+
+def parse_frame(frame: bytes) -> tuple[int, tuple]:
+    """
+    Classifies a frame sent by the multicast sender. Returns `(seq, (payload,))`
+    for data frames and `(MC_CONTROL, (kind, *fields))` for control frames
+    """
+
+    seq = int.from_bytes(frame[:MC_HEADER_SIZE], "little")
+
+    if seq != MC_CONTROL:
+        return seq, (bytes(frame[MC_HEADER_SIZE:]),)
+
+    kind = frame[MC_HEADER_SIZE]
+
+    if kind == MC_ANNOUNCE:
+        return MC_CONTROL, (kind, ANNOUNCE.unpack_from(frame)[2])
+
+    if kind == MC_POLL:
+        _, _, round_idx, window_ms, total_frames = POLL.unpack_from(frame)
+        return MC_CONTROL, (kind, round_idx, window_ms, total_frames)
+
+    return MC_CONTROL, (kind,)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: NACKS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def missing_ranges(received: bytearray) -> list[tuple[int, int]]:
+    """
+    Returns the `(start, count)` ranges of the frames that are missing from the
+    bitmap, where every byte is 1 if the frame has been received
+    """
+
+    ranges = []
+    start  = received.find(0)
+
+    while start != -1:
+        end = received.find(1, start)
+        if end == -1:
+            end = len(received)
+
+        ranges.append((start, end - start))
+        start = received.find(0, end)
+
+    return ranges
+
+
+
+def aggregate_ranges(ranges: list[tuple[int, int]], max_ranges: int) -> list[tuple[int, int]]:
+    """
+    Reduces the number of ranges to `max_ranges` merging the ones separated by the
+    smallest amount of received frames. The result covers every missing frame at
+    the cost of requesting some frames again
+    """
+
+    ranges = list(ranges)
+
+    while len(ranges) > max_ranges:
+        # find the smallest hole between two consecutive ranges
+        idx = min(
+            range(len(ranges) - 1),
+            key = lambda i: ranges[i + 1][0] - (ranges[i][0] + ranges[i][1]),
+        )
+
+        start = ranges[idx][0]
+        end   = ranges[idx + 1][0] + ranges[idx + 1][1]
+        ranges[idx:idx + 2] = [(start, end - start)]
+
+    return ranges
+
+
+
+def pack_nacks(round_idx: int, ranges: list[tuple[int, int]], max_frames: int) -> list[bytes]:
+    """
+    Packs the missing ranges into at most `max_frames` NACK frames. If there are
+    too many ranges they are aggregated first
+    """
+
+    # NOTE: a range count is 16 bits, longer ranges are split
+    split = []
+    for start, count in ranges:
+        while count > 0xFFFF:
+            split.append((start, 0xFFFF))
+            start += 0xFFFF
+            count -= 0xFFFF
+        split.append((start, count))
+
+    split  = aggregate_ranges(split, max_frames * MAX_NACK_RANGES)
+    frames = []
+
+    for idx in range(0, len(split), MAX_NACK_RANGES):
+        frame = bytearray(NACK_HEADER.pack(MC_NACK, round_idx & 0xFF))
+
+        for start, count in split[idx:idx + MAX_NACK_RANGES]:
+            frame += start.to_bytes(3, "little") + count.to_bytes(2, "little")
+
+        frames.append(bytes(frame))
+
+    return frames
+
+
+
+def unpack_nack(frame: bytes) -> tuple[int, list[tuple[int, int]]] | None:
+    """
+    Returns the `(round, ranges)` of a NACK frame or `None` if it is not one
+    """
+
+    if len(frame) < NACK_HEADER.size or frame[0] != MC_NACK:
+        return None
+
+    _, round_idx = NACK_HEADER.unpack_from(frame)
+    ranges       = []
+
+    for offset in range(NACK_HEADER.size, len(frame) - NACK_RANGE_SIZE + 1, NACK_RANGE_SIZE):
+        start = int.from_bytes(frame[offset:offset + 3], "little")
+        count = int.from_bytes(frame[offset + 3:offset + 5], "little")
+        ranges.append((start, count))
+
+    return round_idx, ranges
+
+
+
+def union_of_ranges(ranges: list[tuple[int, int]], total_frames: int) -> list[int]:
+    """
+    Returns the sorted sequence numbers covered by any of the ranges
+    """
+
+    wanted = bytearray(total_frames)
+
+    for start, count in ranges:
+        end = min(start + count, total_frames)
+        wanted[start:end] = b"\x01" * max(end - start, 0)
+
+    return [seq for seq in range(total_frames) if wanted[seq]]
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
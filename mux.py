@@ -0,0 +1,263 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from typing import Callable
+import struct
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+MUX_HEADER_SIZE = 1
+
+MAX_STREAMS = 16 # NOTE: the stream ID uses the 4 MSB of the header
+
+FLAG_FIN  = 0x01 # last frame of the stream
+FLAG_OPEN = 0x02 # first frame of the stream, the payload is the name of the stream
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: HELPER FUNCTIONS :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def pack_mux_header(stream_id: int, flags: int) -> bytes:
+    """
+    Packs the header that precedes the payload of every multiplexed frame
+    """
+    return struct.pack("B", (stream_id << 4) | flags)
+
+
+
+def unpack_mux_header(frame: bytes) -> tuple[int, int]:
+    """
+    Returns the `(stream_id, flags)` of a multiplexed frame
+    """
+
+    header = frame[0]
+
+    return header >> 4, header & 0x0F
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: SCHEDULER ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class Stream:
+    """
+    Frames of a single logical stream waiting to be scheduled
+    """
+
+    def __init__(self: "Stream", stream_id: int, name: str, packets: list[bytes], priority: int, weight: int) -> None:
+        self.stream_id = stream_id
+        self.priority  = priority
+        self.weight    = weight
+
+        # NOTE: the frames are built eagerly so that `next_frame` only pops
+        self.frames = [pack_mux_header(stream_id, FLAG_OPEN) + name.encode()[:31]]
+        for idx, packet in enumerate(packets):
+            flags = FLAG_FIN if idx == len(packets) - 1 else 0
+            self.frames.append(pack_mux_header(stream_id, flags) + packet)
+
+        if not packets:
+            self.frames.append(pack_mux_header(stream_id, FLAG_FIN))
+
+        self.frames.reverse()
+        return
+
+
+
+class StreamScheduler:
+    """
+    Interleaves the frames of several concurrent streams. Streams with a lower
+    `priority` value are always served first (strict priority) and the streams
+    that share the same priority are served in weighted round robin, `weight`
+    frames at a time
+    """
+
+    def __init__(self: "StreamScheduler") -> None:
+        self._streams: dict[int, Stream] = {}
+
+        self._current_id: int | None = None
+        self._burst_left = 0
+        return
+
+
+    def open_stream(self: "StreamScheduler", name: str, packets: list[bytes], priority: int = 0, weight: int = 1) -> int:
+        """
+        Adds a new stream, it can be called while other streams are being sent.
+        Returns the ID assigned to the stream
+        """
+
+        assert weight >= 1, "Weight must be at least 1"
+
+        free_ids = [
+            stream_id
+            for stream_id in range(MAX_STREAMS)
+            if stream_id not in self._streams
+        ]
+
+        if not free_ids:
+            raise ValueError(f"No more than {MAX_STREAMS} concurrent streams")
+
+        stream_id = free_ids[0]
+        self._streams[stream_id] = Stream(stream_id, name, packets, priority, weight)
+
+        return stream_id
+
+
+    def active_streams(self: "StreamScheduler") -> int:
+        """
+        Number of streams with frames still waiting to be sent
+        """
+        return len(self._streams)
+
+
+    def pending_frames(self: "StreamScheduler") -> int:
+        """
+        Number of frames still waiting to be sent
+        """
+        return sum(len(stream.frames) for stream in self._streams.values())
+
+
+    def next_frame(self: "StreamScheduler") -> bytes | None:
+        """
+        Returns the next frame to send or `None` if every stream has finished
+        """
+
+        if not self._streams:
+            return None
+
+        top_priority = min(stream.priority for stream in self._streams.values())
+        candidates   = sorted(
+            stream_id
+            for stream_id, stream in self._streams.items()
+            if stream.priority == top_priority
+        )
+
+        # move to the next stream of the level once the current one spent its burst
+        if self._current_id not in candidates or self._burst_left == 0:
+            following = [
+                stream_id
+                for stream_id in candidates
+                if self._current_id is None or stream_id > self._current_id
+            ]
+
+            self._current_id = following[0] if following else candidates[0]
+            self._burst_left = self._streams[self._current_id].weight
+
+        stream = self._streams[self._current_id]
+        frame  = stream.frames.pop()
+
+        self._burst_left -= 1
+
+        if not stream.frames:
+            del self._streams[self._current_id]
+
+        return frame
+
+
+
+class ScheduledFrames:
+    """
+    The frames of a scheduler as a sequence that the send loops can go through
+    while new streams are opened. Every frame is taken from the scheduler only when
+    it is about to be sent, so a stream opened in the middle of the transfer is
+    interleaved with the ones already being sent. The length is the frames taken so
+    far plus the ones waiting, it grows with every stream opened.
+
+    If given, `poll` is called before taking every frame, it may open new streams
+    """
+
+    def __init__(self: "ScheduledFrames", scheduler: StreamScheduler, poll: Callable[[], None] | None = None) -> None:
+        self.scheduler = scheduler
+        self.poll      = poll
+
+        self._taken = 0
+        self._last  = b""
+        return
+
+
+    def __len__(self: "ScheduledFrames") -> int:
+        return self._taken + self.scheduler.pending_frames()
+
+
+    def __getitem__(self: "ScheduledFrames", idx: int) -> bytes:
+        """
+        Frames are taken in order, only the last one can be asked for again (a
+        retry)
+        """
+
+        if idx == self._taken - 1:
+            return self._last
+
+        if idx != self._taken:
+            raise IndexError(f"Frame {idx} is not the next one ({self._taken})")
+
+        if self.poll is not None:
+            self.poll()
+
+        frame = self.scheduler.next_frame()
+
+        if frame is None:
+            raise IndexError(f"No frame {idx}, every stream has finished")
+
+        self._taken += 1
+        self._last   = frame
+        return frame
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: DEMULTIPLEXER ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class StreamDemux:
+    """
+    Splits the received frames into their streams. Each stream is handed over to
+    `on_complete(name, content)` as soon as its last frame arrives, without
+    waiting for the rest of the streams. If given, `decode` is applied to the
+    payload of every data frame
+    """
+
+    def __init__(self: "StreamDemux", on_complete: Callable[[str, bytes], None], decode: Callable[[bytes], bytes] | None = None) -> None:
+        self._on_complete = on_complete
+        self._decode      = decode
+
+        self._names: dict[int, str]       = {}
+        self._sinks: dict[int, bytearray] = {}
+        return
+
+
+    def push(self: "StreamDemux", frame: bytes) -> None:
+        """
+        Processes a single multiplexed frame
+        """
+
+        stream_id, flags = unpack_mux_header(frame)
+
+        if flags & FLAG_OPEN:
+            self._names[stream_id] = bytes(frame[MUX_HEADER_SIZE:]).decode(errors = "replace")
+            self._sinks[stream_id] = bytearray()
+            return
+
+        sink = self._sinks.get(stream_id)
+        if sink is None:
+            return # NOTE: the OPEN frame was lost, nothing to attach the data to
+
+        payload = bytes(frame[MUX_HEADER_SIZE:])
+        sink   += self._decode(payload) if self._decode and payload else payload
+
+        if flags & FLAG_FIN:
+            self._on_complete(self._names.pop(stream_id), bytes(self._sinks.pop(stream_id)))
+
+        return
+
+
+    def open_streams(self: "StreamDemux") -> list[str]:
+        """
+        Names of the streams that have not finished yet
+        """
+        return list(self._names.values())
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
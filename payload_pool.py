@@ -0,0 +1,66 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from collections import deque
+
+from link import DATA_SIZE
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: PAYLOAD POOL :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class PayloadPool:
+    """
+    Fixed set of payload buffers allocated once and recycled frame after frame.
+    Buffers are handed out by index, along with the pipe and length of the frame
+    they hold, so moving a frame around never creates an object. Every buffer
+    comes with a view of its whole size, which is what full frames use
+    """
+
+    def __init__(self: "PayloadPool", count: int, size: int = DATA_SIZE) -> None:
+        self.count = count
+        self.size  = size
+
+        self.buffers = [bytearray(size) for _ in range(count)]
+        self.pipes   = [0] * count
+        self.lengths = [0] * count
+
+        self._views = [memoryview(buffer) for buffer in self.buffers]
+
+        self._free = deque(range(count))
+        return
+
+
+    def acquire(self: "PayloadPool") -> int | None:
+        """
+        Index of a free buffer, `None` if all of them are in use
+        """
+
+        if not self._free:
+            return None
+
+        return self._free.popleft()
+
+
+    def release(self: "PayloadPool", index: int) -> None:
+        self._free.append(index)
+        return
+
+
+    def available(self: "PayloadPool") -> int:
+        return len(self._free)
+
+
+    def view(self: "PayloadPool", index: int) -> memoryview:
+        """
+        The frame held by the buffer, valid until the buffer is released. Only the
+        short frames need a new view
+        """
+
+        length = self.lengths[index]
+
+        if length == self.size:
+            return self._views[index]
+
+        return self._views[index][:length]
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
@@ -0,0 +1,853 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from collections import deque
+from typing import Callable
+import socketserver
+import itertools
+import argparse
+import threading
+import random
+import socket
+import struct
+import heapq
+import time
+
+from console import (
+    ERROR,
+    SUCC,
+    INFO,
+)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# pigpio socket commands used by `pigpio.pi` and the `nrf24` library
+CMD_MODES = 0
+CMD_MODEG = 1
+CMD_READ  = 3
+CMD_WRITE = 4
+CMD_BR1   = 10
+CMD_TICK  = 16
+CMD_HWVER = 17
+CMD_NB    = 19
+CMD_NC    = 21
+CMD_PIGPV = 26
+CMD_SPIO  = 71
+CMD_SPIC  = 72
+CMD_SPIR  = 73
+CMD_SPIW  = 74
+CMD_SPIX  = 75
+CMD_NOIB  = 99
+
+PI_OUTPUT = 1
+
+PI_BAD_HANDLE      = -25
+PI_BAD_SPI_COUNT   = -84
+PI_UNKNOWN_COMMAND = -88
+
+PIGPIO_VERSION = 79
+HARDWARE_REV   = 0xA02082
+
+COMMAND = struct.Struct("<IIII")
+
+
+# nRF24L01+ commands
+R_REGISTER          = 0x00
+W_REGISTER          = 0x20
+R_RX_PL_WID         = 0x60
+R_RX_PAYLOAD        = 0x61
+W_TX_PAYLOAD        = 0xA0
+W_ACK_PAYLOAD       = 0xA8
+W_TX_PAYLOAD_NO_ACK = 0xB0
+FLUSH_TX            = 0xE1
+FLUSH_RX            = 0xE2
+REUSE_TX_PL         = 0xE3
+NOP                 = 0xFF
+
+# nRF24L01+ registers
+CONFIG      = 0x00
+EN_AA       = 0x01
+EN_RXADDR   = 0x02
+SETUP_AW    = 0x03
+SETUP_RETR  = 0x04
+RF_CH       = 0x05
+RF_SETUP    = 0x06
+STATUS      = 0x07
+OBSERVE_TX  = 0x08
+RPD         = 0x09
+RX_ADDR_P0  = 0x0A
+RX_ADDR_P1  = 0x0B
+TX_ADDR     = 0x10
+RX_PW_P0    = 0x11
+FIFO_STATUS = 0x17
+DYNPD       = 0x1C
+FEATURE     = 0x1D
+
+# register bits
+PWR_UP      = 1 << 1
+PRIM_RX     = 1 << 0
+EN_CRC      = 1 << 3
+CRCO        = 1 << 2
+RX_DR       = 1 << 6
+TX_DS       = 1 << 5
+MAX_RT      = 1 << 4
+RF_DR_LOW   = 1 << 5
+RF_DR_HIGH  = 1 << 3
+EN_DPL      = 1 << 2
+EN_ACK_PAY  = 1 << 1
+EN_DYN_ACK  = 1 << 0
+
+FIFO_DEPTH = 3
+
+# timing of the radio, in seconds
+TX_SETTLE_S = 130e-6   # standby to TX/RX
+RPD_HOLD_S  = 40e-6    # carrier still detected after the end of a transmission
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: REGISTER MODEL :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class Packet:
+    """
+    Payload waiting in the TX FIFO, either to be transmitted or, in RX mode, to be
+    attached to the ACK of a pipe
+    """
+
+    def __init__(self: "Packet", payload: bytes, pid: int, no_ack: bool = False, ack_pipe: int | None = None) -> None:
+        self.payload  = payload
+        self.pid      = pid
+        self.no_ack   = no_ack
+        self.ack_pipe = ack_pipe
+        return
+
+
+
+class VirtualNRF24:
+    """
+    Register map, FIFOs and SPI command set of a nRF24L01+. Everything related to
+    the air (timing, ACKs, retransmissions) is driven by `Air`
+    """
+
+    def __init__(self: "VirtualNRF24", air: "Air", name: str, ce_level: Callable[[], int]) -> None:
+        self.air      = air
+        self.name     = name
+        self.ce_level = ce_level
+
+        # power-on reset values of the datasheet
+        self.regs = bytearray(0x1E)
+        self.regs[CONFIG]     = 0x08
+        self.regs[EN_AA]      = 0x3F
+        self.regs[EN_RXADDR]  = 0x03
+        self.regs[SETUP_AW]   = 0x03
+        self.regs[SETUP_RETR] = 0x03
+        self.regs[RF_CH]      = 0x02
+        self.regs[RF_SETUP]   = 0x0E
+        for pipe in range(2, 6):
+            self.regs[RX_ADDR_P0 + pipe] = 0xC1 + pipe
+
+        self.addresses = {
+            RX_ADDR_P0: bytearray(b"\xE7" * 5),
+            RX_ADDR_P1: bytearray(b"\xC2" * 5),
+            TX_ADDR:    bytearray(b"\xE7" * 5),
+        }
+
+        self.flags    = 0 # RX_DR | TX_DS | MAX_RT
+        self.arc_cnt  = 0
+        self.plos_cnt = 0
+
+        self.rx_fifo: deque[tuple[int, bytes]] = deque()
+        self.tx_fifo: deque[Packet]            = deque()
+
+        self.busy    = False # NOTE: a packet is on the air or waiting for its ACK
+        self.next_pid = 0
+        self.last_rx: dict[int, tuple[int, bytes]] = {}
+        self.last_ack: dict[int, bytes]            = {}
+        return
+
+
+    # :::: derived state ::::
+    def address_width(self: "VirtualNRF24") -> int:
+        return (self.regs[SETUP_AW] & 0x03) + 2
+
+
+    def channel(self: "VirtualNRF24") -> int:
+        return self.regs[RF_CH] & 0x7F
+
+
+    def data_rate(self: "VirtualNRF24") -> int:
+        """
+        Data rate in bits per second
+        """
+
+        rf_setup = self.regs[RF_SETUP]
+
+        if rf_setup & RF_DR_LOW:
+            return 250_000
+        if rf_setup & RF_DR_HIGH:
+            return 2_000_000
+        return 1_000_000
+
+
+    def crc_bytes(self: "VirtualNRF24") -> int:
+        # NOTE: auto-acknowledgement forces the CRC on
+        if not self.regs[CONFIG] & EN_CRC and not self.regs[EN_AA]:
+            return 0
+        return 2 if self.regs[CONFIG] & CRCO else 1
+
+
+    def auto_retransmit(self: "VirtualNRF24") -> tuple[float, int]:
+        """
+        Returns the auto retransmit delay in seconds and the retransmit count
+        """
+
+        setup_retr = self.regs[SETUP_RETR]
+
+        return ((setup_retr >> 4) + 1) * 250e-6, setup_retr & 0x0F
+
+
+    def listening(self: "VirtualNRF24") -> bool:
+        config = self.regs[CONFIG]
+        return bool(config & PWR_UP and config & PRIM_RX and self.ce_level())
+
+
+    def can_transmit(self: "VirtualNRF24") -> bool:
+        config = self.regs[CONFIG]
+        return bool(config & PWR_UP and not config & PRIM_RX and self.ce_level() and not self.flags & MAX_RT)
+
+
+    def pipe_address(self: "VirtualNRF24", pipe: int) -> bytes:
+        if pipe < 2:
+            return bytes(self.addresses[RX_ADDR_P0 + pipe])
+        return bytes([self.regs[RX_ADDR_P0 + pipe]]) + bytes(self.addresses[RX_ADDR_P1][1:])
+
+
+    def match_pipe(self: "VirtualNRF24", address: bytes) -> int | None:
+        """
+        Returns the enabled pipe that listens on the address, if any
+        """
+
+        width = self.address_width()
+
+        for pipe in range(6):
+            if self.regs[EN_RXADDR] & (1 << pipe) and self.pipe_address(pipe)[:width] == address[:width]:
+                return pipe
+
+        return None
+
+
+    def dynamic_payload(self: "VirtualNRF24", pipe: int) -> bool:
+        return bool(self.regs[FEATURE] & EN_DPL and self.regs[DYNPD] & (1 << pipe))
+
+
+    def status(self: "VirtualNRF24") -> int:
+        rx_p_no = self.rx_fifo[0][0] if self.rx_fifo else 0x07
+        tx_full = 1 if len(self.tx_fifo) >= FIFO_DEPTH else 0
+
+        return self.flags | (rx_p_no << 1) | tx_full
+
+
+    def fifo_status(self: "VirtualNRF24") -> int:
+        tx_full  = len(self.tx_fifo) >= FIFO_DEPTH
+        tx_empty = not self.tx_fifo
+        rx_full  = len(self.rx_fifo) >= FIFO_DEPTH
+        rx_empty = not self.rx_fifo
+
+        return (tx_full << 5) | (tx_empty << 4) | (rx_full << 1) | rx_empty
+
+
+    # :::: air side ::::
+    def receive(self: "VirtualNRF24", pipe: int, packet: Packet) -> bytes | None:
+        """
+        Processes a packet addressed to one of our pipes. Returns the payload of
+        the ACK to send back (empty if there is none), or `None` if no ACK is sent
+        """
+
+        acknowledged = not packet.no_ack and bool(self.regs[EN_AA] & (1 << pipe))
+
+        # NOTE: a retransmission whose ACK was lost, acknowledged with the same ACK
+        # payload but discarded
+        if self.last_rx.get(pipe) == (packet.pid, packet.payload):
+            return self.last_ack.get(pipe, b"") if acknowledged else None
+
+        if len(self.rx_fifo) >= FIFO_DEPTH:
+            return None
+
+        payload = packet.payload
+        if not self.dynamic_payload(pipe):
+            width   = self.regs[RX_PW_P0 + pipe]
+            payload = payload[:width].ljust(width, b"\x00")
+
+        self.rx_fifo.append((pipe, payload))
+        self.last_rx[pipe] = (packet.pid, packet.payload)
+        self.flags |= RX_DR
+
+        if not acknowledged:
+            return None
+
+        self.last_ack[pipe] = self.pop_ack_payload(pipe)
+        return self.last_ack[pipe]
+
+
+    def pop_ack_payload(self: "VirtualNRF24", pipe: int) -> bytes:
+        """
+        Takes the ACK payload queued for the pipe, if any
+        """
+
+        if not self.regs[FEATURE] & EN_ACK_PAY:
+            return b""
+
+        for packet in self.tx_fifo:
+            if packet.ack_pipe == pipe:
+                self.tx_fifo.remove(packet)
+                return packet.payload
+
+        return b""
+
+
+    def next_packet(self: "VirtualNRF24") -> Packet | None:
+        for packet in self.tx_fifo:
+            if packet.ack_pipe is None:
+                return packet
+        return None
+
+
+    # :::: SPI side ::::
+    def _read_register(self: "VirtualNRF24", reg: int, count: int) -> bytes:
+        if reg in self.addresses:
+            value = bytes(self.addresses[reg])
+        elif reg == STATUS:
+            value = bytes([self.status()])
+        elif reg == OBSERVE_TX:
+            value = bytes([(self.plos_cnt << 4) | self.arc_cnt])
+        elif reg == RPD:
+            value = bytes([self.air.carrier_detected(self)])
+        elif reg == FIFO_STATUS:
+            value = bytes([self.fifo_status()])
+        elif reg < len(self.regs):
+            value = bytes([self.regs[reg]])
+        else:
+            value = b""
+
+        return value[:count].ljust(count, b"\x00")
+
+
+    def _write_register(self: "VirtualNRF24", reg: int, data: bytes) -> None:
+        if not data:
+            return
+
+        if reg in self.addresses:
+            self.addresses[reg][:len(data[:5])] = data[:5]
+
+        elif reg == STATUS:
+            self.flags &= ~(data[0] & (RX_DR | TX_DS | MAX_RT))
+
+        elif reg in (OBSERVE_TX, RPD, FIFO_STATUS):
+            pass # NOTE: read only
+
+        elif reg < len(self.regs):
+            self.regs[reg] = data[0]
+
+            if reg == RF_CH:
+                self.plos_cnt = 0
+
+        return
+
+
+    def xfer(self: "VirtualNRF24", data: bytes) -> bytes:
+        """
+        Executes one SPI transaction. As in the real chip, the first byte shifted
+        out is always the STATUS register
+        """
+
+        if not data:
+            return b""
+
+        command = data[0]
+        args    = data[1:]
+        status  = self.status()
+        out     = b""
+
+        if command < W_REGISTER:
+            out = self._read_register(command & 0x1F, len(args))
+
+        elif command < R_RX_PL_WID:
+            self._write_register(command & 0x1F, args)
+
+        elif command == R_RX_PL_WID:
+            width = len(self.rx_fifo[0][1]) if self.rx_fifo else 0
+            out   = bytes([width]).ljust(len(args), b"\x00")
+
+        elif command == R_RX_PAYLOAD:
+            payload = self.rx_fifo.popleft()[1] if self.rx_fifo else b""
+            out     = payload[:len(args)].ljust(len(args), b"\x00")
+
+        elif command in (W_TX_PAYLOAD, W_TX_PAYLOAD_NO_ACK):
+            if len(self.tx_fifo) < FIFO_DEPTH:
+                no_ack = command == W_TX_PAYLOAD_NO_ACK and bool(self.regs[FEATURE] & EN_DYN_ACK)
+
+                self.tx_fifo.append(Packet(bytes(args[:32]), self.next_pid, no_ack = no_ack))
+                self.next_pid = (self.next_pid + 1) & 0x03
+
+        elif command & 0xF8 == W_ACK_PAYLOAD:
+            if len(self.tx_fifo) < FIFO_DEPTH:
+                self.tx_fifo.append(Packet(bytes(args[:32]), 0, ack_pipe = command & 0x07))
+
+        elif command == FLUSH_TX:
+            self.tx_fifo.clear()
+            self.last_ack.clear()
+
+        elif command == FLUSH_RX:
+            self.rx_fifo.clear()
+
+        return bytes([status]) + out
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: AIR MEDIUM :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class Air:
+    """
+    Shared medium for all the emulated radios. It keeps a queue of timed events
+    (start/end of transmissions, ACKs) that is advanced lazily to the current time
+    every time a host talks to its radio, so everything the host can observe
+    through SPI is consistent without running a timer thread.
+
+    Transmissions that overlap on the same channel are lost, and every packet and
+    ACK can also be dropped with probability `loss`
+    """
+
+    def __init__(self: "Air", loss: float = 0.0) -> None:
+        self.lock   = threading.RLock()
+        self.loss   = loss
+        self.radios: list[VirtualNRF24] = []
+
+        self._events: list[tuple[float, int, Callable, tuple]] = []
+        self._seq = itertools.count()
+
+        # (channel, start, end, radio) of the recent transmissions
+        self._on_air: list[tuple[int, float, float, VirtualNRF24]] = []
+        return
+
+
+    def attach(self: "Air", radio: VirtualNRF24) -> None:
+        with self.lock:
+            self.radios.append(radio)
+        return
+
+
+    def detach(self: "Air", radio: VirtualNRF24) -> None:
+        with self.lock:
+            if radio in self.radios:
+                self.radios.remove(radio)
+        return
+
+
+    def _schedule(self: "Air", when: float, action: Callable, *args) -> None:
+        heapq.heappush(self._events, (when, next(self._seq), action, args))
+        return
+
+
+    def advance(self: "Air", now: float) -> None:
+        """
+        Runs every event due up to `now`, in order
+        """
+
+        while self._events and self._events[0][0] <= now:
+            when, _, action, args = heapq.heappop(self._events)
+            action(when, *args)
+
+        # forget the transmissions that can not collide or be detected anymore
+        self._on_air = [entry for entry in self._on_air if entry[2] > now - 0.01]
+        return
+
+
+    def carrier_detected(self: "Air", radio: VirtualNRF24) -> int:
+        """
+        Value of the RPD register, 1 if someone else is transmitting on the channel
+        """
+
+        if not radio.listening():
+            return 0
+
+        now = time.monotonic()
+
+        for channel, start, end, other in self._on_air:
+            if other is not radio and channel == radio.channel() and start <= now <= end + RPD_HOLD_S:
+                return 1
+
+        return 0
+
+
+    def _air_time(self: "Air", radio: VirtualNRF24, payload_len: int) -> float:
+        # preamble, address, packet control field (9 bits), payload and CRC
+        bits = 8 * (1 + radio.address_width() + payload_len + radio.crc_bytes()) + 9
+        return bits / radio.data_rate()
+
+
+    def kick(self: "Air", radio: VirtualNRF24, now: float) -> None:
+        """
+        Starts the next transmission of the radio if it is able to transmit
+        """
+
+        if radio.busy or not radio.can_transmit() or radio.next_packet() is None:
+            return
+
+        radio.busy    = True
+        radio.arc_cnt = 0
+        self._schedule(now + TX_SETTLE_S, self._start_tx, radio, radio.next_packet(), 0)
+        return
+
+
+    def _start_tx(self: "Air", when: float, radio: VirtualNRF24, packet: Packet, attempt: int) -> None:
+        if packet not in radio.tx_fifo or not radio.can_transmit():
+            radio.busy = False
+            return
+
+        end = when + self._air_time(radio, len(packet.payload))
+        self._on_air.append((radio.channel(), when, end, radio))
+        self._schedule(end, self._end_tx, radio, packet, attempt, when)
+        return
+
+
+    def _collided(self: "Air", radio: VirtualNRF24, start: float, end: float) -> bool:
+        return any(
+            other is not radio and channel == radio.channel() and other_start < end and other_end > start
+            for channel, other_start, other_end, other in self._on_air
+        )
+
+
+    def _end_tx(self: "Air", when: float, radio: VirtualNRF24, packet: Packet, attempt: int, start: float) -> None:
+        ack_payload: bytes | None = None
+
+        if not self._collided(radio, start, when) and random.random() >= self.loss:
+            address = bytes(radio.addresses[TX_ADDR])
+
+            for receiver in self.radios:
+                if receiver is radio or not receiver.listening():
+                    continue
+                if receiver.channel() != radio.channel() or receiver.data_rate() != radio.data_rate():
+                    continue
+
+                pipe = receiver.match_pipe(address)
+                if pipe is None:
+                    continue
+
+                ack_payload = receiver.receive(pipe, packet)
+
+                if ack_payload is not None:
+                    ack_end = when + TX_SETTLE_S + self._air_time(receiver, len(ack_payload))
+                    self._on_air.append((receiver.channel(), when + TX_SETTLE_S, ack_end, receiver))
+
+
+        # no acknowledgement expected
+        if packet.no_ack:
+            self._complete(when, radio, packet, attempt, None)
+            return
+
+        # acknowledged, unless the ACK itself gets lost
+        if ack_payload is not None and random.random() >= self.loss:
+            ack_end = when + TX_SETTLE_S + self._air_time(radio, len(ack_payload))
+            self._schedule(ack_end, self._complete, radio, packet, attempt, ack_payload)
+            return
+
+        # retransmit after the auto retransmit delay or give up
+        delay, retries = radio.auto_retransmit()
+
+        if attempt < retries:
+            radio.arc_cnt = attempt + 1
+            self._schedule(when + delay, self._start_tx, radio, packet, attempt + 1)
+        else:
+            self._schedule(when + delay, self._max_rt, radio, packet)
+
+        return
+
+
+    def _complete(self: "Air", when: float, radio: VirtualNRF24, packet: Packet, attempt: int, ack_payload: bytes | None) -> None:
+        radio.busy = False
+
+        if packet not in radio.tx_fifo:
+            return # NOTE: flushed while on the air
+
+        radio.tx_fifo.remove(packet)
+        radio.arc_cnt = attempt
+        radio.flags  |= TX_DS
+
+        if ack_payload and len(radio.rx_fifo) < FIFO_DEPTH:
+            radio.rx_fifo.append((0, ack_payload))
+            radio.flags |= RX_DR
+
+        self.kick(radio, when)
+        return
+
+
+    def _max_rt(self: "Air", when: float, radio: VirtualNRF24, packet: Packet) -> None:
+        radio.busy      = False
+        radio.flags    |= MAX_RT
+        radio.plos_cnt  = min(radio.plos_cnt + 1, 15)
+        return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: VIRTUAL PI :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class VirtualPi:
+    """
+    GPIO and SPI side of a Raspberry Pi with an emulated radio on every SPI device
+    it opens, bound to the last GPIO configured as output (the CE pin). It has the
+    same methods as `pigpio.pi` that the `nrf24` library uses, so it can also be
+    used in-process instead of a connection to the daemon. As pigpiod, errors are
+    returned as negative codes
+    """
+
+    connected = True
+
+    def __init__(self: "VirtualPi", air: Air, name: str = "local") -> None:
+        self.air  = air
+        self.name = name
+
+        self.gpio_levels: dict[int, int]     = {}
+        self.unbound_outputs: list[int]      = []
+        self.radios: dict[int, VirtualNRF24] = {}
+        self._handles = itertools.count()
+        return
+
+
+    def set_mode(self: "VirtualPi", gpio: int, mode: int) -> int:
+        if mode == PI_OUTPUT and gpio not in self.unbound_outputs:
+            self.unbound_outputs.append(gpio)
+        return 0
+
+
+    def get_mode(self: "VirtualPi", gpio: int) -> int:
+        return PI_OUTPUT if gpio in self.gpio_levels else 0
+
+
+    def read(self: "VirtualPi", gpio: int) -> int:
+        return self.gpio_levels.get(gpio, 0)
+
+
+    def read_bank_1(self: "VirtualPi") -> int:
+        return sum(level << gpio for gpio, level in self.gpio_levels.items() if gpio < 32)
+
+
+    def write(self: "VirtualPi", gpio: int, level: int) -> int:
+        with self.air.lock:
+            now = time.monotonic()
+            self.air.advance(now)
+
+            self.gpio_levels[gpio] = 1 if level else 0
+
+            for radio in self.radios.values():
+                self.air.kick(radio, now)
+
+        return 0
+
+
+    def spi_open(self: "VirtualPi", spi_channel: int, baud: int, spi_flags: int = 0) -> int:
+        ce_pin = self.unbound_outputs.pop() if self.unbound_outputs else -1
+        handle = next(self._handles)
+
+        radio = VirtualNRF24(self.air, f"{self.name}/{handle}", lambda: self.gpio_levels.get(ce_pin, 0))
+        self.radios[handle] = radio
+        self.air.attach(radio)
+
+        INFO(f"Radio {radio.name} attached: SPI channel {spi_channel}, CE on GPIO {ce_pin}")
+        return handle
+
+
+    def spi_close(self: "VirtualPi", handle: int) -> int:
+        radio = self.radios.pop(handle, None)
+        if radio is None:
+            return PI_BAD_HANDLE
+
+        self.air.detach(radio)
+        return 0
+
+
+    def spi_xfer(self: "VirtualPi", handle: int, data: bytes | list[int]) -> tuple[int, bytearray]:
+        radio = self.radios.get(handle)
+        if radio is None:
+            return PI_BAD_HANDLE, bytearray()
+
+        if not data:
+            return PI_BAD_SPI_COUNT, bytearray()
+
+        with self.air.lock:
+            now = time.monotonic()
+            self.air.advance(now)
+
+            rx_data = radio.xfer(bytes(data))
+            self.air.kick(radio, now)
+
+        return len(rx_data), bytearray(rx_data)
+
+
+    def stop(self: "VirtualPi") -> None:
+        for radio in self.radios.values():
+            self.air.detach(radio)
+            INFO(f"Radio {radio.name} detached")
+
+        self.radios.clear()
+        return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: PIGPIO PROTOCOL ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class PigpioHandler(socketserver.BaseRequestHandler):
+    """
+    Serves one pigpio socket connection on its own `VirtualPi`
+    """
+
+    air: Air
+
+    def setup(self: "PigpioHandler") -> None:
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.pi = VirtualPi(self.air, str(self.client_address[1]))
+        return
+
+
+    def _recv_exactly(self: "PigpioHandler", count: int) -> bytes | None:
+        data = bytearray()
+
+        while len(data) < count:
+            chunk = self.request.recv(count - len(data))
+            if not chunk:
+                return None
+            data += chunk
+
+        return bytes(data)
+
+
+    def handle(self: "PigpioHandler") -> None:
+        while True:
+            header = self._recv_exactly(COMMAND.size)
+            if header is None:
+                return
+
+            cmd, p1, p2, p3 = COMMAND.unpack(header)
+
+            extension = self._recv_exactly(p3) if p3 else b""
+            if extension is None:
+                return
+
+            # NOTE: the notification socket only waits for reports, close it when
+            # the client stops
+            if cmd == CMD_NC:
+                return
+
+            result, data = self._execute(cmd, p1, p2, extension)
+
+            self.request.sendall(COMMAND.pack(cmd, p1, p2, result & 0xFFFFFFFF) + data)
+
+
+    def _execute(self: "PigpioHandler", cmd: int, p1: int, p2: int, extension: bytes) -> tuple[int, bytes]:
+        if cmd == CMD_MODES:
+            return self.pi.set_mode(p1, p2), b""
+
+        if cmd == CMD_MODEG:
+            return self.pi.get_mode(p1), b""
+
+        if cmd == CMD_READ:
+            return self.pi.read(p1), b""
+
+        if cmd == CMD_WRITE:
+            return self.pi.write(p1, p2), b""
+
+        if cmd == CMD_BR1:
+            return self.pi.read_bank_1(), b""
+
+        if cmd == CMD_TICK:
+            return int(time.monotonic() * 1e6), b""
+
+        if cmd == CMD_HWVER:
+            return HARDWARE_REV, b""
+
+        if cmd == CMD_PIGPV:
+            return PIGPIO_VERSION, b""
+
+        if cmd in (CMD_NB, CMD_NOIB):
+            return 0, b""
+
+        if cmd == CMD_SPIO:
+            return self.pi.spi_open(p1, p2), b""
+
+        if cmd == CMD_SPIC:
+            return self.pi.spi_close(p1), b""
+
+        if cmd in (CMD_SPIX, CMD_SPIW, CMD_SPIR):
+            tx_data = extension if cmd != CMD_SPIR else bytes(p2)
+
+            count, rx_data = self.pi.spi_xfer(p1, tx_data)
+
+            if cmd == CMD_SPIW or count < 0:
+                return count, b""
+
+            return count, bytes(rx_data)
+
+        return PI_UNKNOWN_COMMAND, b""
+
+
+    def finish(self: "PigpioHandler") -> None:
+        self.pi.stop()
+        return
+
+
+
+class PigpioServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads      = True
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: MAIN :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def main():
+    """
+    Runs a local stand-in for pigpiod where every SPI device is an emulated
+    nRF24L01+ sharing the same air, so the scripts can run unmodified on any Linux
+    box:
+
+        python pigpiod_emulator.py --loss 0.01
+    """
+
+    parser = argparse.ArgumentParser(description = "pigpiod emulator with virtual nRF24L01+ radios")
+    parser.add_argument("--host", default = "localhost")
+    parser.add_argument("--port", type = int, default = 8888)
+    parser.add_argument("--loss", type = float, default = 0.0, help = "probability of losing a packet or an ACK")
+    args = parser.parse_args()
+
+    PigpioHandler.air = Air(loss = args.loss)
+
+    try:
+        with PigpioServer((args.host, args.port), PigpioHandler) as server:
+            SUCC(f"Emulating pigpiod on {args.host}:{args.port} (loss {args.loss:.1%})")
+            server.serve_forever()
+
+    except OSError as e:
+        ERROR(f"Could not start the emulator: {e}")
+
+    except KeyboardInterrupt:
+        INFO("Stopping emulator")
+
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+if __name__ == "__main__":
+    main()
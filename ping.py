@@ -0,0 +1,101 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+import statistics
+import struct
+
+from console import (
+    WARN,
+    INFO,
+)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# NOTE: the echo node copies every probe into its ACK payload, so the probe comes
+# back with the ACK of the next frame it receives, a poll
+PING_PROBE = ord("P")
+PING_POLL  = ord("Q")
+
+PROBE = struct.Struct("<BIQ") # type, sequence number, send time (ns)
+POLL  = struct.Struct("<BI")  # type, sequence number
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: FRAMES :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def pack_probe(seq: int, sent_ns: int) -> bytes:
+    return PROBE.pack(PING_PROBE, seq & 0xFFFFFFFF, sent_ns)
+
+
+
+def pack_poll(seq: int) -> bytes:
+    return POLL.pack(PING_POLL, seq & 0xFFFFFFFF)
+
+
+
+def unpack_probe(frame: bytes) -> tuple[int, int] | None:
+    """
+    Returns the sequence number and send time of a probe (or of its echo), `None`
+    if the frame is not a probe
+    """
+
+    if len(frame) < PROBE.size or frame[0] != PING_PROBE:
+        return None
+
+    _, seq, sent_ns = PROBE.unpack_from(frame)
+    return seq, sent_ns
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: STATISTICS :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def percentile(values: list[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of already sorted values
+    """
+
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+
+def jitter(rtts: list[float]) -> float:
+    """
+    Mean difference between consecutive round trip times, in the order they were
+    measured
+    """
+
+    if len(rtts) < 2:
+        return 0.0
+
+    return statistics.fmean(abs(b - a) for a, b in zip(rtts, rtts[1:]))
+
+
+
+def report_rtts(rtts_us: list[float], probes_sent: int) -> None:
+    """
+    Prints the distribution of the round trip times, in microseconds, and the
+    loss over all the probes sent
+    """
+
+    lost = probes_sent - len(rtts_us)
+    INFO(f"{probes_sent} probes sent, {len(rtts_us)} echoed, {lost} lost ({lost / max(probes_sent, 1):.1%} loss)")
+
+    if not rtts_us:
+        WARN("No echo received")
+        return
+
+    ordered = sorted(rtts_us)
+
+    INFO(
+        f"RTT min {ordered[0]:.0f} us | median {statistics.median(ordered):.0f} us | "
+        f"p99 {percentile(ordered, 0.99):.0f} us | max {ordered[-1]:.0f} us | jitter {jitter(rtts_us):.0f} us"
+    )
+
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
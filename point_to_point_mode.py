@@ -2,25 +2,111 @@
 from nrf24 import (
     NRF24,
 
-    RF24_DATA_RATE,
-    RF24_PA,
     RF24_RX_ADDR,
     RF24_PAYLOAD,
-    RF24_CRC,
+    SPI_CHANNEL,
 )
 
 from pathlib import Path
-import pigpio
-import struct
-import shutil
+from typing import Sequence
+import random
 import time
 import sys
 import os
 
 os.system("cls" if os.name == "nt" else "clear")
 
-from typing import Any
 from enum import Enum
+
+from console import (
+    YELLOW,
+    ERROR,
+    SUCC,
+    WARN,
+    INFO,
+    reset_line,
+    progress_bar,
+)
+from link import (
+    DATA_SIZE,
+    PROGRESS_EVERY,
+    chunk_content,
+    send_frames,
+    send_frames_windowed,
+    send_blob,
+    receive_blob,
+)
+from frame_codec import (
+    FrameCodec,
+    load_dictionary,
+)
+from mux import (
+    MAX_STREAMS,
+    MUX_HEADER_SIZE,
+    StreamScheduler,
+    ScheduledFrames,
+    StreamDemux,
+)
+from multicast import (
+    MC_HEADER_SIZE,
+    MC_CONTROL,
+    MC_ANNOUNCE,
+    MC_POLL,
+    MC_DONE,
+    pack_data,
+    pack_announce,
+    pack_poll,
+    pack_done,
+    parse_frame,
+    missing_ranges,
+    pack_nacks,
+    unpack_nack,
+    union_of_ranges,
+)
+from custom_nrf24 import CustomNRF24
+from transport import open_transport
+from storage import (
+    WriteBehindSink,
+    find_mount_point,
+    forget_mount_points,
+    list_txt_files,
+)
+from relay import Relay
+from session import (
+    CONTROL_PIPE,
+    InactivityTimeout,
+    session_flags,
+    open_session,
+    close_session,
+    accept_session,
+    receive_session,
+)
+from radio_profile import load_profile
+from service import (
+    ControlServer,
+    Job,
+    pack_transfer,
+    unpack_transfer,
+)
+from spi_profiler import SPIProfiler
+from capture import FrameCapture
+from frame_cache import (
+    FrameCache,
+    encoding_id,
+)
+from rx_drain import RxDrain
+from decode_pipeline import DecodePipeline
+from file_receiver import receive_file_session
+from credit import (
+    CreditWindow,
+    CreditGrant,
+)
+from channel_access import ChannelAccess
+from tdma import TDMASlot
+import tdma
+import eventlog
+import delta
+import ping
 # :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
 
 
@@ -30,14 +116,132 @@ from enum import Enum
 # :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
 CE_PIN = 22
 
+RADIO_CHANNEL = 76
+
+# NOTE: the relay forwards through a second radio on the other chip select of the
+# SPI bus, the next hop must use `RELAY_CHANNEL` as its `RADIO_CHANNEL`
+RELAY_CE_PIN  = 27
+RELAY_CHANNEL = 96
+
 RECEIVER_TIMEOUT_S = 20
 
-USB_MOUNT_PATH = Path("/media")
+# NOTE: every transfer is wrapped in a session, the SYN and the FIN go to this
+# address, the control pipe of the receiver. It has to end like the reading
+# address of the receiver (see `session.py`)
+SESSION_CONTROL_ADDRESS = b"SA1"
 
-spinner     = "⣾⣽⣻⢿⡿⣟⣯⣷"
-IDX_SPINNER = [0]
+USB_MOUNT_PATH = Path("/media")
 
-DATA_SIZE = 32
+RECEIVED_FILE_NAME = "received_file.txt"
+
+# NOTE: both nodes must agree on this flag. The receiver sends the signatures of
+# its current `received_file.txt` and the transmitter only sends what changed
+DELTA_MODE = False
+
+# NOTE: both nodes must agree on this flag. Every frame is compressed on its own
+# with the static dictionary in `frame_dictionary.bin`
+DICTIONARY_CODEC = False
+
+# NOTE: both nodes must agree on this flag. Every txt file of the USB is sent in
+# its own stream, the ones up to `MUX_URGENT_BYTES` ahead of the bulk ones. Files
+# that show up in the USB during the transfer join it every `MUX_RESCAN_S`
+MUX_MODE         = False
+MUX_URGENT_BYTES = 4096
+MUX_RESCAN_S     = 0.5
+
+# NOTE: both the sender and all the receivers must agree on this flag. Frames are
+# sent once to the whole group and only the ones that someone missed are repeated
+MULTICAST_MODE             = False
+MULTICAST_GROUP_ADDRESS    = b"MC1"
+MULTICAST_FEEDBACK_ADDRESS = b"MC0"
+MULTICAST_WINDOW_MS        = 50  # feedback window after every round
+MULTICAST_MAX_ROUNDS       = 32
+MULTICAST_QUIET_POLLS      = 2   # silent windows before considering everyone done
+MULTICAST_NACK_FRAMES      = 4   # NACK frames a receiver may send per window
+MULTICAST_REPEATS          = 3   # copies of every control frame
+
+# NOTE: both nodes must agree on this flag. The receiver grants the frames it has
+# room for in its ACK payloads and the transmitter never sends more, so a slow
+# receiver does not make the transmitter retry into a full RX FIFO (see
+# `credit.py`). The frames are always sent in a stop & wait fashion
+CREDIT_MODE = False
+
+# NOTE: counts and times the SPI transactions of every radio call during the
+# transfer and prints a per frame breakdown at the end
+PROFILE_SPI = False
+
+# NOTE: the lost frames, timeouts and sessions are written as binary records to
+# this file instead of the console, render it with `python eventlog.py <file>`
+EVENT_LOG      = False
+EVENT_LOG_PATH = Path("event_log.bin")
+
+# NOTE: the receiver records every frame it gets to this file, replay it offline
+# through the same receive path with `python capture.py <file>`
+CAPTURE_FRAMES = False
+CAPTURE_PATH   = Path("capture.bin")
+
+# NOTE: the transmitter keeps the frames of the files it sent in `frame_cache/`,
+# keyed by their content and encoding, so sending the same file again skips the
+# chunking and the codec. Deltas are never cached, they depend on the copy of the
+# receiver
+FRAME_CACHE = False
+
+# NOTE: the receiver takes the frames out of the RX FIFO in a thread of its own
+# that does nothing else, the rest of the receive path works from its queue (see
+# `rx_drain.py`). The thread can be given a SCHED_FIFO priority and its own CPU,
+# both need root. Not used in multicast mode
+RX_DRAIN_THREAD   = False
+RX_DRAIN_PRIORITY = None # 1 to 99
+RX_DRAIN_CPU      = None
+
+# NOTE: the receiver hands the raw frames over to this many worker processes
+# through shared memory, they decode, hash and write the file so none of that
+# takes the GIL from the receive loop (see `decode_pipeline.py`). 0 keeps
+# everything in the receiver process. Not used in delta, mux or multicast modes
+DECODE_WORKERS = 0
+
+# NOTE: with several pairs sharing the channel, check the carrier detect before
+# every frame and back off while it is busy (see `channel_access.py`)
+LISTEN_BEFORE_TALK = False
+
+# NOTE: with many pairs on the same channel a coordinator node broadcasts a beacon
+# every superframe giving one slot to every node of `TDMA_NODES`, the transmitters
+# only send inside the slot of their `TDMA_NODE_ID` (see `tdma.py`). The beacon
+# address has to end like the reading address of the transmitters
+TDMA_MODE           = False
+TDMA_NODE_ID        = 1
+TDMA_NODES          = (1, 2) # slot owners, in slot order
+TDMA_SLOT_US        = 20_000
+TDMA_GUARD_US       = 4_000  # longer than a frame with a few retries
+TDMA_BEACON_ADDRESS = b"BA0"
+
+# NOTE: in service mode the radio is set up once and the node serves transfers in
+# both directions until stopped, the outgoing files are queued with `service.py`.
+# The two nodes must use a different `SERVICE_SIDE`: "A" takes the addresses of
+# the transmitter and "B" the ones of the receiver. The link is half duplex, do
+# not queue transfers on both nodes at the same time
+SERVICE_SIDE      = "A"
+SERVICE_TIMEOUT_S = 2    # silence that aborts a transfer, no frame received or delivered for this long
+SERVICE_POLL_S    = 1e-3 # wait for queued transfers between radio polls
+
+# NOTE: every transfer of the service is a session, each side gets the SYN and the
+# FIN of the other on its own control pipe. Writing, reading and control address
+# of every side, the control address has to end like the reading one
+SERVICE_ADDRESSES = {
+    "A": (b"TA1", b"TA0", b"SA0"),
+    "B": (b"TA0", b"TA1", SESSION_CONTROL_ADDRESS),
+}
+
+# NOTE: the ping node sends `PING_COUNT` probes, one every `PING_INTERVAL_MS`, and
+# the echo node returns them in its ACK payloads
+PING_COUNT       = 100
+PING_INTERVAL_MS = 10
+PING_TIMEOUT_MS  = 100 # a probe without echo after this long is lost
+
+# NOTE: how the radio is reached, through the pigpiod daemon (`pigpio`), directly
+# through spidev and gpiod (`spidev`) or an emulated radio (`fake`). Run
+# `transport.py` on the board to see which one is faster
+TRANSPORT = "pigpio"
 # :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
 
 
@@ -45,106 +249,37 @@ DATA_SIZE = 32
 
 
 # :::: HELPER FUNCTIONS :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
-def RED(message: str) -> str:
-    """
-    Returns a copy of the string wrapped in ANSI scape sequences to make it red
-    """
-    return f"\033[31m{message}\033[0m"
-
-
-
-def GREEN(message: str) -> str:
-    """
-    Returns a copy of the string wrapped in ANSI scape sequences to make it green
-    """
-    return f"\033[32m{message}\033[0m"
-
-
-
-def YELLOW(message: str) -> str:
-    """
-    Returns a copy of the string wrapped in ANSI scape sequences to make it yellow
-    """
-    return f"\033[33m{message}\033[0m"
-
-
-
-def BLUE(message: str) -> str:
-    """
-    Returns a copy of the string wrapped in ANSI scape sequences to make it blue
-    """
-    return f"\033[34m{message}\033[0m"
-
-
-
-def ERROR(message: str, end = "\n") -> None:
-    """
-    Prints a message to the console with the red prefix `[~ERR]:`
-    """
-    print(f"{RED('[~ERR]:')} {message}", end = end)
-
-
-
-def SUCC(message: str, end = "\n") -> None:
+def find_usb_txt_files() -> list[Path]:
     """
-    Prints a message to the console with the green prefix `[SUCC]:`
+    Searchs for all the txt files in the USB mount location and returns their
+    paths. The list is empty if there is no mounted USB
     """
-    print(f"{GREEN('[SUCC]:')} {message}", end = end)
 
+    usb_mount_point = find_usb_mount_point()
 
-
-def WARN(message: str, end = "\n") -> None:
-    """
-    Prints a message to the console with the yellow prefix `[WARN]:`
-    """
-    print(f"{YELLOW('[WARN]:')} {message}", end = end)
-
-
-
-def INFO(message: str, end = "\n") -> None:
-    """
-    Prints a message to the console with the blue prefix `[INFO]:`
-    """
-    print(f"{BLUE('[INFO]:')} {message}", end = end)
-
+    if usb_mount_point is None:
+        return []
 
 
-def reset_line() -> None:
-    """
-    Delete the last CMD line
-    """
+    possible_files = list_txt_files(usb_mount_point)
+    INFO(f"Detected valid files: {", ".join(file.name for file in possible_files)}")
 
-    print("\x1b[2K\r", end = "")
-    
-    return
+    return possible_files
 
 
 
-def progress_bar(active_msg: str, finished_msg: str, current_status: int, max_status: int) -> None:
+def list_stream_files() -> list[Path]:
     """
-    Create a progress bar that gets updated everytime this function is called
+    Same files as `find_usb_txt_files` without logging them, to look for new files
+    during a transfer. Without a mounted USB the test files are used
     """
-    
-    terminal_width  = shutil.get_terminal_size().columns
-    IDX_SPINNER[0] += 1
-    spin            = spinner[IDX_SPINNER[0] % len(spinner)]
-    progress        = f"({current_status}/{max_status}) {spin}"
 
-    if current_status < max_status:
-        progress = f"({current_status}/{max_status}) {spin}"
+    usb_mount_point = find_mount_point(USB_MOUNT_PATH)
 
-        reset_line()
-        INFO(f"{active_msg} {progress.rjust(terminal_width - 8 - len(active_msg) - 2)}", end = "")
-        sys.stdout.flush()
-        
-    
-    else:
-        progress = f"({current_status}/{max_status}) █"
+    if usb_mount_point is None:
+        return sorted(Path("test_files").glob("*.txt"))
 
-        reset_line()
-        SUCC(f"{finished_msg} {progress.rjust(terminal_width - 8 - len(finished_msg) - 2)}")
-    
-    return
+    return list_txt_files(usb_mount_point)
 
 
 
@@ -154,81 +289,49 @@ def find_usb_txt_file() -> Path:
     first one
     """
 
-    possible_files: list[str] = []
-    usb_mount_point: Path | None = None
-
-    # analyze the subtree of the USB mount point
-    for path, dirs, files in USB_MOUNT_PATH.walk():
-        if path.is_mount():
-            INFO(f"""Found mount path: {path}
-        Directories: {", ".join(dirs)}
-        Files: {", ".join(files)}""")
-            possible_files  = files
-            usb_mount_point = path
+    possible_files = find_usb_txt_files()
 
-    if usb_mount_point is None:
+    if not possible_files:
         return Path("test_files/quijote.txt")
-    
-
-    # filter out invalid files
-    possible_files = [
-        file
-        for file in possible_files
-        if not file.startswith(".")
-    and file.endswith(".txt")
-    ]
-    INFO(f"Detected valid files: {", ".join(possible_files)}")
 
 
     # TODO: ask the teacher if the USB will only contain one file
     # choose the first file
     file = possible_files[0]
-    INFO(f"Selected file: {file}")
+    INFO(f"Selected file: {file.name}")
 
-    return usb_mount_point / file
+    return file
 
 
 
 def find_usb_mount_point() -> Path | None:
-    usb_mount_point: Path | None = None
+    """
+    Returns the USB mount point, found in the kernel mount table the first time
+    and cached afterwards
+    """
+
+    usb_mount_point = find_mount_point(USB_MOUNT_PATH)
+
+    if usb_mount_point is not None:
+        INFO(f"Found mount path: {usb_mount_point}")
 
-    # analyze the subtree of the USB mount point
-    for path, _, _ in USB_MOUNT_PATH.walk():
-        if path.is_mount():
-            INFO(f"Found mount path: {path}")
-            usb_mount_point = path
-            break
-    
     return usb_mount_point
-# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
 
 
-# :::: CLASS EXTENSION ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
-class CustomNRF24(NRF24):
+
+def get_received_file_path() -> Path:
     """
-    Custom NRF24 class that allows for extending the NRF24 base class without
-    modifying the library itself
+    Returns the path where the received file is stored, inside the mounted USB if
+    there is one or in the current directory otherwise
     """
-    
-    def __init__(self: "CustomNRF24", pi: Any, ce: int, spi_speed: float = 10_000_000) -> None:
-        super().__init__(pi = pi, ce = ce, spi_speed = spi_speed)
-        return
-    
 
-    # NOTE: I trust that someday my wonderful team will either develop or discard
-    # this function
-    # def send_three_frames_fast(self: "CustomNRF24", frame_1: list[bytes], frame_2: list[bytes] | None, frame_3: list[bytes] | None) -> None:
-    #     """
-    #     Function to send three frames without waiting for an ACK between them
-    #     """
-    # 
-    #     if frame_2 is None:
-    #         self.send(frame_1)
-    # 
-    #     
-    #     return
-# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+    usb_mount_point = find_usb_mount_point()
+
+    if usb_mount_point:
+        return usb_mount_point / RECEIVED_FILE_NAME
 
+    return Path(RECEIVED_FILE_NAME)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
 
 
 # :::: NODE CONFIG  :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
@@ -236,6 +339,11 @@ class Role(Enum):
     TRANSMITTER = "TRANSMITTER"
     RECEIVER    = "RECEIVER"
     CARRIER     = "CARRIER"
+    RELAY       = "RELAY"
+    PING        = "PING"
+    ECHO        = "ECHO"
+    COORDINATOR = "COORDINATOR"
+    SERVICE     = "SERVICE"
     QUIT        = "QUIT"
 
     def __str__(self: "Role") -> str:
@@ -249,7 +357,7 @@ def choose_node_role() -> Role:
     """
 
     while True:
-        val = input(f"{YELLOW('[>>>>]:')} Please choose a role for this device [T]ransmitter, [R]eceiver, [C]arrier, [Q]uit: ")
+        val = input(f"{YELLOW('[>>>>]:')} Please choose a role for this device [T]ransmitter, [R]eceiver, [C]arrier, Re[L]ay, [P]ing, [E]cho, C[O]ordinator, [S]ervice, [Q]uit: ")
         
         try:
             val = val.upper()
@@ -267,6 +375,26 @@ def choose_node_role() -> Role:
         elif val == "C":
             INFO(f"Device set to {Role.CARRIER} role")
             return Role.CARRIER
+
+        elif val == "L":
+            INFO(f"Device set to {Role.RELAY} role")
+            return Role.RELAY
+
+        elif val == "P":
+            INFO(f"Device set to {Role.PING} role")
+            return Role.PING
+
+        elif val == "E":
+            INFO(f"Device set to {Role.ECHO} role")
+            return Role.ECHO
+
+        elif val == "O":
+            INFO(f"Device set to {Role.COORDINATOR} role")
+            return Role.COORDINATOR
+
+        elif val == "S":
+            INFO(f"Device set to {Role.SERVICE} role")
+            return Role.SERVICE
         
         elif val == "Q":
             INFO("Quitting program...")
@@ -283,44 +411,55 @@ def choose_node_role() -> Role:
 hostname = "localhost"
 port     = 8888
 
-pi = pigpio.pi(hostname, port)
+pi = open_transport(TRANSPORT, hostname, port)
 if not pi.connected:
     ERROR("Not connected to Raspberry Pi, exiting")
     sys.exit(1)
 
 
-# radio object
-nrf = CustomNRF24(pi = pi, ce = CE_PIN, spi_speed = 10_000_000)
+def configure_radio(nrf: NRF24, channel: int) -> None:
+    """
+    Applies the common radio configuration shared by all the roles
+    """
 
+    # radio channel
+    nrf.set_channel(channel)
 
-# radio channel
-nrf.set_channel(76)
 
+    # data rate, Tx/Rx power, auto-retries, address width and CRC, from the profile
+    # found by `tune.py` (1 Mbps, high power, ARD 1, ARC 15, 3 bytes and 2 bytes by
+    # default)
+    radio_profile.apply(nrf)
 
-# data rate
-nrf.set_data_rate(RF24_DATA_RATE.RATE_1MBPS)
 
+    # global payload 
+    nrf.set_payload_size(RF24_PAYLOAD.DYNAMIC) # [1 - 32] Bytes
 
-# Tx/Rx power
-nrf.set_pa_level(RF24_PA.HIGH)
+    return
 
 
-# CRC
-nrf.enable_crc()
-nrf.set_crc_bytes(RF24_CRC.BYTES_2)
+# radio parameters
+radio_profile = load_profile()
 
 
-# global payload 
-nrf.set_payload_size(RF24_PAYLOAD.DYNAMIC) # [1 - 32] Bytes
+# radio object
+nrf = CustomNRF24(pi = pi, ce = CE_PIN, spi_speed = 10_000_000)
+configure_radio(nrf, RADIO_CHANNEL)
 PAYLOAD:list[bytes] = []
 
 
-# auto-retries
-nrf.set_retransmission(1, 15)
+# ACK payloads carry the credit of the receiver
+if CREDIT_MODE:
+    nrf.enable_ack_payloads()
 
 
-# Tx/Rx addresses
-nrf.set_address_bytes(3) # [2 - 5] Bytes
+# channel access of the transmitter
+if TDMA_MODE:
+    channel = TDMASlot(nrf, TDMA_NODE_ID, TDMA_BEACON_ADDRESS)
+elif LISTEN_BEFORE_TALK:
+    channel = ChannelAccess(nrf)
+else:
+    channel = None
 
 
 # status visualization
@@ -339,10 +478,37 @@ def choose_address_based_on_role(role: Role, nrf: NRF24) -> None:
         nrf.open_reading_pipe(RF24_RX_ADDR.P1, b"TA0")
         INFO("Writing @: TA1 | Reading @; TA0")
     
-    elif role is Role.RECEIVER:
+    # NOTE: towards the previous hop the relay behaves as a receiver
+    elif role is Role.RECEIVER or role is Role.RELAY:
         nrf.open_writing_pipe(b"TA0")
         nrf.open_reading_pipe(RF24_RX_ADDR.P1, b"TA1")
-        INFO("Writing @: TA0 | Reading @; TA1")
+        nrf.open_reading_pipe(CONTROL_PIPE, SESSION_CONTROL_ADDRESS)
+        INFO(f"Writing @: TA0 | Reading @; TA1 | Control @: {SESSION_CONTROL_ADDRESS.decode()}")
+
+    # NOTE: same addresses as the transmitter and the receiver, with ACK payloads
+    elif role is Role.PING:
+        nrf.open_writing_pipe(b"TA1", RF24_PAYLOAD.ACK)
+        nrf.open_reading_pipe(RF24_RX_ADDR.P1, b"TA0", RF24_PAYLOAD.ACK)
+        INFO("Writing @: TA1 | Reading @; TA0 | ACK payloads")
+
+    elif role is Role.ECHO:
+        nrf.open_writing_pipe(b"TA0", RF24_PAYLOAD.ACK)
+        nrf.open_reading_pipe(RF24_RX_ADDR.P1, b"TA1", RF24_PAYLOAD.ACK)
+        INFO("Writing @: TA0 | Reading @; TA1 | ACK payloads")
+
+    # NOTE: the beacons are broadcast, nobody acknowledges them
+    elif role is Role.COORDINATOR:
+        nrf.open_writing_pipe(TDMA_BEACON_ADDRESS)
+        nrf.enable_dynamic_ack()
+        INFO(f"Writing @: {TDMA_BEACON_ADDRESS.decode()} | Beacons")
+
+    elif role is Role.SERVICE:
+        writing, reading, control = SERVICE_ADDRESSES[SERVICE_SIDE]
+
+        nrf.open_writing_pipe(writing)
+        nrf.open_reading_pipe(RF24_RX_ADDR.P1, reading)
+        nrf.open_reading_pipe(CONTROL_PIPE, control)
+        INFO(f"Writing @: {writing.decode()} | Reading @; {reading.decode()} | Control @: {control.decode()}")
 
     return
 # :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
@@ -350,230 +516,359 @@ def choose_address_based_on_role(role: Role, nrf: NRF24) -> None:
 
 
 # :::: FLOW FUNCTIONS :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
-def BEGIN_TRANSMITTER_MODE() -> None:
+def build_frames(content: bytes, payload_size: int, dictionary: bytes | None, cache: FrameCache | None) -> list[bytes]:
+    """
+    Splits the content into frames of `payload_size` bytes, compressed with the
+    dictionary if one is given. With a cache the frames of a content already sent
+    are read from it instead
+    """
+
+    if dictionary is not None:
+        encode = FrameCodec(dictionary, payload_size).encode_frames
+    else:
+        encode = lambda content: chunk_content(content, payload_size)
+
+    if cache is None:
+        return encode(content)
+
+    return cache.frames(content, encoding_id(payload_size, dictionary), encode)
+
+
+
+def send_data_frames(packets: Sequence[bytes]) -> None:
+    """
+    Sends the data frames of a transfer, queueing `window` frames at once in the
+    radio if the profile has one and in a stop & wait fashion otherwise. With
+    `CREDIT_MODE` they are sent in a stop & wait fashion as long as the receiver
+    has granted them
+    """
+
+    if CREDIT_MODE:
+        credit = CreditWindow(nrf, b"TA1", SESSION_CONTROL_ADDRESS, channel)
+        send_frames(nrf, packets, credit)
+        credit.report()
+
+    elif radio_profile.window > 0:
+        send_frames_windowed(nrf, packets, radio_profile.window, channel)
+    else:
+        send_frames(nrf, packets, channel)
+
+    return
+
+
+
+def send_session(packets: Sequence[bytes]) -> None:
+    """
+    Sends the data frames of a transfer inside a session: the SYN announces the
+    number of frames and checks that the receiver runs with the same modes, and
+    the FIN tells it that the transfer is over so it does not wait for a time-out.
+    If `packets` grows while it is sent (new streams), the FIN carries the final
+    number of frames
+    """
+
+    flags   = session_flags(DELTA_MODE, DICTIONARY_CODEC, MUX_MODE, CREDIT_MODE)
+    session = open_session(nrf, len(packets), flags, b"TA1", SESSION_CONTROL_ADDRESS, RECEIVER_TIMEOUT_S, channel)
+
+    if session is None:
+        return
+
+    SUCC(f"Session {session.session_id:#06x} open: sending {len(packets)} frames")
+
+    send_data_frames(packets)
+    session.frames = len(packets)
+
+    received = close_session(nrf, session, b"TA1", SESSION_CONTROL_ADDRESS, RECEIVER_TIMEOUT_S, channel)
+
+    if received is None:
+        WARN("The receiver did not answer the FIN")
+    elif received != session.frames:
+        WARN(f"Session closed: the receiver got {received} of {session.frames} frames")
+    else:
+        SUCC(f"Session closed: the receiver got all the frames")
+
+    return
+
+
+
+def transmit_file() -> None:
     """
-    Transmits the first txt file found in the mounted USB, the flow of the TX MODE
-    is the following:
+    Transmits the first txt file found in the mounted USB, the flow is the
+    following:
     
     1. An appropiate file is selected from all the candidate files found in the
     mounted USB. The content of the file is extracted as raw bytes
 
-    2. The bytes are splitted into chunks of size `payload_size` and then packed
-    for future transmission
+    2. If `DELTA_MODE` is enabled, the block signatures of the copy that the
+    receiver already has are received and the content is replaced by the delta
+    against that copy
 
-    3. An information message is sent containing the number of frames that the
-    receiver should expect
+    3. The bytes are splitted into chunks of size `payload_size` and then packed
+    for future transmission. If `DICTIONARY_CODEC` is enabled each chunk is
+    instead compressed to fill a whole frame. With `FRAME_CACHE` the frames of a
+    file already sent are read from the cache
 
-    4. The rest of the frames are sent in a stop & wait fashion
+    4. A session is opened with the receiver, the SYN contains the number of
+    frames that it should expect
+
+    5. The rest of the frames are sent in a stop & wait fashion (or pipelined if
+    the radio profile has a window) and the session is closed with a FIN
     """
 
-    INFO("Starting transmission")
+    file_path = find_usb_txt_file()
+    
+    # open the file to read
+    with open(file_path, "rb") as file:
+        content = file.read()
 
-    try:
-        file_path = find_usb_txt_file()
-        
-        # open the file to read
-        with open(file_path, "rb") as file:
-            content = file.read()
+    content_len = len(content)
+    INFO(f"Read {content_len} raw bytes read from {file_path}")
 
-        content_len = len(content)
-        INFO(f"Read {content_len} raw bytes read from {file_path}")
 
+    # replace the content by the delta against the copy of the receiver
+    if DELTA_MODE:
+        INFO("Waiting for block signatures...")
+        signatures = receive_blob(nrf, RECEIVER_TIMEOUT_S)
 
-        # split the contents into chunks
-        chunks = [
-            content[i:i+DATA_SIZE]
-            for i in range(0, content_len, DATA_SIZE)
-        ]
-        chunks_len = len(chunks)
+        if signatures is None:
+            ERROR("Block signatures incomplete, aborting")
+            return
 
+        content = delta.encode_delta(content, signatures)
+        SUCC(f"Delta encoded: {len(content)} bytes instead of {content_len}")
 
-        # store the encoded bytes
-        packets = []
-        for chunk in chunks:
-            packets.append(struct.pack(f"<{len(chunk)}s", chunk))
 
+    # split the contents into chunks
+    dictionary = load_dictionary() if DICTIONARY_CODEC else None
+    cache      = FrameCache() if FRAME_CACHE and not DELTA_MODE else None
+    packets    = build_frames(content, DATA_SIZE, dictionary, cache)
 
-        # send and information message containing the expected number of frames
-        frame = struct.pack("i", chunks_len)
+    if DICTIONARY_CODEC:
+        INFO(f"Dictionary codec: {len(content) / max(len(packets), 1):.2f} bytes per frame")
 
-        nrf.reset_packages_lost()
-        nrf.send(frame)
+    # send the frames inside a session, the SYN contains the expected number of
+    # frames
+    send_session(packets)
 
-        # TODO: maybe we should wrap this in an infinite loop
-        try:
-            nrf.wait_until_sent()
-            SUCC("Header sent successfully")
-        except TimeoutError:
-            ERROR("Timeout while sending header")
+    return
 
 
-        # send the rest of the frames
-        for idx in range(chunks_len):
 
-            num_retries = 0
-            
-            # NOTE: we try to send the same frame until it gets sent correctly
-            while True:
+def transmit_streams() -> None:
+    """
+    Transmits every txt file found in the mounted USB at the same time, each one
+    in its own logical stream. The files up to `MUX_URGENT_BYTES` get a higher
+    priority so they are not stuck behind the big ones. The flow is the following:
 
-                if idx % 100 == 0 or idx == chunks_len - 1:
-                    progress_bar(
-                        active_msg     = f"Sending frame {idx}, retries {num_retries}",
-                        finished_msg   = f"All frames sent",
-                        current_status = idx + 1,
-                        max_status     = chunks_len,
-                    )
+    1. Every candidate file is read and splitted into chunks that leave room for
+    the multiplexing header
 
-                nrf.reset_packages_lost()
-                nrf.send(packets[idx])
+    2. A session is opened with the number of frames of all the streams together
 
-                try:
-                    nrf.wait_until_sent()
-                    
-                except TimeoutError:
-                    ERROR("Timeout while transmitting")
+    3. The frames are sent in a stop & wait fashion (or pipelined if the radio
+    profile has a window), each one taken from the scheduler right before it is
+    sent. Every `MUX_RESCAN_S` the USB is checked again and the new files are
+    opened as new streams, an urgent one overtakes the bulk streams still being
+    sent. The files beyond `MAX_STREAMS` wait for a stream to finish
 
-                if nrf.get_packages_lost() == 0:
-                    break
+    4. The session is closed, the FIN carries the frames of all the streams sent
+    """
 
-                else:
-                    ERROR(f"Lost packet {idx}, retrying...")
-                    num_retries += nrf.get_retries()
+    dictionary = load_dictionary() if DICTIONARY_CODEC else None
+    cache      = FrameCache() if FRAME_CACHE else None
+    scheduler  = StreamScheduler()
 
-    except KeyboardInterrupt:
-        ERROR("Process interrupted by user")
+    opened: set[Path] = set()
+    last_scan = time.monotonic()
 
-    finally:
-        nrf.power_down()
-        pi.stop()
-    
-    return
+    def open_streams(file_paths: list[Path], settled_before: float | None = None) -> None:
+        for file_path in file_paths:
+            if file_path in opened:
+                continue
 
+            if scheduler.active_streams() >= MAX_STREAMS:
+                return
 
+            try:
+                # NOTE: a file modified since the last scan may still be being copied
+                if settled_before is not None and file_path.stat().st_mtime > settled_before:
+                    continue
 
+                content = file_path.read_bytes()
 
+            except OSError as e:
+                reset_line()
+                WARN(f"Cannot read {file_path.name}, skipping it: {e}")
+                opened.add(file_path)
+                continue
 
+            packets = build_frames(content, DATA_SIZE - MUX_HEADER_SIZE, dictionary, cache)
 
+            priority  = 0 if len(content) <= MUX_URGENT_BYTES else 1
+            stream_id = scheduler.open_stream(file_path.name, packets, priority = priority)
+            opened.add(file_path)
 
+            reset_line() # NOTE: the progress bar may be on screen
+            INFO(f"Stream {stream_id}: {file_path.name} ({len(content)} bytes, priority {priority})")
 
+        return
 
+    def rescan() -> None:
+        nonlocal last_scan
 
-def BEGIN_RECEIVER_MODE() -> None:
+        if time.monotonic() - last_scan < MUX_RESCAN_S:
+            return
+
+        last_scan = time.monotonic()
+        open_streams(list_stream_files(), time.time() - MUX_RESCAN_S)
+        return
+
+
+    file_paths = find_usb_txt_files() or list_stream_files()
+
+    if len(file_paths) > MAX_STREAMS:
+        WARN(f"Only {MAX_STREAMS} files are sent at once, the rest wait for a stream to finish")
+
+    open_streams(file_paths)
+
+    send_session(ScheduledFrames(scheduler, rescan))
+
+    return
+
+
+
+
+def transmit_multicast() -> None:
     """
-    Receives multiple frames from a transmitter and reassembles the blocks into a
-    `txt` file, the location of the `txt` depends on if there is a mounted USB or
-    not. The flow of the RX MODE is the following:
+    Transmits the first txt file found in the mounted USB to every receiver of the
+    multicast group at once. The flow is the following:
 
-    1. Start the timer that will interrupt the receiving process if there has not
-    been any frame for `timeout` seconds
+    1. The content is splitted into chunks that leave room for the sequence number
+    and the number of frames is announced to the group
 
-    2. Start listening the channel for frames. The first frame is treated
-    differently as it contains the number of frames that the receiver will expect
+    2. Every pending frame is sent once without waiting for acknowledgements
 
-    3. Start listening for the regular data frames
+    3. A feedback window is opened, the receivers answer with the ranges of frames
+    that they are missing
 
-    4. After all the frames has been received (or connection has timed-out), we
-    merge the payloads into one chunk of data and store it in the mounted USB. If
-    there is no mounted USB then the file is stored in memory
+    4. The union of the missing frames becomes the pending frames of the next
+    round. The transfer ends after `MULTICAST_QUIET_POLLS` windows without NACKs
     """
 
-    INFO(f"Starting reception: {RECEIVER_TIMEOUT_S} seconds time-out")
+    file_path = find_usb_txt_file()
+    content   = file_path.read_bytes()
+    INFO(f"Read {len(content)} raw bytes read from {file_path}")
 
-    try:
-        # list that will contain all the received chunks
-        chunks:list[str] = []
+    packets      = chunk_content(content, DATA_SIZE - MC_HEADER_SIZE)
+    total_frames = len(packets)
 
 
-        # wait for the first frame of the communication containing the expected number
-        # of frames and extract its contents
-        INFO("Waiting for header packet...")
-        while not nrf.data_ready():
-            pass
+    # the group listens on the same address and answers on the feedback one
+    nrf.open_writing_pipe(MULTICAST_GROUP_ADDRESS)
+    nrf.open_reading_pipe(RF24_RX_ADDR.P1, MULTICAST_FEEDBACK_ADDRESS)
+    nrf.enable_dynamic_ack()
 
-        header_packet = nrf.get_payload()
-        total_chunks  = struct.unpack("i", header_packet[:4])[0] # NOTE: the default size of an int is 4 bytes
-        SUCC(f"Header received: expecting {total_chunks} chunks")
+    def broadcast(frame: bytes) -> None:
+        nrf.send_no_ack(frame)
 
+        try:
+            nrf.wait_until_sent()
+        except TimeoutError:
+            ERROR("Timeout while transmitting")
+
+    for _ in range(MULTICAST_REPEATS):
+        broadcast(pack_announce(total_frames))
+
+
+    pending     = list(range(total_frames))
+    quiet_polls = 0
+    frames_sent = 0
+
+    for round_idx in range(MULTICAST_MAX_ROUNDS):
+
+        for idx, seq in enumerate(pending):
+            if idx % PROGRESS_EVERY == 0 or idx == len(pending) - 1:
+                progress_bar(
+                    active_msg     = f"Round {round_idx}: sending frame {seq}",
+                    finished_msg   = f"Round {round_idx}: {len(pending)} frames sent",
+                    current_status = idx + 1,
+                    max_status     = len(pending),
+                )
 
-        # start listening for frames
-        received_chunks   = 0 # NOTE: not the ID
-        timer_has_started = False
+            broadcast(pack_data(seq, packets[seq]))
 
-        tic = time.monotonic()
-        tac = time.monotonic()
-        while received_chunks < total_chunks and (tac - tic) < RECEIVER_TIMEOUT_S:
-            tac = time.monotonic()
+        frames_sent += len(pending)
 
-            # check if there are frames
+
+        # collect the NACKs of the whole group
+        for _ in range(MULTICAST_REPEATS):
+            broadcast(pack_poll(round_idx, MULTICAST_WINDOW_MS, total_frames))
+
+        ranges   = []
+        deadline = time.monotonic() + MULTICAST_WINDOW_MS / 1000
+        while time.monotonic() < deadline:
             while nrf.data_ready():
+                nack = unpack_nack(nrf.get_payload())
 
-                if not timer_has_started:
-                    throughput_tic = time.monotonic()
-                    timer_has_started = True
+                if nack is not None:
+                    ranges.extend(nack[1])
 
-                packet = nrf.get_payload()
+        pending = union_of_ranges(ranges, total_frames)
 
-                chunk = struct.unpack(f"<{len(packet)}s", packet)[0] # NOTE: the struct.unpack method returs more things than just the data
-                chunks.append(chunk)
-                
+        if pending:
+            quiet_polls = 0
+            INFO(f"Round {round_idx}: repairing {len(pending)} frames")
+            continue
 
-                # display the progress of the transmission
-                received_chunks += 1
+        quiet_polls += 1
+        if quiet_polls >= MULTICAST_QUIET_POLLS:
+            break
 
-                if received_chunks % 100 == 0 or received_chunks == total_chunks:
-                    progress_bar(
-                        active_msg     = f"Receiving chunks",
-                        finished_msg   = f"All chunks received",
-                        current_status = received_chunks,
-                        max_status     = total_chunks,
-                    )
-            
-                tic = time.monotonic()
-            
-        throughput_tac = time.monotonic()
-        chunks_len     = len(chunks)
+    else:
+        WARN(f"Giving up after {MULTICAST_MAX_ROUNDS} rounds")
 
 
-        if received_chunks != total_chunks:
-            total_time = throughput_tac - throughput_tic - RECEIVER_TIMEOUT_S
-            WARN("Connection timed-out")
-        
-        else:
-            total_time = throughput_tac - throughput_tic
-        
+    for _ in range(MULTICAST_REPEATS):
+        broadcast(pack_done())
 
-        if chunks_len == 0:
-            ERROR("Did not receive anything")
-            return
-        
-        
-        # check if there is a mounted USB. If not, store the file in memory
-        usb_mount_point = find_usb_mount_point()
+    INFO(f"Sent {frames_sent} data frames for {total_frames} frames ({frames_sent / max(total_frames, 1):.2f} frames per frame)")
 
-        if usb_mount_point:
-            file_path = usb_mount_point / "received_file.txt"
-        else:
-            file_path = "received_file.txt"
-        
+    return
 
-        # store the file
-        content = b"".join(chunks)
-        with open(file_path, "wb") as f:
-            f.write(content)
-        content_len = len(content)
-        INFO(f"Saved {content_len} bytes to: {file_path}")
-        
 
-        # show a last information message with the througput
-        INFO(f"Process finished in {total_time:.2f} seconds | Computed throughput: {((content_len / 1024) / total_time):.2f} KBps")
-    
+
+def BEGIN_TRANSMITTER_MODE() -> None:
+    """
+    Transmits the contents of the mounted USB, either the first txt file or, if
+    `MUX_MODE` is enabled, all of them multiplexed over the same link. With
+    `MULTICAST_MODE` the first txt file is sent to the whole group at once
+    """
+
+    INFO("Starting transmission")
+
+    profiler = SPIProfiler(nrf) if PROFILE_SPI else None
+
+    try:
+        if MULTICAST_MODE:
+            transmit_multicast()
+
+        elif MUX_MODE:
+            transmit_streams()
+        else:
+            transmit_file()
+
     except KeyboardInterrupt:
         ERROR("Process interrupted by user")
 
     finally:
+        if profiler is not None:
+            profiler.report()
+
+        if channel is not None:
+            channel.report()
+
         nrf.power_down()
         pi.stop()
-
+    
     return
 
 
@@ -585,36 +880,725 @@ def BEGIN_RECEIVER_MODE() -> None:
 
 
 
-def BEGIN_CONSTANT_CARRIER_MODE() -> None:
+def receive_file(radio: CustomNRF24 | RxDrain) -> None:
     """
-    Transmits a constant carrier until the user exits with CTRL+C
+    Receives multiple frames from a transmitter and reassembles the blocks into a
+    `txt` file, the location of the `txt` depends on if there is a mounted USB or
+    not. The flow is the following:
+
+    1. If `DELTA_MODE` is enabled, the block signatures of the current received
+    file are sent to the transmitter
+
+    2. Wait for the SYN of the transmitter, that contains the number of frames
+    that the receiver will expect, and accept the session
+
+    3. Start listening for the regular data frames until the FIN arrives or, if
+    the transmitter is gone, no frame has arrived for a while. The time-out
+    follows the time between frames, up to `RECEIVER_TIMEOUT_S`
+
+    4. After all the frames has been received (or connection has timed-out), we
+    merge the payloads into one chunk of data and store it in the mounted USB. If
+    there is no mounted USB then the file is stored in memory
     """
-    
-    ERROR("TODO")
-    return
-# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
 
+    file_path   = get_received_file_path()
+    old_content = None
 
 
+    # send the signatures of the copy we already have
+    if DELTA_MODE:
+        old_content = file_path.read_bytes() if file_path.is_file() else b""
 
+        INFO(f"Sending block signatures of {len(old_content)} bytes from {file_path}")
+        send_blob(radio, delta.compute_signatures(old_content))
 
-# :::: MAIN :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
-def main():
-    """
-    Main flow of the application
-    """
 
-    role = choose_node_role()
-    choose_address_based_on_role(role, nrf)
+    # NOTE: the workers are started before the session, not while the first frames
+    # arrive
+    pipeline = None
 
-    if role is Role.TRANSMITTER:
-        BEGIN_TRANSMITTER_MODE()
-    
-    elif role is Role.RECEIVER:
-        BEGIN_RECEIVER_MODE()
-        
-    elif role is Role.CARRIER:
-        BEGIN_CONSTANT_CARRIER_MODE()
+    if DECODE_WORKERS > 0 and not DELTA_MODE:
+        pipeline = DecodePipeline(file_path, load_dictionary() if DICTIONARY_CODEC else None, DECODE_WORKERS)
+
+
+    # wait for the SYN of the transmitter, containing the expected number of frames
+    INFO("Waiting for a session...")
+    try:
+        session = accept_session(radio, session_flags(DELTA_MODE, DICTIONARY_CODEC, MUX_MODE, CREDIT_MODE))
+    except KeyboardInterrupt:
+        if pipeline is not None:
+            pipeline.abort()
+        raise
+
+    if session is None:
+        if pipeline is not None:
+            pipeline.abort()
+        return
+
+    SUCC(f"Session {session.session_id:#06x} open: expecting {session.frames} chunks")
+
+
+    # receive the frames and store the file
+    credits = CreditGrant(radio, CONTROL_PIPE) if CREDIT_MODE else None
+    stored  = receive_file_session(radio, session, file_path, InactivityTimeout(RECEIVER_TIMEOUT_S), old_content, pipeline, credits)
+
+    if stored is None:
+        return
+
+    _, content_len, total_time = stored
+
+    if pipeline is not None:
+        pipeline.report()
+        INFO(f"SHA-256 of the received file: {pipeline.digest}")
+
+
+    # show a last information message with the througput
+    if total_time > 0:
+        INFO(f"Process finished in {total_time:.2f} seconds | Computed throughput: {((content_len / 1024) / total_time):.2f} KBps")
+
+    return
+
+
+
+def receive_streams(radio: CustomNRF24 | RxDrain) -> None:
+    """
+    Receives the streams sent by `transmit_streams`. Every stream is stored in its
+    own file, next to where the received file would be, as soon as its last frame
+    arrives
+    """
+
+    output_dir = get_received_file_path().parent
+    sinks: list[tuple[str, WriteBehindSink]] = []
+
+    # NOTE: the streams are written in the background while the rest keep arriving
+    # and synced all at once at the end
+    def store_stream(name: str, content: bytes) -> None:
+        sink = WriteBehindSink(output_dir / f"received_{Path(name).name}")
+        sink.write(content)
+        sinks.append((name, sink))
+
+        reset_line()
+        INFO(f"Received stream {name} ({len(content)} bytes)")
+
+    codec = FrameCodec(load_dictionary(), DATA_SIZE - MUX_HEADER_SIZE) if DICTIONARY_CODEC else None
+    demux = StreamDemux(store_stream, codec.decode_frame if codec is not None else None)
+
+
+    INFO("Waiting for a session...")
+    session = accept_session(radio, session_flags(DELTA_MODE, DICTIONARY_CODEC, MUX_MODE, CREDIT_MODE))
+
+    if session is None:
+        return
+
+    SUCC(f"Session {session.session_id:#06x} open: expecting {session.frames} chunks")
+
+    try:
+        credits = CreditGrant(radio, CONTROL_PIPE) if CREDIT_MODE else None
+        receive_session(radio, session, InactivityTimeout(RECEIVER_TIMEOUT_S), on_chunk = demux.push, credits = credits)
+    except ValueError as e:
+        ERROR(f"Could not decode frame: {e}")
+
+    finally:
+        for name, sink in sinks:
+            INFO(f"Saved stream {name} ({sink.commit()} bytes) to: {sink.path}")
+
+    for name in demux.open_streams():
+        WARN(f"Stream {name} did not finish")
+
+    return
+
+
+
+def receive_multicast() -> None:
+    """
+    Receives a file sent by `transmit_multicast`. The flow is the following:
+
+    1. Data frames are stored by sequence number and marked in the bitmap of
+    received frames
+
+    2. Every time the sender opens a feedback window, the gaps of the bitmap are
+    sent back as NACK ranges after a random delay, so that the receivers do not
+    all answer at the same time
+
+    3. Once the bitmap is complete the file is stored
+    """
+
+    file_path = get_received_file_path()
+
+    # NOTE: P0 is only needed to get the ACKs of our NACKs, while it is open we
+    # would also pick up (and acknowledge) the NACKs of the other receivers
+    nrf.open_writing_pipe(MULTICAST_FEEDBACK_ADDRESS)
+    nrf.open_reading_pipe(RF24_RX_ADDR.P1, MULTICAST_GROUP_ADDRESS)
+    nrf.close_reading_pipe(RF24_RX_ADDR.P0)
+
+    def send_nacks(round_idx: int, ranges: list[tuple[int, int]]) -> None:
+        time.sleep(random.uniform(0, MULTICAST_WINDOW_MS / 2000))
+
+        nrf.enable_reading_pipe(0)
+        for frame in pack_nacks(round_idx, ranges, MULTICAST_NACK_FRAMES):
+            nrf.reset_packages_lost()
+            nrf.send(frame)
+
+            try:
+                nrf.wait_until_sent()
+            except TimeoutError:
+                ERROR("Timeout while sending NACK")
+        nrf.close_reading_pipe(RF24_RX_ADDR.P0)
+
+
+    INFO("Waiting for multicast frames...")
+
+    chunks: dict[int, bytes]    = {}
+    received: bytearray | None  = None
+    answered_round: int | None  = None
+
+    last_frame = time.monotonic()
+    while time.monotonic() - last_frame < RECEIVER_TIMEOUT_S:
+        if received is not None and received.find(0) == -1:
+            break
+
+        if not nrf.data_ready():
+            continue
+
+        seq, fields = parse_frame(nrf.get_payload())
+        last_frame  = time.monotonic()
+
+        if seq != MC_CONTROL:
+            chunks[seq] = fields[0]
+
+            if received is not None and seq < len(received):
+                received[seq] = 1
+
+                if len(chunks) % PROGRESS_EVERY == 0:
+                    progress_bar(
+                        active_msg     = "Receiving chunks",
+                        finished_msg   = "All chunks received",
+                        current_status = len(chunks),
+                        max_status     = len(received),
+                    )
+            continue
+
+
+        kind = fields[0]
+
+        # NOTE: the number of frames also comes in every poll in case the
+        # announcement was lost
+        if received is None and kind in (MC_ANNOUNCE, MC_POLL):
+            received = bytearray(fields[-1])
+            for seq in chunks:
+                received[seq] = 1
+            SUCC(f"Transfer announced: expecting {len(received)} chunks")
+
+        if kind == MC_POLL and fields[1] != answered_round:
+            answered_round = fields[1]
+            ranges         = missing_ranges(received)
+
+            if ranges:
+                send_nacks(answered_round, ranges)
+
+        elif kind == MC_DONE:
+            break
+
+
+    if received is None or received.find(0) != -1:
+        missing = len(received) - sum(received) if received is not None else "all"
+        ERROR(f"Transfer incomplete, missing {missing} chunks")
+        return
+
+    content = b"".join(chunks[seq] for seq in range(len(received)))
+    sink = WriteBehindSink(file_path)
+    sink.write(content)
+    INFO(f"Saved {sink.commit()} bytes to: {file_path}")
+
+    return
+
+
+
+def BEGIN_RECEIVER_MODE() -> None:
+    """
+    Receives the contents sent by the transmitter, either a single file or, if
+    `MUX_MODE` is enabled, several multiplexed streams. With `MULTICAST_MODE` the
+    file is received as one more member of the multicast group
+    """
+
+    INFO(f"Starting reception: up to {RECEIVER_TIMEOUT_S} seconds time-out")
+
+    profiler = SPIProfiler(nrf) if PROFILE_SPI else None
+    capture  = FrameCapture(nrf, CAPTURE_PATH) if CAPTURE_FRAMES else None
+    drain    = RxDrain(nrf, priority = RX_DRAIN_PRIORITY, cpu = RX_DRAIN_CPU) if RX_DRAIN_THREAD and not MULTICAST_MODE else None
+
+    try:
+        if drain is not None:
+            drain.start()
+
+        if MULTICAST_MODE:
+            receive_multicast()
+
+        elif MUX_MODE:
+            receive_streams(drain or nrf)
+        else:
+            receive_file(drain or nrf)
+    
+    except KeyboardInterrupt:
+        ERROR("Process interrupted by user")
+
+    finally:
+        if drain is not None:
+            drain.stop()
+            drain.report()
+
+        # NOTE: the capture wraps the profiler, if both are on
+        if capture is not None:
+            capture.detach()
+
+        if profiler is not None:
+            profiler.report()
+
+        nrf.power_down()
+        pi.stop()
+
+    return
+
+
+
+
+
+
+
+
+
+
+def BEGIN_RELAY_MODE() -> None:
+    """
+    Forwards every frame received on `RADIO_CHANNEL` to the next hop on
+    `RELAY_CHANNEL` and the other way around, until the user exits with CTRL+C.
+    The flow of the RELAY MODE is the following:
+
+    1. The second radio is configured to behave as a transmitter towards the next
+    hop
+
+    2. Frames are drained from the RX FIFO of each radio into a bounded buffer
+    and forwarded through the other one as soon as possible
+    """
+
+    INFO(f"Starting relay: channel {RADIO_CHANNEL} -> channel {RELAY_CHANNEL}")
+
+    try:
+        relay_nrf = CustomNRF24(pi = pi, ce = RELAY_CE_PIN, spi_speed = 10_000_000, spi_channel = SPI_CHANNEL.MAIN_CE1)
+        configure_radio(relay_nrf, RELAY_CHANNEL)
+        choose_address_based_on_role(Role.TRANSMITTER, relay_nrf)
+
+        relay = Relay(upstream = nrf, downstream = relay_nrf, data_address = b"TA1", control_address = SESSION_CONTROL_ADDRESS)
+        last_forwarded = 0
+
+        try:
+            while True:
+                relay.step()
+
+                if relay.forwarded() - last_forwarded >= PROGRESS_EVERY:
+                    last_forwarded = relay.forwarded()
+
+                    reset_line()
+                    INFO(f"Forwarded {relay.to_downstream.forwarded} down, {relay.to_upstream.forwarded} up | buffered {len(relay.to_downstream.queue)}/{len(relay.to_upstream.queue)}", end = "")
+                    sys.stdout.flush()
+        
+        finally:
+            reset_line()
+            INFO(f"Forwarded {relay.to_downstream.forwarded} frames down ({relay.to_downstream.lost} retried, peak buffer {relay.to_downstream.peak_queue}) and {relay.to_upstream.forwarded} up ({relay.to_upstream.lost} retried, peak buffer {relay.to_upstream.peak_queue})")
+            relay_nrf.power_down()
+
+    except KeyboardInterrupt:
+        ERROR("Process interrupted by user")
+
+    finally:
+        nrf.power_down()
+        pi.stop()
+
+    return
+
+
+
+
+
+
+
+
+
+
+def ping_probe(seq: int) -> float | None:
+    """
+    Sends one probe and polls the echo node until the probe comes back in an ACK
+    payload. Returns the round trip time in microseconds, measured with the send
+    time carried by the probe itself, or `None` if it got lost
+    """
+
+    # NOTE: ACK payloads of previous probes are stale
+    nrf.flush_rx()
+
+    frame    = ping.pack_probe(seq, time.perf_counter_ns())
+    deadline = time.perf_counter_ns() + PING_TIMEOUT_MS * 1_000_000
+
+    while time.perf_counter_ns() < deadline:
+        nrf.reset_packages_lost()
+        nrf.send(frame)
+
+        try:
+            nrf.wait_until_sent()
+        except TimeoutError:
+            pass
+
+        if nrf.get_packages_lost() != 0:
+            nrf.flush_tx()
+            continue
+
+        while nrf.data_ready():
+            echo = ping.unpack_probe(nrf.get_payload())
+
+            if echo is not None and echo[0] == seq:
+                return (time.perf_counter_ns() - echo[1]) / 1e3
+
+        # the probe got through, from now on only pull its echo
+        frame = ping.pack_poll(seq)
+
+    return None
+
+
+
+def BEGIN_PING_MODE() -> None:
+    """
+    Measures the round trip time of the link with `PING_COUNT` probes. The echo
+    node loads every probe it receives as its next ACK payload, so after each probe
+    the node polls until the probe comes back attached to an ACK
+    """
+
+    INFO(f"Pinging with {PING_COUNT} probes every {PING_INTERVAL_MS} ms")
+
+    rtts_us: list[float] = []
+    probes_sent = 0
+
+    try:
+        for seq in range(PING_COUNT):
+            tic = time.monotonic()
+
+            rtt_us = ping_probe(seq)
+            probes_sent += 1
+
+            if rtt_us is None:
+                reset_line()
+                WARN(f"Probe {seq} lost")
+            else:
+                rtts_us.append(rtt_us)
+
+            progress_bar(
+                active_msg     = f"Probe {seq}: {f'{rtt_us:.0f} us' if rtt_us is not None else 'lost'}",
+                finished_msg   = f"All probes sent",
+                current_status = seq + 1,
+                max_status     = PING_COUNT,
+            )
+
+            time.sleep(max(0.0, PING_INTERVAL_MS / 1000 - (time.monotonic() - tic)))
+
+    except KeyboardInterrupt:
+        ERROR("Process interrupted by user")
+
+    finally:
+        ping.report_rtts(rtts_us, probes_sent)
+
+        nrf.power_down()
+        pi.stop()
+
+    return
+
+
+
+def BEGIN_ECHO_MODE() -> None:
+    """
+    Returns every probe received in the ACK of the next frame, until no probe has
+    arrived for `RECEIVER_TIMEOUT_S` seconds
+    """
+
+    INFO(f"Echoing probes: {RECEIVER_TIMEOUT_S} seconds time-out")
+
+    echoed = 0
+
+    try:
+        nrf.flush_tx()
+        last_probe = time.monotonic()
+
+        while time.monotonic() - last_probe < RECEIVER_TIMEOUT_S:
+            if not nrf.data_ready():
+                continue
+
+            frame = nrf.get_payload()
+            if ping.unpack_probe(frame) is None:
+                continue # NOTE: polls only pull the echo that is already loaded
+
+            # NOTE: only the echo of the last probe has to be attached
+            nrf.flush_tx()
+            nrf.ack_payload(RF24_RX_ADDR.P1, frame)
+
+            echoed    += 1
+            last_probe = time.monotonic()
+
+        WARN("Connection timed-out")
+
+    except KeyboardInterrupt:
+        ERROR("Process interrupted by user")
+
+    finally:
+        INFO(f"Echoed {echoed} probes")
+
+        nrf.power_down()
+        pi.stop()
+
+    return
+
+
+
+def BEGIN_COORDINATOR_MODE() -> None:
+    """
+    Broadcasts a TDMA beacon at the start of every superframe until interrupted,
+    giving one slot of `TDMA_SLOT_US` to every node of `TDMA_NODES`
+    """
+
+    period_s = tdma.superframe_us(TDMA_SLOT_US, TDMA_GUARD_US, len(TDMA_NODES)) / 1e6
+
+    INFO(f"Coordinating {len(TDMA_NODES)} slots of {TDMA_SLOT_US / 1e3:.1f} ms, one beacon every {period_s * 1e3:.1f} ms")
+
+    seq = 0
+
+    try:
+        next_beacon = time.monotonic()
+
+        while True:
+            nrf.send_no_ack(tdma.pack_beacon(seq, TDMA_SLOT_US, TDMA_GUARD_US, TDMA_NODES))
+
+            try:
+                nrf.wait_until_sent()
+            except TimeoutError:
+                ERROR("Timeout while sending beacon")
+
+            seq += 1
+
+            # NOTE: scheduled on absolute times so the delays do not add up, if a
+            # beacon went out late the schedule starts again from now
+            next_beacon += period_s
+            delay        = next_beacon - time.monotonic()
+
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_beacon = time.monotonic()
+
+    except KeyboardInterrupt:
+        ERROR("Process interrupted by user")
+
+    finally:
+        INFO(f"Sent {seq} beacons")
+
+        nrf.power_down()
+        pi.stop()
+
+    return
+
+
+
+def serve_incoming(server: ControlServer) -> None:
+    """
+    Receives the session whose SYN is waiting in the RX FIFO and stores the file
+    in the directory of `get_received_file_path`, under the name it was sent with.
+    The file is only stored if every frame announced by the SYN and the FIN arrived
+    """
+
+    # NOTE: the service runs for long, the USB may have been plugged in or removed
+    # since the last transfer
+    forget_mount_points()
+
+    # NOTE: anything else in the RX FIFO is a leftover of a transfer that the other
+    # side gave up, it is dropped while looking for the SYN
+    session = accept_session(nrf, 0, SERVICE_POLL_S)
+
+    if session is None:
+        return
+
+    tic     = time.monotonic()
+    content = bytearray()
+
+    received, _, sent = receive_session(nrf, session, InactivityTimeout(SERVICE_TIMEOUT_S), content.extend)
+
+    transfer = unpack_transfer(bytes(content)) if received == session.frames and sent == received else None
+
+    if transfer is None:
+        server.stats["failed"] += 1
+        ERROR(f"Incomplete incoming transfer, discarded: {received} of {session.frames} frames")
+        return
+
+    name, content = transfer
+    file_path     = get_received_file_path().with_name(name)
+
+    try:
+        sink = WriteBehindSink(file_path)
+        sink.write(content)
+        sink.commit()
+
+    except OSError as e:
+        server.stats["failed"] += 1
+        ERROR(f"Could not write {file_path}: {e}")
+        return
+
+    server.stats["received"] += 1
+    SUCC(f"Received {len(content)} bytes into {file_path} in {(time.monotonic() - tic) * 1e3:.1f} ms")
+
+    return
+
+
+
+def serve_job(job: Job, server: ControlServer) -> None:
+    """
+    Sends a file queued through the control socket and reports the result back
+    """
+
+    forget_mount_points()
+
+    try:
+        content = job.path.read_bytes()
+
+    except OSError as e:
+        server.stats["failed"] += 1
+        job.finish(False, f"Cannot read {job.path}: {e}")
+        return
+
+    writing, _, _ = SERVICE_ADDRESSES[SERVICE_SIDE]
+    _, _, control = SERVICE_ADDRESSES["B" if SERVICE_SIDE == "A" else "A"]
+
+    packets = chunk_content(pack_transfer(job.path.name, content))
+    tic     = time.monotonic()
+
+    # NOTE: the other node may be gone, the queue cannot wait for it forever. A
+    # transfer takes as long as it needs while its frames keep being delivered
+    session  = open_session(nrf, len(packets), 0, writing, control, SERVICE_TIMEOUT_S, deadline = tic + SERVICE_TIMEOUT_S)
+    received = None
+
+    if session is not None:
+        session.frames = send_frames(nrf, packets, idle_s = SERVICE_TIMEOUT_S)
+        received       = close_session(nrf, session, writing, control, SERVICE_TIMEOUT_S)
+
+    elapsed_s = time.monotonic() - tic
+
+    # NOTE: only the count in the FIN-ACK tells that the other side stored the file
+    if received != len(packets):
+        reason = "it did not answer" if received is None else f"it got {received} of {len(packets)} frames"
+
+        server.stats["failed"] += 1
+        job.finish(False, f"Could not send {job.path.name}, {reason}")
+        ERROR(f"Could not send {job.path}, {reason} ({elapsed_s:.1f} s)")
+        return
+
+    server.stats["sent"] += 1
+    job.finish(True, f"Sent {len(content)} bytes of {job.path.name} in {elapsed_s * 1e3:.1f} ms")
+    INFO(f"Sent {job.path} ({len(content)} bytes) in {elapsed_s * 1e3:.1f} ms")
+
+    return
+
+
+
+def BEGIN_SERVICE_MODE() -> None:
+    """
+    Keeps the radio up and serves transfers until stopped through `service.py`:
+    the incoming ones are stored as soon as their SYN arrives and the outgoing
+    ones are sent in the order they were queued, so no transfer pays for setting
+    up the radio again
+    """
+
+    server = ControlServer()
+    server.start()
+
+    INFO(f"Service running, queue transfers with: python service.py send <file> (socket {server.path})")
+
+    try:
+        while not server.stopped.is_set():
+            if nrf.data_ready():
+                serve_incoming(server)
+                continue
+
+            job = server.next_job(SERVICE_POLL_S)
+            if job is not None:
+                serve_job(job, server)
+
+        INFO("Service stopped")
+
+    except KeyboardInterrupt:
+        ERROR("Process interrupted by user")
+
+    finally:
+        server.close()
+
+        nrf.power_down()
+        pi.stop()
+
+    return
+
+
+
+
+
+
+
+
+
+
+def BEGIN_CONSTANT_CARRIER_MODE() -> None:
+    """
+    Transmits a constant carrier until the user exits with CTRL+C
+    """
+    
+    ERROR("TODO")
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: MAIN :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def main():
+    """
+    Main flow of the application
+    """
+
+    role = choose_node_role()
+    choose_address_based_on_role(role, nrf)
+
+    if EVENT_LOG:
+        eventlog.start(EVENT_LOG_PATH)
+
+    try:
+        if role is Role.TRANSMITTER:
+            BEGIN_TRANSMITTER_MODE()
+        
+        elif role is Role.RECEIVER:
+            BEGIN_RECEIVER_MODE()
+            
+        elif role is Role.CARRIER:
+            BEGIN_CONSTANT_CARRIER_MODE()
+
+        elif role is Role.RELAY:
+            BEGIN_RELAY_MODE()
+
+        elif role is Role.PING:
+            BEGIN_PING_MODE()
+
+        elif role is Role.ECHO:
+            BEGIN_ECHO_MODE()
+
+        elif role is Role.COORDINATOR:
+            BEGIN_COORDINATOR_MODE()
+
+        elif role is Role.SERVICE:
+            BEGIN_SERVICE_MODE()
+
+    finally:
+        eventlog.stop()
 
     return
 # :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
@@ -0,0 +1,137 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from nrf24 import (
+    RF24_DATA_RATE,
+    RF24_PA,
+    RF24_CRC,
+)
+
+from pathlib import Path
+from typing import Any
+import json
+
+from console import (
+    WARN,
+    INFO,
+)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# NOTE: written by `tune.py` and loaded by every role at startup
+RADIO_PROFILE_PATH = Path(__file__).with_name("radio_profile.json")
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: PROFILE ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class RadioProfile:
+    """
+    The radio parameters that change the goodput of a transfer. `window` is the
+    number of frames queued in the TX FIFO at once, 0 keeps the plain stop & wait
+    of `send_frames`
+    """
+
+    def __init__(
+        self: "RadioProfile",
+        data_rate: RF24_DATA_RATE = RF24_DATA_RATE.RATE_1MBPS,
+        pa_level: RF24_PA         = RF24_PA.HIGH,
+        retry_delay: int          = 1,
+        retries: int              = 15,
+        address_bytes: int        = 3,
+        crc_bytes: RF24_CRC       = RF24_CRC.BYTES_2,
+        window: int               = 0,
+    ) -> None:
+        self.data_rate     = data_rate
+        self.pa_level      = pa_level
+        self.retry_delay   = retry_delay
+        self.retries       = retries
+        self.address_bytes = address_bytes
+        self.crc_bytes     = crc_bytes
+        self.window        = window
+        return
+
+
+    def __str__(self: "RadioProfile") -> str:
+        return (
+            f"{self.data_rate.name} | PA {self.pa_level.name} | ARD {self.retry_delay} ARC {self.retries} | "
+            f"{self.address_bytes} address bytes | CRC {self.crc_bytes.name} | window {self.window}"
+        )
+
+
+    def apply(self: "RadioProfile", nrf: Any) -> None:
+        """
+        Configures the radio, the pipes have to be opened again afterwards if the
+        address width changed
+        """
+
+        nrf.set_data_rate(self.data_rate)
+        nrf.set_pa_level(self.pa_level)
+        nrf.set_retransmission(self.retry_delay, self.retries)
+        nrf.set_address_bytes(self.address_bytes)
+
+        nrf.enable_crc()
+        nrf.set_crc_bytes(self.crc_bytes)
+        return
+
+
+    def to_dict(self: "RadioProfile") -> dict:
+        return {
+            "data_rate":     self.data_rate.name,
+            "pa_level":      self.pa_level.name,
+            "retry_delay":   self.retry_delay,
+            "retries":       self.retries,
+            "address_bytes": self.address_bytes,
+            "crc_bytes":     self.crc_bytes.name,
+            "window":        self.window,
+        }
+
+
+    @staticmethod
+    def from_dict(values: dict) -> "RadioProfile":
+        return RadioProfile(
+            data_rate     = RF24_DATA_RATE[values["data_rate"]],
+            pa_level      = RF24_PA[values["pa_level"]],
+            retry_delay   = int(values["retry_delay"]),
+            retries       = int(values["retries"]),
+            address_bytes = int(values["address_bytes"]),
+            crc_bytes     = RF24_CRC[values["crc_bytes"]],
+            window        = int(values["window"]),
+        )
+
+
+
+def load_profile(path: Path = RADIO_PROFILE_PATH) -> RadioProfile:
+    """
+    Returns the profile stored at `path`, or the default one if there is none (or
+    it cannot be read)
+    """
+
+    if not path.is_file():
+        return RadioProfile()
+
+    try:
+        profile = RadioProfile.from_dict(json.loads(path.read_text()))
+
+    except (OSError, ValueError, KeyError) as e:
+        WARN(f"Ignoring radio profile {path}: {e}")
+        return RadioProfile()
+
+    INFO(f"Radio profile loaded from {path}: {profile}")
+    return profile
+
+
+
+def save_profile(profile: RadioProfile, path: Path = RADIO_PROFILE_PATH, **extra: Any) -> None:
+    """
+    Stores the profile, together with any `extra` information (e.g. the goodput it
+    was measured with)
+    """
+
+    path.write_text(json.dumps({**profile.to_dict(), **extra}, indent = 4) + "\n")
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
@@ -0,0 +1,164 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from nrf24 import (
+    NRF24,
+
+    RF24_RX_ADDR,
+)
+
+from collections import deque
+
+from link import send_attempt
+from session import CONTROL_PIPE
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+RELAY_BUFFER_FRAMES = 64
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: RELAY ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class RelayPort:
+    """
+    One side of the relay. Frames received by the other side are queued here
+    until this radio manages to forward them. If the port has a
+    `control_address`, the frames that arrived on the control pipe of a session
+    are forwarded to it instead of `data_address`
+    """
+
+    def __init__(self: "RelayPort", nrf: NRF24, buffer_frames: int, data_address: bytes | None = None, control_address: bytes | None = None) -> None:
+        self.nrf             = nrf
+        self.buffer_frames   = buffer_frames
+        self.data_address    = data_address
+        self.control_address = control_address
+
+        self.queue: deque[tuple[bytes, bool]] = deque() # (frame, is control)
+        self.in_flight = False
+        self.resend    = False # the head of the queue is still in the TX FIFO, lost
+
+        self._sending_control = False
+
+        self.forwarded  = 0
+        self.lost       = 0
+        self.peak_queue = 0
+        return
+
+
+    def has_room(self: "RelayPort") -> bool:
+        """
+        Whether there is room for another frame in the buffer
+        """
+        return len(self.queue) < self.buffer_frames
+
+
+    def push(self: "RelayPort", packet: bytes, control: bool = False) -> None:
+        """
+        Queues a frame to be forwarded
+        """
+
+        self.queue.append((packet, control))
+        self.peak_queue = max(self.peak_queue, len(self.queue))
+        return
+
+
+    def step(self: "RelayPort") -> None:
+        """
+        Advances the transmission of the head of the queue without blocking. A frame
+        only leaves the queue once it has been acknowledged by the next hop, until
+        then it is sent again from the TX FIFO
+        """
+
+        if self.in_flight:
+            if self.nrf.is_sending():
+                return
+
+            self.in_flight = False
+
+            self.resend = self.nrf.get_packages_lost() != 0
+
+            if self.resend:
+                self.lost += 1
+            else:
+                self.queue.popleft()
+                self.forwarded += 1
+
+        if self.queue:
+            packet, control = self.queue[0]
+
+            # NOTE: control frames are rare, the writing pipe only changes around them
+            if control != self._sending_control:
+                self.nrf.open_writing_pipe(self.control_address if control else self.data_address)
+                self._sending_control = control
+
+            # NOTE: a lost frame is restarted from the TX FIFO, with the same PID, so
+            # the next hop drops the copy if only the ACK was lost
+            self.nrf.reset_packages_lost()
+            send_attempt(self.nrf, packet, self.resend)
+            self.in_flight = True
+
+        return
+
+
+
+class Relay:
+    """
+    Store-and-forward relay built on top of two radios, one for each hop. The
+    frames are forwarded as soon as they arrive (cut-through) so both hops are
+    busy at the same time and the throughput of the chain is close to the one of
+    a single hop.
+
+    Backpressure comes for free: when a buffer is full the RX FIFO of the radio
+    that feeds it is not drained, the radio stops acknowledging and the previous
+    hop keeps retrying until there is room again.
+
+    The SYN and FIN of the sessions travel downstream only, given the addresses
+    of the next hop they keep going to its control pipe
+    """
+
+    def __init__(self: "Relay", upstream: NRF24, downstream: NRF24, buffer_frames: int = RELAY_BUFFER_FRAMES, data_address: bytes | None = None, control_address: bytes | None = None) -> None:
+        # NOTE: frames received from upstream are sent through the downstream radio
+        # and the other way around
+        self.to_downstream = RelayPort(downstream, buffer_frames, data_address, control_address)
+        self.to_upstream   = RelayPort(upstream, buffer_frames)
+        return
+
+
+    def _drain(self: "Relay", source: NRF24, port: RelayPort) -> None:
+        """
+        Moves frames from the RX FIFO of `source` into the queue of `port` while
+        there is room
+        """
+
+        # NOTE: the RX FIFO keeps its frames while the radio is sending
+        while port.has_room() and source.data_ready():
+            control = port.control_address is not None and source.data_pipe() == CONTROL_PIPE - RF24_RX_ADDR.P0
+            port.push(source.get_payload(), control)
+
+        return
+
+
+    def step(self: "Relay") -> None:
+        """
+        Runs one iteration of the relay in both directions
+        """
+
+        self._drain(self.to_upstream.nrf, self.to_downstream)
+        self._drain(self.to_downstream.nrf, self.to_upstream)
+
+        self.to_downstream.step()
+        self.to_upstream.step()
+        return
+
+
+    def forwarded(self: "Relay") -> int:
+        """
+        Total number of frames forwarded in both directions
+        """
+        return self.to_downstream.forwarded + self.to_upstream.forwarded
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
@@ -0,0 +1,233 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from collections import deque
+from typing import Any
+import threading
+import time
+import sys
+import os
+
+from console import (
+    WARN,
+    INFO,
+)
+from custom_nrf24 import CustomNRF24
+from payload_pool import PayloadPool
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+RX_DRAIN_QUEUE_FRAMES = 4096  # frames waiting to be processed, 128 KiB of buffers
+
+# NOTE: the drain thread needs the GIL back as soon as its SPI transaction returns,
+# with the default switch interval (5 ms) the processing thread keeps it for longer
+# than the RX FIFO lasts at 2 Mbps
+RX_DRAIN_SWITCH_S = 100e-6
+
+RX_DRAIN_IDLE_S = 1e-3  # longest wait of the processing thread for the next frame
+RX_DRAIN_FULL_S = 50e-6 # the queue is full, the RX FIFO is left to fill up meanwhile
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: DRAIN ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class RxDrain:
+    """
+    Thread that does nothing but moving frames from the RX FIFO of the radio into a
+    bounded queue, so the pauses of the processing (progress bar, file writes, GC)
+    do not leave the 3 frames of the RX FIFO full.
+
+    The frames wait in the buffers of a `PayloadPool`, the queue only holds their
+    indexes. The thread stands in for the radio in the receive loops: `data_ready`,
+    `data_pipe`, `get_payload` and `get_payload_into` read the queue, any other method is called on the radio between
+    two polls of the thread. While the radio is sending the thread leaves it alone.
+
+    Every time the thread finds the RX FIFO full it counts an overflow: from then on
+    the radio does not acknowledge new frames, and frames sent without ACK are lost.
+    If the queue is full the thread stops draining, which has the same effect
+    """
+
+    def __init__(
+        self: "RxDrain",
+        nrf: CustomNRF24,
+        queue_frames: int = RX_DRAIN_QUEUE_FRAMES,
+        priority: int | None = None,
+        cpu: int | None = None,
+    ) -> None:
+        self.nrf          = nrf
+        self.queue_frames = queue_frames
+        self.priority     = priority # SCHED_FIFO priority of the thread, if given
+        self.cpu          = cpu      # CPU the thread is pinned to, if given
+
+        self.pool  = PayloadPool(queue_frames)
+        self.queue: deque[int] = deque() # indexes of the pool, in arrival order
+
+        self.polls           = 0
+        self.frames          = 0
+        self.rx_overflows    = 0
+        self.queue_overflows = 0
+        self.peak_queue      = 0
+
+        self._lock     = threading.Lock()
+        self._arrived  = threading.Event()
+        self._stopped  = False
+        self._waiters  = 0
+        self._interval = sys.getswitchinterval()
+
+        self._thread = threading.Thread(target = self._run, name = "rx drain", daemon = True)
+        return
+
+
+    def start(self: "RxDrain") -> None:
+        sys.setswitchinterval(RX_DRAIN_SWITCH_S)
+        self._thread.start()
+        return
+
+
+    def stop(self: "RxDrain") -> None:
+        self._stopped = True
+        self._thread.join()
+
+        sys.setswitchinterval(self._interval)
+        return
+
+
+    def _set_scheduling(self: "RxDrain") -> None:
+        """
+        Applies the real-time priority and the CPU affinity to the calling thread,
+        both need privileges the node may not have
+        """
+
+        try:
+            if self.priority is not None:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.priority))
+
+            if self.cpu is not None:
+                os.sched_setaffinity(0, {self.cpu})
+
+        except (OSError, AttributeError) as e:
+            WARN(f"RX drain thread keeps the default scheduling: {e}")
+
+        return
+
+
+    def _run(self: "RxDrain") -> None:
+        self._set_scheduling()
+
+        rx_full    = False
+        queue_full = False
+
+        while not self._stopped:
+            # NOTE: the lock is released after every poll, let a waiting call in. A
+            # single yield is not enough when other processes compete for the CPU,
+            # the thread could take the lock again before the call is scheduled
+            while self._waiters > 0 and not self._stopped:
+                time.sleep(0)
+
+            if self.pool.available() == 0:
+                if not queue_full:
+                    self.queue_overflows += 1
+                    queue_full = True
+
+                time.sleep(RX_DRAIN_FULL_S)
+                continue
+
+            queue_full = False
+
+            with self._lock:
+                # NOTE: reading a payload toggles CE, which would disturb a frame
+                # being sent
+                if self.nrf._power_tx:
+                    continue
+
+                status, fifo_status = self.nrf.get_fifo_status()
+                self.polls += 1
+
+                if fifo_status & self.nrf.FRX_FULL:
+                    if not rx_full:
+                        self.rx_overflows += 1
+                    rx_full = True
+                else:
+                    rx_full = False
+
+                pipe = (status >> 1) & 0x07
+
+                if pipe == self.nrf.RX_P_NO_EMPTY:
+                    continue
+
+                index  = self.pool.acquire()
+                length = self.nrf.get_payload_into(self.pool.buffers[index])
+
+                if length == 0:
+                    self.pool.release(index)
+                    continue
+
+                self.pool.pipes[index]   = pipe
+                self.pool.lengths[index] = length
+                self.queue.append(index)
+
+            self.frames     += 1
+            self.peak_queue  = max(self.peak_queue, len(self.queue))
+            self._arrived.set()
+
+        return
+
+
+    def data_ready(self: "RxDrain") -> bool:
+        if self.queue:
+            return True
+
+        # NOTE: spinning here would hold the GIL that the drain thread needs
+        self._arrived.clear()
+
+        if not self.queue:
+            self._arrived.wait(RX_DRAIN_IDLE_S)
+
+        return bool(self.queue)
+
+
+    def data_pipe(self: "RxDrain") -> int:
+        return self.pool.pipes[self.queue[0]]
+
+
+    def get_payload(self: "RxDrain") -> bytes:
+        index   = self.queue.popleft()
+        payload = bytes(self.pool.view(index))
+
+        self.pool.release(index)
+        return payload
+
+
+    def get_payload_into(self: "RxDrain", buffer: bytearray) -> int:
+        index  = self.queue.popleft()
+        length = self.pool.lengths[index]
+
+        buffer[:length] = self.pool.view(index)
+
+        self.pool.release(index)
+        return length
+
+
+    def __getattr__(self: "RxDrain", name: str) -> Any:
+        attribute = getattr(self.nrf, name)
+
+        if not callable(attribute):
+            return attribute
+
+        def locked(*args, **kwargs) -> Any:
+            self._waiters += 1
+            with self._lock:
+                self._waiters -= 1
+                return attribute(*args, **kwargs)
+
+        return locked
+
+
+    def report(self: "RxDrain") -> None:
+        INFO(f"RX drain: {self.frames} frames in {self.polls} polls | RX FIFO full {self.rx_overflows} times | queue full {self.queue_overflows} times (peak {self.peak_queue} frames)")
+        return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
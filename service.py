@@ -0,0 +1,285 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from pathlib import Path
+import threading
+import argparse
+import socket
+import struct
+import queue
+import json
+import time
+import sys
+
+from console import (
+    ERROR,
+    SUCC,
+    INFO,
+)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+SERVICE_SOCKET_PATH = Path("/tmp/nrf24_service.sock")
+
+# NOTE: every transfer of the service starts with the name of the file, so the
+# other side knows where to store it
+NAME_LENGTH = struct.Struct("<B")
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: TRANSFERS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def pack_transfer(name: str, content: bytes) -> bytes:
+    encoded = name.encode()[:255]
+    return NAME_LENGTH.pack(len(encoded)) + encoded + content
+
+
+
+def unpack_transfer(blob: bytes) -> tuple[str, bytes] | None:
+    """
+    Returns the file name and the content of a transfer, `None` if it is malformed.
+    Only the last component of the name is kept, so a peer cannot write outside of
+    the inbox
+    """
+
+    if len(blob) < NAME_LENGTH.size:
+        return None
+
+    (length,) = NAME_LENGTH.unpack_from(blob)
+    name      = Path(blob[NAME_LENGTH.size:NAME_LENGTH.size + length].decode(errors = "replace")).name
+
+    if not name or len(blob) < NAME_LENGTH.size + length:
+        return None
+
+    return name, blob[NAME_LENGTH.size + length:]
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONTROL SOCKET :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# NOTE: the protocol is one JSON request per connection, answered with one JSON
+# reply:
+#
+#   {"op": "send", "path": "/abs/path.txt"} -> once the file has been sent
+#   {"op": "status"}                         -> at once
+#   {"op": "stop"}                           -> at once
+class Job:
+    """
+    Outgoing transfer queued through the control socket, the connection that
+    queued it waits until `finish` is called to reply
+    """
+
+    def __init__(self: "Job", path: Path) -> None:
+        self.path   = path
+        self.reply: dict = {}
+
+        self._done = threading.Event()
+        return
+
+
+    def finish(self: "Job", ok: bool, message: str) -> None:
+        self.reply = {"ok": ok, "message": message}
+        self._done.set()
+        return
+
+
+    def wait(self: "Job") -> dict:
+        self._done.wait()
+        return self.reply
+
+
+
+class ControlServer:
+    """
+    Local control socket of the service. It runs in a background thread, queues
+    the outgoing transfers for the radio loop, that takes them with `next_job`,
+    and answers the status requests with the counters in `stats`
+    """
+
+    def __init__(self: "ControlServer", path: Path = SERVICE_SOCKET_PATH) -> None:
+        self.path    = path
+        self.stopped = threading.Event()
+        self.jobs: queue.Queue[Job] = queue.Queue()
+        self.stats   = {"sent": 0, "received": 0, "failed": 0}
+        self.started = time.monotonic()
+
+        # NOTE: a socket left behind by a service that did not exit cleanly
+        self.path.unlink(missing_ok = True)
+
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(str(self.path))
+        self._socket.listen()
+
+        self._thread = threading.Thread(target = self._accept, name = "control socket", daemon = True)
+        return
+
+
+    def start(self: "ControlServer") -> None:
+        self._thread.start()
+        return
+
+
+    def _accept(self: "ControlServer") -> None:
+        while not self.stopped.is_set():
+            try:
+                connection, _ = self._socket.accept()
+            except OSError:
+                return # NOTE: the socket was closed by `close`
+
+            threading.Thread(target = self._handle, args = (connection,), daemon = True).start()
+
+        return
+
+
+    def _handle(self: "ControlServer", connection: socket.socket) -> None:
+        with connection, connection.makefile("rw") as stream:
+            try:
+                request = json.loads(stream.readline())
+            except ValueError:
+                request = {}
+
+            reply = self._reply_to(request)
+
+            stream.write(json.dumps(reply) + "\n")
+            stream.flush()
+
+        return
+
+
+    def _reply_to(self: "ControlServer", request: dict) -> dict:
+        op = request.get("op")
+
+        if op == "send":
+            path = Path(request.get("path", ""))
+
+            if self.stopped.is_set():
+                return {"ok": False, "message": "Service stopped"}
+
+            if not path.is_file():
+                return {"ok": False, "message": f"No such file: {path}"}
+
+            job = Job(path)
+            self.jobs.put(job)
+            return job.wait()
+
+        if op == "status":
+            return {
+                "ok":       True,
+                "uptime_s": round(time.monotonic() - self.started, 1),
+                "queued":   self.jobs.qsize(),
+                **self.stats,
+            }
+
+        if op == "stop":
+            self.stopped.set()
+            return {"ok": True, "message": "Stopping"}
+
+        return {"ok": False, "message": f"Unknown request: {request}"}
+
+
+    def next_job(self: "ControlServer", timeout_s: float) -> Job | None:
+        """
+        Returns the next queued transfer, waiting at most `timeout_s` for one
+        """
+
+        try:
+            return self.jobs.get(timeout = timeout_s)
+        except queue.Empty:
+            return None
+
+
+    def close(self: "ControlServer") -> None:
+        """
+        Stops accepting requests and fails the transfers that are still queued
+        """
+
+        self.stopped.set()
+        self._socket.close()
+        self.path.unlink(missing_ok = True)
+
+        while (job := self.next_job(0)) is not None:
+            job.finish(False, "Service stopped")
+
+        return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CLIENT :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def send_request(message: dict, path: Path = SERVICE_SOCKET_PATH) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(str(path))
+
+        with connection.makefile("rw") as stream:
+            stream.write(json.dumps(message) + "\n")
+            stream.flush()
+
+            return json.loads(stream.readline())
+
+
+
+def main():
+    """
+    Talks to a node running in service mode (role [S]ervice of
+    `point_to_point_mode.py`):
+
+        python service.py send file_1.txt file_2.txt
+        python service.py status
+        python service.py stop
+
+    Every `send` returns once the file has been delivered
+    """
+
+    parser = argparse.ArgumentParser(description = "Control client of the radio service")
+    parser.add_argument("--socket", type = Path, default = SERVICE_SOCKET_PATH)
+
+    commands = parser.add_subparsers(dest = "command", required = True)
+    send     = commands.add_parser("send", help = "queue files to send, in order")
+    send.add_argument("files", type = Path, nargs = "+")
+    commands.add_parser("status")
+    commands.add_parser("stop")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "send":
+            failed = False
+
+            for file in args.files:
+                reply = send_request({"op": "send", "path": str(file.resolve())}, args.socket)
+
+                if reply["ok"]:
+                    SUCC(reply["message"])
+                else:
+                    ERROR(reply["message"])
+                    failed = True
+
+            sys.exit(1 if failed else 0)
+
+        reply = send_request({"op": args.command}, args.socket)
+
+    except OSError as e:
+        ERROR(f"Cannot reach the service at {args.socket}: {e}")
+        sys.exit(1)
+
+    if args.command == "status":
+        INFO(f"Up {reply['uptime_s']} s | sent {reply['sent']} | received {reply['received']} | failed {reply['failed']} | queued {reply['queued']}")
+    else:
+        INFO(reply["message"])
+
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from nrf24 import (
+    NRF24,
+
+    RF24_RX_ADDR,
+)
+
+from typing import Callable
+import random
+import struct
+import time
+
+from console import (
+    ERROR,
+    WARN,
+    reset_line,
+    progress_bar,
+)
+from link import (
+    DATA_SIZE,
+    PROGRESS_EVERY,
+    send_frame,
+)
+from custom_nrf24 import CustomNRF24
+from channel_access import ChannelAccess
+from credit import CreditGrant
+from tdma import TDMASlot
+import eventlog
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+SESSION_VERSION = 1
+
+# NOTE: the transmitter sends SYN and FIN to the control pipe of the receiver, so
+# they can never be mistaken for a data frame whatever the codec. The replies go
+# back through the usual reading pipe of the transmitter, which only expects them
+CONTROL_PIPE = RF24_RX_ADDR.P2
+
+SYN     = ord("S")
+SYN_ACK = ord("A")
+FIN     = ord("F")
+FIN_ACK = ord("K")
+
+SYN_FRAME     = struct.Struct("<BBHIB") # type, version, session ID, frames, flags
+SYN_ACK_FRAME = struct.Struct("<BHBB")  # type, session ID, accepted, flags
+FIN_FRAME     = struct.Struct("<BHI")   # type, session ID, frames sent (FIN) or received (FIN_ACK)
+
+# NOTE: the settings that both nodes must agree on, checked during the handshake
+FLAG_DELTA  = 1 << 0
+FLAG_CODEC  = 1 << 1
+FLAG_MUX    = 1 << 2
+FLAG_CREDIT = 1 << 3
+
+FLAG_NAMES = {
+    FLAG_DELTA:  "DELTA_MODE",
+    FLAG_CODEC:  "DICTIONARY_CODEC",
+    FLAG_MUX:    "MUX_MODE",
+    FLAG_CREDIT: "CREDIT_MODE",
+}
+
+# NOTE: same estimator as the retransmission timeout of TCP (RFC 6298), applied to
+# the time between data frames
+INTERARRIVAL_GAIN = 1 / 8
+DEVIATION_GAIN    = 1 / 4
+DEVIATION_FACTOR  = 4
+MIN_TIMEOUT_S     = 0.5 # NOTE: a few lost frames in a row must not end the session
+
+# NOTE: the transmitter stops listening as soon as it gets the SYN-ACK or FIN-ACK,
+# if only the ACK of the answer was lost the receiver would send it forever
+ANSWER_TIMEOUT_S = 1
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: SESSION ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def session_flags(delta: bool, codec: bool, mux: bool, credit: bool) -> int:
+    return (
+        (FLAG_DELTA if delta else 0)
+        | (FLAG_CODEC if codec else 0)
+        | (FLAG_MUX if mux else 0)
+        | (FLAG_CREDIT if credit else 0)
+    )
+
+
+
+def describe_mismatch(local: int, remote: int) -> str:
+    return ", ".join(
+        f"{name} is {'on' if local & flag else 'off'} here but {'on' if remote & flag else 'off'} there"
+        for flag, name in FLAG_NAMES.items()
+        if (local ^ remote) & flag
+    )
+
+
+
+class Session:
+    """
+    One transfer between a transmitter and a receiver, from the SYN to the FIN
+    """
+
+    def __init__(self: "Session", session_id: int, frames: int, flags: int) -> None:
+        self.session_id = session_id
+        self.frames     = frames
+        self.flags      = flags
+
+        self.finished = False # NOTE: set by the receiver once the FIN arrives
+        return
+
+
+
+class InactivityTimeout:
+    """
+    Silence after which the transmitter is considered gone. It follows the time
+    between data frames: the smoothed interarrival time plus `DEVIATION_FACTOR`
+    times its deviation, between `min_s` and `max_s`. Until two frames have
+    arrived it is `max_s`
+    """
+
+    def __init__(self: "InactivityTimeout", max_s: float, min_s: float = MIN_TIMEOUT_S) -> None:
+        self.min_s = min_s
+        self.max_s = max_s
+
+        self.interarrival_s: float | None = None
+        self.deviation_s = 0.0
+
+        self._last_frame = time.monotonic()
+        self._frames     = 0
+        return
+
+
+    def frame_arrived(self: "InactivityTimeout", now: float) -> None:
+        if self._frames > 0:
+            sample = now - self._last_frame
+
+            if self.interarrival_s is None:
+                self.interarrival_s = sample
+                self.deviation_s    = sample / 2
+            else:
+                self.deviation_s    = (1 - DEVIATION_GAIN) * self.deviation_s + DEVIATION_GAIN * abs(self.interarrival_s - sample)
+                self.interarrival_s = (1 - INTERARRIVAL_GAIN) * self.interarrival_s + INTERARRIVAL_GAIN * sample
+
+        self._frames     += 1
+        self._last_frame  = now
+        return
+
+
+    def timeout_s(self: "InactivityTimeout") -> float:
+        if self.interarrival_s is None:
+            return self.max_s
+
+        return min(max(self.interarrival_s + DEVIATION_FACTOR * self.deviation_s, self.min_s), self.max_s)
+
+
+    def expired(self: "InactivityTimeout", now: float) -> bool:
+        return now - self._last_frame > self.timeout_s()
+
+
+
+def wait_for_reply(nrf: NRF24, kind: int, layout: struct.Struct, session_id: int, timeout_s: float) -> tuple | None:
+    """
+    Waits up to `timeout_s` for the reply of the receiver to the given session,
+    anything else that arrives meanwhile is dropped
+    """
+
+    deadline = time.monotonic() + timeout_s
+
+    while time.monotonic() < deadline:
+        if not nrf.data_ready():
+            continue
+
+        packet = bytes(nrf.get_payload())
+
+        if len(packet) != layout.size or packet[0] != kind:
+            continue
+
+        reply = layout.unpack(packet)
+
+        if reply[1] == session_id:
+            return reply
+
+    return None
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: TRANSMITTER ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def send_control(nrf: NRF24, frame: bytes, data_address: bytes, control_address: bytes, channel: ChannelAccess | TDMASlot | None, deadline: float | None = None) -> bool:
+    """
+    Sends a frame to the control pipe of the receiver and points the radio back to
+    its data pipe. Returns whether the frame was acknowledged
+    """
+
+    nrf.open_writing_pipe(control_address)
+    delivered = send_frame(nrf, frame, channel, deadline)
+    nrf.open_writing_pipe(data_address)
+
+    return delivered is not None
+
+
+
+def open_session(nrf: NRF24, frames: int, flags: int, data_address: bytes, control_address: bytes, timeout_s: float, channel: ChannelAccess | TDMASlot | None = None, deadline: float | None = None) -> Session | None:
+    """
+    Starts a session of `frames` data frames. The SYN is retried until the
+    receiver acknowledges it or, if given, `time.monotonic()` passes `deadline`,
+    then the receiver has `timeout_s` to accept it. Returns `None` if it did not,
+    or if the nodes do not agree on `flags`
+    """
+
+    session = Session(random.getrandbits(16), frames, flags)
+
+    if not send_control(nrf, SYN_FRAME.pack(SYN, SESSION_VERSION, session.session_id, frames, flags), data_address, control_address, channel, deadline):
+        ERROR("The receiver did not acknowledge the SYN")
+        return None
+
+    reply = wait_for_reply(nrf, SYN_ACK, SYN_ACK_FRAME, session.session_id, timeout_s)
+
+    if reply is None:
+        ERROR("The receiver did not answer the SYN")
+        return None
+
+    _, _, accepted, remote_flags = reply
+
+    if not accepted:
+        ERROR(f"The receiver rejected the session: {describe_mismatch(flags, remote_flags) or 'different protocol version'}")
+        return None
+
+    eventlog.record(eventlog.SESSION_OPEN, frames, value = session.session_id)
+    return session
+
+
+
+def close_session(nrf: NRF24, session: Session, data_address: bytes, control_address: bytes, timeout_s: float, channel: ChannelAccess | TDMASlot | None = None) -> int | None:
+    """
+    Sends the FIN and waits for the FIN-ACK. Returns the number of data frames
+    that the receiver got, or `None` if it did not answer within `timeout_s`
+    """
+
+    fin = FIN_FRAME.pack(FIN, session.session_id, session.frames)
+
+    if not send_control(nrf, fin, data_address, control_address, channel, time.monotonic() + timeout_s):
+        return None
+
+    reply = wait_for_reply(nrf, FIN_ACK, FIN_FRAME, session.session_id, timeout_s)
+
+    if reply is None:
+        return None
+
+    return reply[2]
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: RECEIVER :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def accept_session(nrf: NRF24, flags: int, timeout_s: float | None = None) -> Session | None:
+    """
+    Blocks until a SYN arrives and answers it, accepting the session if both
+    nodes agree on `flags`. Returns `None` if it was rejected or, if given, no SYN
+    arrived within `timeout_s`
+    """
+
+    deadline = time.monotonic() + timeout_s if timeout_s is not None else None
+
+    while True:
+        if not nrf.data_ready():
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            continue
+
+        pipe   = nrf.data_pipe()
+        packet = bytes(nrf.get_payload())
+
+        # NOTE: leftovers of a previous transfer
+        if pipe != CONTROL_PIPE - RF24_RX_ADDR.P0 or len(packet) != SYN_FRAME.size or packet[0] != SYN:
+            continue
+
+        _, version, session_id, frames, remote_flags = SYN_FRAME.unpack(packet)
+        accepted = version == SESSION_VERSION and remote_flags == flags
+
+        send_frame(nrf, SYN_ACK_FRAME.pack(SYN_ACK, session_id, accepted, flags), deadline = time.monotonic() + ANSWER_TIMEOUT_S)
+
+        if not accepted:
+            ERROR(f"Session rejected: {describe_mismatch(flags, remote_flags) or f'protocol version {version}'}")
+            return None
+
+        eventlog.record(eventlog.SESSION_OPEN, frames, value = session_id)
+        return Session(session_id, frames, flags)
+
+
+
+def receive_session(
+    nrf: CustomNRF24,
+    session: Session,
+    timeout: InactivityTimeout,
+    on_chunk: Callable[[bytes], None] | None = None,
+    credits: CreditGrant | None = None,
+) -> tuple[int, float, int | None]:
+    """
+    Same as `receive_frames` but it stops as soon as the FIN of the session
+    arrives, which is answered with the number of frames received, or once
+    `timeout` expires. If given, `credits` grants the transmitter a new frame
+    every time one is taken out of the RX FIFO. Returns the number of chunks
+    received, the time elapsed between the first and the last one and the number
+    of frames that the FIN says were sent (`None` if it never arrived).
+
+    Every frame is read into the same buffer with `get_payload_into`, so the loop
+    creates no objects of its own: `on_chunk` gets a view of the buffer that is
+    only valid until it returns
+    """
+
+    buffer = bytearray(DATA_SIZE)
+    views  = [memoryview(buffer)[:length] for length in range(DATA_SIZE + 1)] # NOTE: one for every payload length
+
+    received    = 0
+    sent        = None
+    first_frame = None
+    last_frame  = None
+
+    while True:
+        now = time.monotonic()
+
+        if not nrf.data_ready():
+            if timeout.expired(now):
+                break
+            continue
+
+        pipe   = nrf.data_pipe()
+        packet = views[nrf.get_payload_into(buffer)]
+
+        if pipe == CONTROL_PIPE - RF24_RX_ADDR.P0:
+            if credits is not None and credits.is_probe(packet):
+                credits.probed(received)
+                continue
+
+            if len(packet) != FIN_FRAME.size or packet[0] != FIN:
+                continue
+
+            _, session_id, frames_sent = FIN_FRAME.unpack(packet)
+
+            if session_id != session.session_id:
+                continue
+
+            sent = frames_sent
+
+            session.finished = True
+            eventlog.record(eventlog.SESSION_CLOSE, received, value = session.session_id)
+
+            # NOTE: ACK payloads left in the TX FIFO would go out as frames
+            nrf.flush_tx()
+            send_frame(nrf, FIN_FRAME.pack(FIN_ACK, session.session_id, received), deadline = time.monotonic() + ANSWER_TIMEOUT_S)
+            break
+
+        if len(packet) == 0:
+            continue # NOTE: dropped by the radio, see `get_payload_into`
+
+        timeout.frame_arrived(now)
+
+        if first_frame is None:
+            first_frame = now
+        last_frame = now
+
+        received += 1
+        eventlog.record(eventlog.FRAME_RECEIVED, received)
+
+        if credits is not None:
+            credits.drained(received)
+
+        if on_chunk is not None:
+            on_chunk(packet)
+
+        if received % PROGRESS_EVERY == 0 or received == session.frames:
+            progress_bar(
+                active_msg     = f"Receiving chunks",
+                finished_msg   = f"All chunks received",
+                current_status = received,
+                max_status     = session.frames,
+            )
+
+    if first_frame is None or last_frame is None:
+        return received, 0.0, sent
+
+    if not session.finished:
+        eventlog.record(eventlog.RX_TIMEOUT, received, value = int(timeout.timeout_s() * 1000))
+        reset_line()
+        WARN(f"Connection timed-out after {timeout.timeout_s() * 1000:.0f} ms of silence")
+
+    return received, last_frame - first_frame, sent
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
@@ -0,0 +1,200 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from typing import Any, Callable
+import time
+
+from console import (
+    INFO,
+)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# high level calls of the radio that the transmit and receive loops use, the SPI
+# traffic of the calls they make internally is charged to the outermost one
+PROFILED_CALLS = (
+    "send",
+    "send_no_ack",
+    "wait_until_sent",
+    "is_sending",
+    "reset_packages_lost",
+    "get_packages_lost",
+    "get_retries",
+    "data_ready",
+    "data_pipe",
+    "get_payload",
+    "get_payload_into",
+    "ack_payload",
+    "get_status",
+    "power_up_tx",
+    "power_up_rx",
+    "flush_tx",
+    "flush_rx",
+)
+
+# every call to one of these moves one frame
+FRAME_CALLS = ("send", "send_no_ack", "get_payload", "get_payload_into")
+
+# SPI traffic outside of any profiled call
+OTHER = "<other>"
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: PROFILER :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class CallStats:
+    """
+    Accumulated cost of one high level call
+    """
+
+    def __init__(self: "CallStats") -> None:
+        self.calls       = 0
+        self.xfers       = 0  # SPI transactions
+        self.xfer_bytes  = 0
+        self.gpio_writes = 0  # CE toggles
+        self.io_ns       = 0  # time waiting for pigpio (SPI + GPIO)
+        self.total_ns    = 0
+        return
+
+
+
+class SPIProfiler:
+    """
+    Opt-in profiling layer for a `CustomNRF24`. It wraps the profiled methods of
+    the given radio object (not the class) so it can be attached and detached at
+    any moment, and counts the SPI transactions, bytes and CE writes issued by each
+    of them together with the time they take
+    """
+
+    def __init__(self: "SPIProfiler", nrf: Any) -> None:
+        self.nrf   = nrf
+        self.stats: dict[str, CallStats] = {}
+
+        self._current: str | None = None
+        self._wrapped: list[str]  = []
+
+        for name in PROFILED_CALLS:
+            if hasattr(nrf, name):
+                self._wrap(name, self._profile_call)
+
+        self._wrap("_nrf_xfer", self._profile_xfer)
+
+        # NOTE: `CustomNRF24` funnels the CE writes that actually happen through
+        # `_write_ce`, the base class writes on every `set_ce`/`unset_ce`
+        if hasattr(nrf, "_write_ce"):
+            self._wrap("_write_ce", self._profile_gpio)
+        else:
+            self._wrap("set_ce",   self._profile_gpio)
+            self._wrap("unset_ce", self._profile_gpio)
+        return
+
+
+    def _wrap(self: "SPIProfiler", name: str, profile: Callable) -> None:
+        original = getattr(self.nrf, name)
+
+        def wrapper(*args, **kwargs):
+            return profile(name, original, *args, **kwargs)
+
+        setattr(self.nrf, name, wrapper)
+        self._wrapped.append(name)
+        return
+
+
+    def _stats_of(self: "SPIProfiler", name: str) -> CallStats:
+        if name not in self.stats:
+            self.stats[name] = CallStats()
+        return self.stats[name]
+
+
+    def _profile_call(self: "SPIProfiler", name: str, original: Callable, *args, **kwargs) -> Any:
+        # NOTE: nested calls (e.g. `is_sending` inside `wait_until_sent`) belong to
+        # the outer one
+        if self._current is not None:
+            return original(*args, **kwargs)
+
+        self._current = name
+        tic = time.perf_counter_ns()
+
+        try:
+            return original(*args, **kwargs)
+
+        finally:
+            stats = self._stats_of(name)
+            stats.calls    += 1
+            stats.total_ns += time.perf_counter_ns() - tic
+            self._current   = None
+
+
+    def _profile_xfer(self: "SPIProfiler", name: str, original: Callable, data: Any) -> Any:
+        tic    = time.perf_counter_ns()
+        result = original(data)
+
+        stats = self._stats_of(self._current or OTHER)
+        stats.xfers      += 1
+        stats.xfer_bytes += len(data)
+        stats.io_ns      += time.perf_counter_ns() - tic
+
+        return result
+
+
+    def _profile_gpio(self: "SPIProfiler", name: str, original: Callable, *args) -> Any:
+        tic    = time.perf_counter_ns()
+        result = original(*args)
+
+        stats = self._stats_of(self._current or OTHER)
+        stats.gpio_writes += 1
+        stats.io_ns       += time.perf_counter_ns() - tic
+
+        return result
+
+
+    def detach(self: "SPIProfiler") -> None:
+        """
+        Restores the original methods of the radio
+        """
+
+        for name in self._wrapped:
+            delattr(self.nrf, name)
+
+        self._wrapped.clear()
+        return
+
+
+    def reset(self: "SPIProfiler") -> None:
+        self.stats.clear()
+        return
+
+
+    def frames(self: "SPIProfiler") -> int:
+        return sum(self.stats[name].calls for name in FRAME_CALLS if name in self.stats)
+
+
+    def report(self: "SPIProfiler") -> None:
+        """
+        Prints the cost of every call, both in total and per frame moved, sorted by
+        the time spent in it
+        """
+
+        frames = max(self.frames(), 1)
+        rows   = sorted(self.stats.items(), key = lambda item: item[1].total_ns or item[1].io_ns, reverse = True)
+
+        total_xfers = sum(stats.xfers for stats in self.stats.values())
+        total_gpio  = sum(stats.gpio_writes for stats in self.stats.values())
+        total_io_ns = sum(stats.io_ns for stats in self.stats.values())
+
+        INFO(f"SPI profile over {self.frames()} frames: {total_xfers / frames:.2f} SPI transactions, {total_gpio / frames:.2f} CE writes and {total_io_ns / frames / 1e3:.1f} us of pigpio I/O per frame")
+        print(f"    {'call':<20} {'calls':>8} {'xfers':>8} {'bytes':>9} {'gpio':>7} {'io ms':>9} {'total ms':>9} | {'xfers/fr':>8} {'us/fr':>8}")
+
+        for name, stats in rows:
+            total_ns = stats.total_ns or stats.io_ns
+            print(
+                f"    {name:<20} {stats.calls:>8} {stats.xfers:>8} {stats.xfer_bytes:>9} {stats.gpio_writes:>7}"
+                f" {stats.io_ns / 1e6:>9.1f} {total_ns / 1e6:>9.1f} | {stats.xfers / frames:>8.2f} {total_ns / frames / 1e3:>8.1f}"
+            )
+
+        return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
@@ -0,0 +1,190 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from pathlib import Path
+import functools
+import threading
+import queue
+import re
+import os
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+MOUNTINFO_PATH = Path("/proc/self/mountinfo")
+
+# NOTE: the writer thread gathers the chunks and writes them in blocks of this size
+SINK_BLOCK_BYTES = 64 * 1024
+
+PARTIAL_SUFFIX = ".part"
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: MOUNT DISCOVERY ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def read_mount_points(mountinfo_path: Path = MOUNTINFO_PATH) -> list[Path]:
+    """
+    Returns every mount point of the system, in mount order, from the kernel
+    mount table. Spaces and other special characters come escaped as octal
+    """
+
+    mount_points: list[Path] = []
+
+    for line in mountinfo_path.read_text().splitlines():
+        fields = line.split(" ")
+        if len(fields) < 5:
+            continue
+
+        mount_point = re.sub(r"\\([0-7]{3})", lambda match: chr(int(match[1], 8)), fields[4])
+        mount_points.append(Path(mount_point))
+
+    return mount_points
+
+
+
+@functools.cache
+def find_mount_point(root: Path) -> Path | None:
+    """
+    Returns the top-most mount point inside `root` (or `root` itself), `None` if
+    there is none. The result is cached, call `forget_mount_points` if the drives
+    may have changed since
+    """
+
+    try:
+        mount_points = read_mount_points()
+
+    except OSError:
+        # NOTE: no procfs (not Linux), fall back to walking the tree
+        for path, _, _ in root.walk():
+            if path.is_mount():
+                return path
+        return None
+
+    candidates = [path for path in mount_points if path == root or root in path.parents]
+
+    if not candidates:
+        return None
+
+    return min(candidates, key = lambda path: len(path.parts))
+
+
+
+def forget_mount_points() -> None:
+    find_mount_point.cache_clear()
+    return
+
+
+
+def list_txt_files(directory: Path) -> list[Path]:
+    """
+    Returns the visible txt files directly inside the directory
+    """
+
+    return sorted(
+        path
+        for path in directory.iterdir()
+        if path.is_file() and not path.name.startswith(".") and path.suffix == ".txt"
+    )
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: WRITE-BEHIND SINK ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class WriteBehindSink:
+    """
+    Output file that is written by a background thread while the data is still
+    arriving, so the reception never waits for the USB. The data goes to a partial
+    file next to the final one, `commit` flushes it, syncs it to the drive once and
+    renames it into place, `abort` throws it away leaving any previous file intact
+    """
+
+    def __init__(self: "WriteBehindSink", path: Path, block_bytes: int = SINK_BLOCK_BYTES) -> None:
+        self.path         = path
+        self.partial_path = path.with_name(path.name + PARTIAL_SUFFIX)
+        self.block_bytes  = block_bytes
+        self.written      = 0
+
+        self._file   = open(self.partial_path, "wb")
+        self._block  = bytearray()
+        self._queue: queue.Queue[bytearray | None] = queue.Queue()
+        self._error: OSError | None = None
+
+        self._thread = threading.Thread(target = self._run, name = f"sink {path.name}", daemon = True)
+        self._thread.start()
+        return
+
+
+    def write(self: "WriteBehindSink", data: bytes) -> None:
+        """
+        Copies the data into the current block, which is handed over to the thread
+        once full. It never blocks and `data` can be reused as soon as it returns
+        """
+
+        self._block += data
+
+        if len(self._block) >= self.block_bytes:
+            self._queue.put(self._block)
+            self._block = bytearray()
+
+        return
+
+
+    def _run(self: "WriteBehindSink") -> None:
+        while True:
+            block = self._queue.get()
+
+            if block is None:
+                return
+
+            try:
+                self._file.write(block)
+                self.written += len(block)
+
+            except OSError as e:
+                self._error = e
+                return
+
+
+    def _stop(self: "WriteBehindSink") -> None:
+        if self._block:
+            self._queue.put(self._block)
+            self._block = bytearray()
+
+        self._queue.put(None)
+        self._thread.join()
+        return
+
+
+    def commit(self: "WriteBehindSink") -> int:
+        """
+        Waits for the pending data, syncs the file and moves it to its final path.
+        Returns the number of bytes written
+        """
+
+        self._stop()
+
+        if self._error is not None:
+            self.abort()
+            raise self._error
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+        os.replace(self.partial_path, self.path)
+        return self.written
+
+
+    def abort(self: "WriteBehindSink") -> None:
+        if self._thread.is_alive():
+            self._stop()
+
+        self._file.close()
+        self.partial_path.unlink(missing_ok = True)
+        return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
@@ -0,0 +1,215 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from nrf24 import RF24_RX_ADDR
+
+from typing import Any
+import struct
+import time
+
+from console import (
+    WARN,
+    INFO,
+)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+TDMA_BEACON = ord("B")
+
+# type, sequence number, slot length (us), guard time (us), followed by the ID of
+# the node that owns every slot, in slot order
+BEACON = struct.Struct("<BHHH")
+
+MAX_SLOTS = 32 - BEACON.size
+
+# NOTE: the beacons arrive on pipe P2, which only has its own first address byte
+# and shares the rest with P1, so the transmitters must read on an address that
+# ends like this one (e.g. TA0)
+BEACON_PIPE = RF24_RX_ADDR.P2
+
+TDMA_POLL_S         = 200e-6 # how often the beacons are polled while out of the slot
+TDMA_SYNC_TIMEOUT_S = 1.0    # time the slots are kept without hearing a beacon
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: BEACONS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# NOTE: every superframe starts with a beacon followed by a guard time and then one
+# slot per node. Nobody starts a frame in the last `guard_us` of its slot, so the
+# frame (and its ACK) is over before the next slot begins
+#
+#   | beacon + guard | slot 0 | slot 1 | ... | slot N-1 | beacon + guard | slot 0 |
+def superframe_us(slot_us: int, guard_us: int, slots: int) -> int:
+    return guard_us + slots * slot_us
+
+
+
+def pack_beacon(seq: int, slot_us: int, guard_us: int, nodes: tuple[int, ...]) -> bytes:
+    if len(nodes) > MAX_SLOTS:
+        raise ValueError(f"A beacon fits at most {MAX_SLOTS} slots, got {len(nodes)}")
+
+    return BEACON.pack(TDMA_BEACON, seq & 0xFFFF, slot_us, guard_us) + bytes(nodes)
+
+
+
+def parse_beacon(frame: bytes) -> tuple[int, int, int, tuple[int, ...]] | None:
+    """
+    Returns the sequence number, slot length, guard time and slot owners of a
+    beacon, `None` if the frame is not a beacon
+    """
+
+    if len(frame) < BEACON.size or frame[0] != TDMA_BEACON:
+        return None
+
+    _, seq, slot_us, guard_us = BEACON.unpack_from(frame)
+    return seq, slot_us, guard_us, tuple(frame[BEACON.size:])
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: SLOT ACCESS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+class TDMASlot:
+    """
+    Channel access of a transmitter in a TDMA schedule, it can be used wherever a
+    `ChannelAccess` is accepted. `acquire` blocks until the slot that the last
+    beacon assigned to `node_id` is open, listening for beacons while it waits.
+    Between beacons the schedule keeps running on the local clock, for at most
+    `TDMA_SYNC_TIMEOUT_S`
+    """
+
+    def __init__(self: "TDMASlot", nrf: Any, node_id: int, beacon_address: bytes) -> None:
+        self.nrf            = nrf
+        self.node_id        = node_id
+        self.beacon_address = beacon_address
+
+        self.frames   = 0
+        self.beacons  = 0
+        self.waited_s = 0.0
+        self.resyncs  = 0
+
+        self._listening = False
+
+        # schedule of the last beacon heard
+        self._beacon_time: float | None = None
+        self._slot_s   = 0.0
+        self._guard_s  = 0.0
+        self._period_s = 0.0
+        self._index: int | None = None # slot of this node, `None` if it has none
+        return
+
+
+    def _listen(self: "TDMASlot") -> None:
+        # NOTE: the pipe is only opened when the transfer starts, so it does not get
+        # in the way of any exchange before it (e.g. the signatures of `DELTA_MODE`)
+        self.nrf.open_reading_pipe(BEACON_PIPE, self.beacon_address)
+        self.nrf.power_up_rx()
+        self.nrf.flush_rx()
+
+        self._listening = True
+        return
+
+
+    def _poll_beacons(self: "TDMASlot") -> None:
+        while self.nrf.data_ready():
+            pipe  = self.nrf.data_pipe()
+            frame = self.nrf.get_payload()
+
+            # NOTE: STATUS numbers the pipes from 0, the library from RX_ADDR_P0
+            if pipe != BEACON_PIPE - RF24_RX_ADDR.P0:
+                continue
+
+            beacon = parse_beacon(bytes(frame))
+            if beacon is None:
+                continue
+
+            _, slot_us, guard_us, nodes = beacon
+
+            # NOTE: polled every `TDMA_POLL_S` while waiting, so the beacon arrived
+            # at most that long ago
+            self._beacon_time = time.monotonic()
+            self._slot_s      = slot_us / 1e6
+            self._guard_s     = guard_us / 1e6
+            self._period_s    = superframe_us(slot_us, guard_us, len(nodes)) / 1e6
+            self._index       = nodes.index(self.node_id) if self.node_id in nodes else None
+
+            self.beacons += 1
+
+        return
+
+
+    def _window(self: "TDMASlot", now: float) -> tuple[float, float] | None:
+        """
+        Returns the start of the current or next slot of this node and the last
+        moment a frame can be started in it, `None` while there is no valid schedule
+        """
+
+        if self._beacon_time is None or self._index is None:
+            return None
+
+        if now - self._beacon_time > TDMA_SYNC_TIMEOUT_S:
+            self._beacon_time = None
+            self.resyncs     += 1
+            WARN("No TDMA beacon heard for a while, waiting for the next one")
+            return None
+
+        superframes = (now - self._beacon_time) // self._period_s
+        start       = self._beacon_time + superframes * self._period_s + self._guard_s + self._index * self._slot_s
+        stop        = start + self._slot_s - self._guard_s
+
+        if now >= stop:
+            start += self._period_s
+            stop  += self._period_s
+
+        return start, stop
+
+
+    def acquire(self: "TDMASlot") -> None:
+        """
+        Returns once a frame can be sent inside the slot of this node, to be called
+        right before sending it
+        """
+
+        if not self._listening:
+            self._listen()
+
+        self.frames += 1
+        tic = time.monotonic()
+
+        while True:
+            self._poll_beacons()
+
+            now    = time.monotonic()
+            window = self._window(now)
+
+            if window is not None and window[0] <= now < window[1]:
+                break
+
+            # NOTE: short sleeps, the beacon time is taken when it is polled
+            wait_s = TDMA_POLL_S if window is None else min(max(window[0] - now, 0.0), TDMA_POLL_S)
+            time.sleep(wait_s)
+
+        self.waited_s += time.monotonic() - tic
+        return
+
+
+    def delivered(self: "TDMASlot") -> None:
+        return
+
+
+    def lost(self: "TDMASlot") -> None:
+        return
+
+
+    def report(self: "TDMASlot") -> None:
+        INFO(
+            f"TDMA slot access over {self.frames} frames: {self.beacons} beacons heard, "
+            f"{self.resyncs} resyncs, {self.waited_s * 1e3:.1f} ms waiting for the slot"
+        )
+        return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
@@ -0,0 +1,287 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from typing import Any, Callable
+import statistics
+import itertools
+import argparse
+import time
+
+import pigpio
+
+from console import (
+    ERROR,
+    SUCC,
+    WARN,
+    INFO,
+)
+from pigpiod_emulator import (
+    Air,
+    VirtualPi,
+)
+from custom_nrf24 import CustomNRF24
+
+# NOTE: the direct backend is optional, only the boards that use it need them
+try:
+    import spidev
+except ImportError:
+    spidev = None
+
+try:
+    import gpiod
+except ImportError:
+    gpiod = None
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+TRANSPORTS = ("pigpio", "spidev", "fake")
+
+GPIO_CHIP = "/dev/gpiochip0"
+
+SPI_AUX = 1 << 8 # NOTE: same flag as pigpio, selects the auxiliary SPI bus
+
+# every fake transport of the process shares the same air, so two radios opened
+# in the same script can talk to each other
+FAKE_AIR = Air()
+
+BENCH_CE_PIN = 22
+BENCH_COUNT  = 2000
+
+# NOTE: cost of the stop & wait transmit loop per frame, taken from the SPI profile
+# of `CustomNRF24` (see `spi_profiler.py`)
+XFERS_PER_FRAME     = 8
+CE_WRITES_PER_FRAME = 4
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: TRANSPORTS :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# NOTE: a transport is anything with the methods of `pigpio.pi` that the `nrf24`
+# library uses: `connected`, `set_mode`, `write`, `spi_open`, `spi_xfer`,
+# `spi_close` and `stop`
+class SpidevTransport:
+    """
+    Talks to `/dev/spidevX.Y` and to the CE line of a gpiochip directly from this
+    process, so every register access is a single ioctl instead of a round trip to
+    pigpiod
+    """
+
+    def __init__(self: "SpidevTransport", gpio_chip: str = GPIO_CHIP) -> None:
+        self.gpio_chip = gpio_chip
+        self.connected = spidev is not None and gpiod is not None
+
+        self._spi: dict[int, Any]   = {}
+        self._lines: dict[int, Any] = {}
+        self._handles = itertools.count()
+
+        # NOTE: libgpiod 2 replaced the line objects by line requests
+        self._gpiod_v2 = gpiod is not None and hasattr(gpiod, "request_lines")
+
+        if not self.connected:
+            ERROR("The spidev transport needs the `spidev` and `gpiod` packages")
+
+        return
+
+
+    def set_mode(self: "SpidevTransport", gpio: int, mode: int) -> int:
+        if mode != pigpio.OUTPUT or gpio in self._lines:
+            return 0
+
+        if self._gpiod_v2:
+            settings = gpiod.LineSettings(
+                direction    = gpiod.line.Direction.OUTPUT,
+                output_value = gpiod.line.Value.INACTIVE,
+            )
+            self._lines[gpio] = gpiod.request_lines(self.gpio_chip, consumer = "nrf24", config = {gpio: settings})
+
+        else:
+            line = gpiod.Chip(self.gpio_chip).get_line(gpio)
+            line.request(consumer = "nrf24", type = gpiod.LINE_REQ_DIR_OUT)
+            self._lines[gpio] = line
+
+        return 0
+
+
+    def write(self: "SpidevTransport", gpio: int, level: int) -> int:
+        line = self._lines[gpio]
+
+        if self._gpiod_v2:
+            line.set_value(gpio, gpiod.line.Value.ACTIVE if level else gpiod.line.Value.INACTIVE)
+        else:
+            line.set_value(1 if level else 0)
+
+        return 0
+
+
+    def spi_open(self: "SpidevTransport", spi_channel: int, baud: int, spi_flags: int = 0) -> int:
+        spi = spidev.SpiDev()
+        spi.open(1 if spi_flags & SPI_AUX else 0, spi_channel)
+        spi.max_speed_hz = int(baud)
+        spi.mode         = 0
+
+        handle = next(self._handles)
+        self._spi[handle] = spi
+
+        return handle
+
+
+    def spi_xfer(self: "SpidevTransport", handle: int, data: bytes | list[int]) -> tuple[int, bytearray]:
+        # NOTE: `xfer2` keeps CSN low for the whole command, as the radio expects
+        rx_data = self._spi[handle].xfer2(list(data))
+        return len(rx_data), bytearray(rx_data)
+
+
+    def spi_close(self: "SpidevTransport", handle: int) -> int:
+        self._spi.pop(handle).close()
+        return 0
+
+
+    def stop(self: "SpidevTransport") -> None:
+        for spi in self._spi.values():
+            spi.close()
+
+        for line in self._lines.values():
+            line.release()
+
+        self._spi.clear()
+        self._lines.clear()
+        return
+
+
+
+def open_transport(name: str, hostname: str = "localhost", port: int = 8888, gpio_chip: str = GPIO_CHIP) -> Any:
+    """
+    Opens the transport with the given name:
+
+    - `pigpio`: through the pigpiod daemon at `hostname`:`port`
+    - `spidev`: directly through spidev and the gpiochip `gpio_chip`
+    - `fake`: an emulated radio inside this process, see `pigpiod_emulator.py`
+
+    As with `pigpio.pi`, check `connected` before using it
+    """
+
+    if name == "pigpio":
+        return pigpio.pi(hostname, port)
+
+    if name == "spidev":
+        return SpidevTransport(gpio_chip)
+
+    if name == "fake":
+        return VirtualPi(FAKE_AIR, "fake")
+
+    raise ValueError(f"Unknown transport: {name}, expected one of {", ".join(TRANSPORTS)}")
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: BENCHMARK ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def time_operation(operation: Callable[[int], Any], count: int) -> list[float]:
+    """
+    Runs the operation `count` times and returns the latency of every run in
+    microseconds
+    """
+
+    latencies: list[float] = []
+
+    for idx in range(count):
+        tic = time.perf_counter_ns()
+        operation(idx)
+        latencies.append((time.perf_counter_ns() - tic) / 1e3)
+
+    return latencies
+
+
+
+def benchmark_transport(name: str, count: int) -> dict[str, list[float]] | None:
+    """
+    Measures the primitives that every radio call is made of on the given transport:
+    a one byte command (NOP), a full payload read and a CE write. Returns `None` if
+    the transport is not available on this board
+    """
+
+    pi = open_transport(name)
+    if not pi.connected:
+        WARN(f"Transport {name} not available, skipping")
+        return None
+
+    nrf    = CustomNRF24(pi = pi, ce = BENCH_CE_PIN)
+    handle = nrf.get_spi_handle()
+
+    payload_read = [nrf.R_RX_PAYLOAD] + [0] * 32
+
+    try:
+        results = {
+            "nop xfer":     time_operation(lambda idx: pi.spi_xfer(handle, [nrf.NOP]), count),
+            "payload xfer": time_operation(lambda idx: pi.spi_xfer(handle, payload_read), count),
+            "ce write":     time_operation(lambda idx: pi.write(BENCH_CE_PIN, idx & 1), count),
+        }
+
+    finally:
+        nrf.power_down()
+        pi.stop()
+
+    return results
+
+
+
+def main():
+    """
+    Benchmarks the available transports so the one with the lowest latency can be
+    chosen for each board:
+
+        python transport.py --transport pigpio --transport spidev
+
+    Without a Raspberry Pi, start `pigpiod_emulator.py` first to compare pigpio
+    against the in-process fake device
+    """
+
+    parser = argparse.ArgumentParser(description = "Latency benchmark of the radio transports")
+    parser.add_argument("--transport", action = "append", choices = TRANSPORTS, help = "transport to benchmark, all by default")
+    parser.add_argument("--count", type = int, default = BENCH_COUNT)
+    args = parser.parse_args()
+
+    frame_costs: dict[str, float] = {}
+
+    for name in args.transport or TRANSPORTS:
+        INFO(f"Benchmarking {name} transport ({args.count} runs per operation)")
+
+        results = benchmark_transport(name, args.count)
+        if results is None:
+            continue
+
+        for operation, latencies in results.items():
+            latencies.sort()
+            p99 = latencies[int(len(latencies) * 0.99)]
+            print(f"    {operation:<14} mean {statistics.fmean(latencies):>8.1f} us | median {statistics.median(latencies):>8.1f} us | p99 {p99:>8.1f} us")
+
+        frame_costs[name] = (
+            XFERS_PER_FRAME * statistics.fmean(results["nop xfer"])
+            + CE_WRITES_PER_FRAME * statistics.fmean(results["ce write"])
+        )
+        INFO(f"Host cost of a stop & wait frame on {name}: {frame_costs[name]:.1f} us")
+
+    # NOTE: the fake device has no I/O at all, it is only the floor of the Python
+    # side to compare the real transports with
+    real_costs = {name: cost for name, cost in frame_costs.items() if name != "fake"}
+
+    if not real_costs:
+        ERROR("No real transport available")
+        return
+
+    best = min(real_costs, key = real_costs.get)
+    SUCC(f"Lowest latency transport: {best} ({real_costs[best]:.1f} us per frame)")
+
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+# :::: LIBRARY IMPORTS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+from nrf24 import (
+    RF24_DATA_RATE,
+    RF24_PA,
+    RF24_RX_ADDR,
+    RF24_PAYLOAD,
+    RF24_CRC,
+)
+
+from pathlib import Path
+from typing import Any
+import itertools
+import argparse
+import struct
+import time
+import csv
+import os
+
+from console import (
+    ERROR,
+    SUCC,
+    WARN,
+    INFO,
+)
+from link import (
+    DATA_SIZE,
+    chunk_content,
+    send_frame,
+    send_frames,
+    send_frames_windowed,
+    receive_frames,
+)
+from radio_profile import (
+    RADIO_PROFILE_PATH,
+    RadioProfile,
+    save_profile,
+)
+from custom_nrf24 import CustomNRF24
+from transport import (
+    TRANSPORTS,
+    open_transport,
+)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: CONSTANTS/GLOBALS ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+CE_PIN        = 22
+RADIO_CHANNEL = 76
+
+TUNE_RESULTS_PATH = Path(__file__).with_name("radio_tuning.csv")
+
+TUNE_FRAMES    = 200  # frames of every calibrated transfer
+TUNE_STEP_S    = 3.0  # a configuration that has not finished by then is cut short
+TUNE_SWITCH_S  = 0.05 # time given to the receiver to switch configuration
+TUNE_SILENCE_S = 0.5  # the receiver goes back to the base configuration after this
+
+# grid of the sweep, every combination is measured
+TUNE_DATA_RATES      = (RF24_DATA_RATE.RATE_250KBPS, RF24_DATA_RATE.RATE_1MBPS, RF24_DATA_RATE.RATE_2MBPS)
+TUNE_PA_LEVELS       = (RF24_PA.MIN, RF24_PA.LOW, RF24_PA.HIGH, RF24_PA.MAX)
+TUNE_RETRANSMISSIONS = ((0, 15), (1, 15), (1, 5), (3, 15)) # (ARD, ARC)
+TUNE_ADDRESS_BYTES   = (3, 4, 5)
+TUNE_CRC_BYTES       = (RF24_CRC.BYTES_1, RF24_CRC.BYTES_2)
+TUNE_WINDOWS         = (0, 1, 2, 3)
+
+# NOTE: before every step the transmitter tells the receiver which configuration
+# comes next, both using the base configuration (the default profile). The
+# receiver builds the same grid, so only the index travels. The first frame of the
+# step is a probe, sent with the new configuration: it only gets through once both
+# nodes switched. The last step (`TUNE_DONE`) carries the index of the fastest
+# configuration instead of the frames, both nodes store it
+TUNE_STEP  = ord("S")
+TUNE_PROBE = ord("P")
+TUNE_DONE  = 0xFFFF
+STEP       = struct.Struct("<BHH") # type, grid index, frames
+
+BASE_PROFILE = RadioProfile()
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+
+# :::: SWEEP ::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+def tuning_grid(quick: bool = False) -> list[RadioProfile]:
+    """
+    Returns every configuration of the sweep. With `quick` the PA level, address
+    width and CRC keep their default values, which rarely change the goodput of a
+    short link
+    """
+
+    pa_levels     = (BASE_PROFILE.pa_level,) if quick else TUNE_PA_LEVELS
+    address_bytes = (BASE_PROFILE.address_bytes,) if quick else TUNE_ADDRESS_BYTES
+    crc_bytes     = (BASE_PROFILE.crc_bytes,) if quick else TUNE_CRC_BYTES
+
+    return [
+        RadioProfile(data_rate, pa_level, retry_delay, retries, width, crc, window)
+        for data_rate, pa_level, (retry_delay, retries), width, crc, window in itertools.product(
+            TUNE_DATA_RATES, pa_levels, TUNE_RETRANSMISSIONS, address_bytes, crc_bytes, TUNE_WINDOWS,
+        )
+    ]
+
+
+
+def switch_profile(nrf: CustomNRF24, profile: RadioProfile, transmitter: bool) -> None:
+    """
+    Applies the profile and opens the pipes again, as the address width may have
+    changed. Same addresses as `point_to_point_mode.py`
+    """
+
+    # NOTE: frames left from the previous profile are dropped before switching, a
+    # frame acknowledged with the new one has to stay
+    if not transmitter:
+        nrf.flush_rx()
+
+    profile.apply(nrf)
+
+    if transmitter:
+        nrf.open_writing_pipe(b"TA1")
+        nrf.open_reading_pipe(RF24_RX_ADDR.P1, b"TA0")
+    else:
+        nrf.open_writing_pipe(b"TA0")
+        nrf.open_reading_pipe(RF24_RX_ADDR.P1, b"TA1")
+        nrf.power_up_rx()
+
+    return
+
+
+
+def measure_goodput(nrf: CustomNRF24, profile: RadioProfile, packets: list[bytes]) -> float:
+    """
+    Sends the calibrated transfer with the profile and returns the goodput in KBps,
+    counting only the frames acknowledged before `TUNE_STEP_S`
+    """
+
+    tic      = time.monotonic()
+    deadline = tic + TUNE_STEP_S
+
+    if profile.window > 0:
+        delivered = send_frames_windowed(nrf, packets, profile.window, deadline = deadline)
+    else:
+        delivered = send_frames(nrf, packets, deadline = deadline)
+
+    return delivered * DATA_SIZE / (time.monotonic() - tic) / 1e3
+
+
+
+def run_transmitter(nrf: CustomNRF24, grid: list[RadioProfile], frames: int) -> list[tuple[RadioProfile, float]]:
+    packets = chunk_content(os.urandom(frames * DATA_SIZE))
+    results: list[tuple[RadioProfile, float]] = []
+
+    for idx, profile in enumerate(grid):
+        # NOTE: if only the ACK of the step was lost the receiver switched and the
+        # retries of the step are dropped as duplicates once it is back, it would
+        # not switch again. A step that is not confirmed by the probe is written
+        # again, with a new PID
+        while True:
+            switch_profile(nrf, BASE_PROFILE, transmitter = True)
+            send_frame(nrf, STEP.pack(TUNE_STEP, idx, frames))
+
+            switch_profile(nrf, profile, transmitter = True)
+            time.sleep(TUNE_SWITCH_S)
+
+            if send_frame(nrf, STEP.pack(TUNE_PROBE, idx, frames), deadline = time.monotonic() + TUNE_SILENCE_S) is not None:
+                break
+
+            WARN(f"[{idx + 1}/{len(grid)}] The receiver did not switch, sending the step again")
+
+        goodput = measure_goodput(nrf, profile, packets)
+        results.append((profile, goodput))
+
+        INFO(f"[{idx + 1}/{len(grid)}] {profile}: {goodput:.2f} KBps")
+
+    # NOTE: the receiver leaves as soon as it gets the last step, if only its ACK
+    # was lost the retries would never be acknowledged
+    switch_profile(nrf, BASE_PROFILE, transmitter = True)
+
+    if send_frame(nrf, STEP.pack(TUNE_STEP, TUNE_DONE, fastest(results)), deadline = time.monotonic() + TUNE_STEP_S) is None:
+        WARN("The receiver did not acknowledge the end of the sweep, check that it stored the same profile")
+
+    return results
+
+
+
+def fastest(results: list[tuple[RadioProfile, float]]) -> int:
+    """
+    Grid index of the configuration with the highest goodput
+    """
+    return max(range(len(results)), key = lambda idx: results[idx][1])
+
+
+
+def is_step(frame: bytes) -> bool:
+    # NOTE: data frames are always `DATA_SIZE` long, so they never look like one
+    return len(frame) == STEP.size and frame[0] == TUNE_STEP
+
+
+
+def drain_until_silence(nrf: CustomNRF24) -> bytes | None:
+    """
+    Keeps acknowledging frames until the channel is silent for `TUNE_SILENCE_S`.
+    If the ACK of the last frame was lost the transmitter keeps sending it, and
+    would never get it through once the receiver switched back. Returns the step
+    message if the next one arrives meanwhile (both profiles may be the same)
+    """
+
+    silence_start = time.monotonic()
+
+    while time.monotonic() - silence_start < TUNE_SILENCE_S:
+        if not nrf.data_ready():
+            continue
+
+        frame         = bytes(nrf.get_payload())
+        silence_start = time.monotonic()
+
+        if is_step(frame):
+            return frame
+
+    return None
+
+
+
+def run_receiver(nrf: CustomNRF24, grid: list[RadioProfile]) -> int:
+    """
+    Follows the steps of the transmitter and returns the grid index of the fastest
+    configuration
+    """
+
+    switch_profile(nrf, BASE_PROFILE, transmitter = False)
+
+    pending: bytes | None = None
+
+    while True:
+        if pending is None:
+            while not nrf.data_ready():
+                pass
+
+            frame = bytes(nrf.get_payload())
+        else:
+            frame, pending = pending, None
+
+        # NOTE: a late data frame of the previous step
+        if not is_step(frame):
+            continue
+
+        _, idx, frames = STEP.unpack(frame)
+
+        if idx == TUNE_DONE and frames < len(grid):
+            SUCC("Sweep finished")
+            return frames
+
+        if idx >= len(grid):
+            ERROR(f"Step {idx} out of the grid, are both nodes sweeping the same grid?")
+            continue
+
+        INFO(f"[{idx + 1}/{len(grid)}] {grid[idx]}")
+
+        # NOTE: the probe comes first
+        switch_profile(nrf, grid[idx], transmitter = False)
+        receive_frames(nrf, frames + 1, TUNE_SILENCE_S)
+        pending = drain_until_silence(nrf)
+        switch_profile(nrf, BASE_PROFILE, transmitter = False)
+
+
+
+def save_results(results: list[tuple[RadioProfile, float]], path: Path) -> None:
+    with open(path, "w", newline = "") as file:
+        writer = csv.writer(file)
+        writer.writerow([*BASE_PROFILE.to_dict().keys(), "goodput_kBps"])
+
+        for profile, goodput in results:
+            writer.writerow([*profile.to_dict().values(), f"{goodput:.3f}"])
+
+    return
+
+
+
+def main():
+    """
+    Sweeps the grid of radio configurations with short calibrated transfers and
+    stores the fastest one in `radio_profile.json` of both nodes, which every role
+    of `point_to_point_mode.py` loads at startup. Run it on both nodes at once:
+
+        python tune.py --role rx
+        python tune.py --role tx
+
+    The goodput of every configuration is also written to `radio_tuning.csv`
+    """
+
+    parser = argparse.ArgumentParser(description = "Radio parameter sweep")
+    parser.add_argument("--role", choices = ("tx", "rx"), required = True)
+    parser.add_argument("--transport", choices = TRANSPORTS, default = "pigpio")
+    parser.add_argument("--frames", type = int, default = TUNE_FRAMES, help = "frames of every calibrated transfer")
+    parser.add_argument("--quick", action = "store_true", help = "keep the default PA level, address width and CRC")
+    parser.add_argument("--output", type = Path, default = RADIO_PROFILE_PATH)
+    args = parser.parse_args()
+
+    pi: Any = open_transport(args.transport)
+    if not pi.connected:
+        ERROR("Not connected to Raspberry Pi, exiting")
+        return
+
+    nrf = CustomNRF24(pi = pi, ce = CE_PIN)
+    nrf.set_channel(RADIO_CHANNEL)
+    nrf.set_payload_size(RF24_PAYLOAD.DYNAMIC)
+
+    grid = tuning_grid(args.quick)
+    INFO(f"Sweeping {len(grid)} configurations")
+
+    try:
+        # NOTE: both nodes load the profile at startup, they have to store the same
+        if args.role == "rx":
+            best = grid[run_receiver(nrf, grid)]
+
+            save_profile(best, args.output)
+            SUCC(f"Fastest configuration: {best}, saved to {args.output}")
+            return
+
+        results = run_transmitter(nrf, grid, args.frames)
+
+        save_results(results, TUNE_RESULTS_PATH)
+        INFO(f"Goodput of every configuration written to {TUNE_RESULTS_PATH}")
+
+        best, goodput = results[fastest(results)]
+        save_profile(best, args.output, goodput_kBps = round(goodput, 3))
+        SUCC(f"Fastest configuration ({goodput:.2f} KBps): {best}, saved to {args.output}")
+
+    except KeyboardInterrupt:
+        ERROR("Process interrupted by user")
+
+    finally:
+        nrf.power_down()
+        pi.stop()
+
+    return
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+
+
+
+if __name__ == "__main__":
+    main()